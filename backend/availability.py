@@ -0,0 +1,237 @@
+import os
+import threading
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+from functools import partial
+from time import monotonic
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import models as models
+from cache import run_after_commit
+
+# Statuses that keep a vehicle occupied
+BLOCKING_RESERVATION_STATUSES = ("Active", "Confirmed")
+BLOCKING_RENTAL_STATUSES = ("Active",)
+BLOCKING_MAINTENANCE_STATUSES = ("Scheduled", "In Progress")
+
+# Seconds between reloads of a worker's availability index from the database
+AVAILABILITY_RESYNC_INTERVAL = float(os.getenv("AVAILABILITY_RESYNC_INTERVAL", "300"))
+
+
+# One row of the occupancy timeline, derived from a reservation, rental or maintenance entry
+class Occupancy(NamedTuple):
+    source_type: str
+    source_id: int
+    vehicle_id: int
+    start: datetime
+    end: datetime
+    blocking: bool
+
+
+def occupancy_for(obj) -> Occupancy:
+    if isinstance(obj, models.Reservation):
+        return Occupancy(
+            "Reservation", obj.reservation_id, obj.vehicle_id,
+            obj.reserved_start_date, obj.reserved_end_date,
+            obj.status in BLOCKING_RESERVATION_STATUSES
+        )
+    if isinstance(obj, models.Rental):
+        return Occupancy(
+            "Rental", obj.rental_id, obj.vehicle_id,
+            obj.start_date, obj.end_date,
+            obj.status in BLOCKING_RENTAL_STATUSES
+        )
+    if isinstance(obj, models.MaintenanceSchedule):
+        # Maintenance is scheduled by day; it occupies whole days through completion
+        last_day = obj.completed_date or obj.scheduled_date
+        return Occupancy(
+            "Maintenance", obj.schedule_id, obj.vehicle_id,
+            datetime.combine(obj.scheduled_date, time.min),
+            datetime.combine(last_day, time.min) + timedelta(days=1),
+            obj.status in BLOCKING_MAINTENANCE_STATUSES
+        )
+    raise TypeError(f"No occupancy for {type(obj).__name__}")
+
+
+# Sorted intervals for a single vehicle
+class VehicleIntervals:
+    __slots__ = ("starts", "entries", "max_ends")
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.entries: List[Tuple[datetime, datetime, Tuple[str, int]]] = []
+        # max_ends[i] is the latest end among entries[0..i], so a single bisect
+        # answers "does anything starting before `end` finish after `start`"
+        self.max_ends: List[datetime] = []
+
+    def add(self, start: datetime, end: datetime, key: Tuple[str, int]) -> None:
+        idx = bisect_left(self.starts, start)
+        self.starts.insert(idx, start)
+        self.entries.insert(idx, (start, end, key))
+        self._rebuild_max_ends(idx)
+
+    def remove(self, key: Tuple[str, int]) -> None:
+        for idx, entry in enumerate(self.entries):
+            if entry[2] == key:
+                del self.starts[idx]
+                del self.entries[idx]
+                self._rebuild_max_ends(idx)
+                return
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        idx = bisect_left(self.starts, end)
+        return idx > 0 and self.max_ends[idx - 1] > start
+
+    def _rebuild_max_ends(self, idx: int) -> None:
+        del self.max_ends[idx:]
+        running = self.max_ends[-1] if self.max_ends else None
+        for _, end, _ in self.entries[idx:]:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# Fleet-wide availability index mirroring the VehicleOccupancy timeline. Each worker process has
+# its own copy, kept current by the changes committed through that worker; check() reloads it every
+# resync_interval seconds to pick up what other workers (or direct SQL) committed.
+class AvailabilityIndex:
+    def __init__(self, resync_interval: float = AVAILABILITY_RESYNC_INTERVAL):
+        self.resync_interval = resync_interval
+        self.resyncs = 0
+        self._lock = threading.RLock()
+        # Serializes loads; the state lock is only held to swap the loaded state in
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._next_resync = 0.0
+        self._intervals: Dict[int, VehicleIntervals] = {}
+        self._keys: Dict[Tuple[str, int], int] = {}
+        self._locations: Dict[int, Optional[int]] = {}
+        # Changes committed while a load reads the tables, replayed onto the loaded state
+        self._pending: Optional[List[Callable[[], None]]] = None
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            self._reload(db)
+
+    def check(self, db: Session) -> None:
+        # Run by the background scheduler in every worker, on a primary session
+        if not self._loaded or monotonic() < self._next_resync:
+            return
+        with self._load_lock:
+            self._reload(db)
+        self.resyncs += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._intervals.clear()
+            self._keys.clear()
+            self._locations.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "vehicles": len(self._locations),
+                "occupancies": len(self._keys),
+                "resyncs": self.resyncs
+            }
+
+    def _reload(self, db: Session) -> None:
+        with self._lock:
+            self._pending = []
+        try:
+            locations = dict(db.query(models.Vehicle.vehicle_id, models.Vehicle.location_id))
+            intervals: Dict[int, VehicleIntervals] = {}
+            keys: Dict[Tuple[str, int], int] = {}
+            rows = db.query(
+                models.VehicleOccupancy.source_type,
+                models.VehicleOccupancy.source_id,
+                models.VehicleOccupancy.vehicle_id,
+                models.VehicleOccupancy.start_time,
+                models.VehicleOccupancy.end_time
+            )
+            for source_type, source_id, vehicle_id, start, end in rows:
+                intervals.setdefault(vehicle_id, VehicleIntervals()).add(start, end, (source_type, source_id))
+                keys[source_type, source_id] = vehicle_id
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._intervals, self._keys, self._locations = intervals, keys, locations
+            self._loaded = True
+            self._next_resync = monotonic() + self.resync_interval
+            for change in pending:
+                change()
+
+    # Incremental maintenance. Before the first load there is nothing to maintain, since the load
+    # reads the committed state; during a load the change is also queued and replayed afterwards.
+    def apply(self, occupancy: Occupancy) -> None:
+        key = (occupancy.source_type, occupancy.source_id)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(partial(self.apply, occupancy))
+            if not self._loaded:
+                return
+            previous_vehicle = self._keys.pop(key, None)
+            if previous_vehicle is not None:
+                intervals = self._intervals.get(previous_vehicle)
+                if intervals is not None:
+                    intervals.remove(key)
+                    if not intervals:
+                        del self._intervals[previous_vehicle]
+            if occupancy.blocking:
+                self._add(key, occupancy.vehicle_id, occupancy.start, occupancy.end)
+
+    def set_vehicle_location(self, vehicle_id: int, location_id: Optional[int]) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(partial(self.set_vehicle_location, vehicle_id, location_id))
+            if not self._loaded:
+                return
+            self._locations[vehicle_id] = location_id
+
+    def remove_vehicle(self, vehicle_id: int) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(partial(self.remove_vehicle, vehicle_id))
+            if not self._loaded:
+                return
+            self._locations.pop(vehicle_id, None)
+            intervals = self._intervals.pop(vehicle_id, None)
+            if intervals:
+                for _, _, key in intervals.entries:
+                    self._keys.pop(key, None)
+
+    def is_available(self, *, vehicle_id: int, start: datetime, end: datetime) -> bool:
+        with self._lock:
+            intervals = self._intervals.get(vehicle_id)
+            return intervals is None or not intervals.overlaps(start, end)
+
+    def available_vehicle_ids(self, *, start: datetime, end: datetime, location_id: Optional[int] = None) -> List[int]:
+        with self._lock:
+            return sorted(
+                vehicle_id for vehicle_id, vehicle_location in self._locations.items()
+                if (location_id is None or vehicle_location == location_id)
+                and (vehicle_id not in self._intervals or not self._intervals[vehicle_id].overlaps(start, end))
+            )
+
+    def _add(self, key: Tuple[str, int], vehicle_id: int, start: datetime, end: datetime) -> None:
+        self._intervals.setdefault(vehicle_id, VehicleIntervals()).add(start, end, key)
+        self._keys[key] = vehicle_id
+
+
+availability_index = AvailabilityIndex()
+
+
+def queue_occupancy(db: Session, occupancy: Occupancy) -> None:
+    run_after_commit(db, partial(availability_index.apply, occupancy))
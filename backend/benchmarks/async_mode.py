@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import httpx
+
+# Compares sync mode (endpoints hand CRUD work to the threadpool) with async mode (AsyncSession on
+# the event loop) under the same read load: GET /rentals/customer/{id} for a rotating set of
+# customers, each page hydrating --page rentals. Each mode gets its own uvicorn process with one
+# worker on the same database; the database is seeded once and the migrations run before either.
+# The base mode measures the backend at the --baseline git revision, in sync mode, on the same data.
+#
+#   python benchmarks/async_mode.py --database-url postgresql://user@localhost/bench --requests 5000
+#   python benchmarks/async_mode.py --database-url postgresql://user@localhost/bench --modes base,sync --baseline 039612d
+
+parser = argparse.ArgumentParser(description="Compare sync and async mode throughput on a running uvicorn")
+parser.add_argument("--database-url", required=True, help="Database to seed and serve from (PostgreSQL for async mode)")
+parser.add_argument("--requests", type=int, default=5000, help="Timed requests per mode and concurrency level")
+parser.add_argument("--concurrency", default="10,50,200,1000", help="Comma-separated requests in flight at once")
+parser.add_argument("--customers", type=int, default=200, help="Customers to seed")
+parser.add_argument("--page", type=int, default=20, help="Rentals per customer, all returned in one page")
+parser.add_argument("--port", type=int, default=8765, help="Port for the uvicorn under test")
+parser.add_argument("--modes", default="sync,async", help="Comma-separated modes to run: base, sync, async")
+parser.add_argument("--baseline", help="Git revision measured, in sync mode, as the base mode")
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = args.database_url
+os.environ["OVERDUE_SCAN_INTERVAL"] = "0"
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from sqlalchemy import insert
+
+import migrations
+import models
+from database import SessionLocal, engine
+
+
+def seed(customers: int, page: int) -> list:
+    run_id = time.time_ns()
+    with SessionLocal() as db:
+        location = models.Location(name="Bench", address="1 Bench St", city="Bench", state="BS", zip_code="00000")
+        db.add(location)
+        db.flush()
+        vehicle = models.Vehicle(
+            model="Bench", make="Bench", license_plate=f"A{run_id % 10 ** 8}", year=2024,
+            daily_rate=Decimal("50.00"), location_id=location.location_id
+        )
+        db.add(vehicle)
+        db.flush()
+        customer_ids = db.execute(insert(models.Customer).returning(models.Customer.customer_id), [
+            {
+                "first_name": "Bench", "last_name": f"Customer {i}", "email": f"bench-{run_id}-{i}@example.com",
+                "phone": "555-000-0000", "driver_license": f"A{run_id % 10 ** 9}{i:05d}"
+            }
+            for i in range(customers)
+        ]).scalars().all()
+        # Completed, back-to-back two-day rentals in the past, so they never overlap
+        origin = datetime(2000, 1, 1, 10)
+        db.execute(insert(models.Rental), [
+            {
+                "customer_id": customer_id, "vehicle_id": vehicle.vehicle_id,
+                "pickup_location_id": location.location_id, "return_location_id": location.location_id,
+                "start_date": origin + timedelta(days=3 * n), "end_date": origin + timedelta(days=3 * n + 2),
+                "daily_rate": Decimal("50.00"), "total_amount": Decimal("100.00"), "status": "Completed"
+            }
+            for n, customer_id in enumerate(customer_id for customer_id in customer_ids for _ in range(page))
+        ])
+        db.commit()
+    return list(customer_ids)
+
+
+def checkout(revision: str) -> str:
+    # The backend directory as of `revision`, extracted to a temporary directory
+    target = tempfile.mkdtemp(prefix="async-mode-baseline-")
+    archive = subprocess.run(
+        ["git", "archive", revision, "backend"], cwd=os.path.dirname(BACKEND), check=True, capture_output=True
+    )
+    subprocess.run(["tar", "-x", "-C", target], input=archive.stdout, check=True)
+    return os.path.join(target, "backend")
+
+
+def start_server(backend: str, async_mode: bool) -> subprocess.Popen:
+    env = {
+        **os.environ, "DATABASE_ASYNC": "true" if async_mode else "false", "DATABASE_MIGRATE_ON_STARTUP": "false"
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning",
+         "--timeout-keep-alive", "120"],
+        cwd=backend, env=env
+    )
+    for _ in range(120):
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/", timeout=1)
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise SystemExit(f"uvicorn exited with {server.returncode}")
+            time.sleep(0.5)
+    server.terminate()
+    raise SystemExit("uvicorn did not start")
+
+
+async def load(customer_ids: list, requests: int, concurrency: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=120) as client:
+        latencies, errors = [], 0
+        queue = iter(range(requests))
+
+        async def worker() -> None:
+            nonlocal errors
+            for i in queue:
+                path = f"/rentals/customer/{customer_ids[i % len(customer_ids)]}"
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path, params={"limit": args.page})
+                    ok = response.status_code == 200 and len(response.json()) == args.page
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        # Warm up connections on both sides before timing; a server that cannot keep up shows in the timed errors
+        await asyncio.gather(
+            *(client.get(f"/rentals/customer/{customer_ids[0]}") for _ in range(concurrency)), return_exceptions=True
+        )
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return {
+        "rps": requests / elapsed, "p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99),
+        "errors": errors
+    }
+
+
+if __name__ == "__main__":
+    migrations.upgrade()
+    customer_ids = seed(args.customers, args.page)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    print(f"GET /rentals/customer/{{id}}?limit={args.page}, {args.requests} requests per run on {engine.dialect.name}")
+    print(f"{'mode':>6} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    selected = args.modes.split(",")
+    if "base" in selected and not args.baseline:
+        raise SystemExit("The base mode needs --baseline")
+    modes = [
+        (label, checkout(args.baseline) if label == "base" else BACKEND, label == "async")
+        for label in ("base", "sync", "async") if label in selected
+    ]
+    failed = False
+    for label, backend, async_mode in modes:
+        server = start_server(backend, async_mode)
+        try:
+            for concurrency in levels:
+                result = asyncio.run(load(customer_ids, args.requests, concurrency))
+                failed |= result["errors"] > 0
+                print(f"{label:>6} {concurrency:>5} {result['rps']:>8.0f} "
+                      f"{result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+    sys.exit(1 if failed else 0)
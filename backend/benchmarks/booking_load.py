@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import collections
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+
+# Load test for concurrent bookings: hundreds of POST /reservations/ and POST /rentals/ race for a
+# few slots on a few hot vehicles of a running server. Passes when every slot ends up with exactly
+# one stored booking, no slot had two requests accepted and every other request got a 400.
+#
+#   python benchmarks/booking_load.py --url http://localhost:8000 --requests 500 --concurrency 200
+
+
+async def post(client: httpx.AsyncClient, path: str, body: dict) -> dict:
+    response = await client.post(path, json=body)
+    response.raise_for_status()
+    return response.json()
+
+
+async def create_fixtures(client: httpx.AsyncClient, vehicles: int) -> dict:
+    run_id = uuid.uuid4().hex[:6]
+    location = await post(client, "/locations/", {
+        "name": f"Load test {run_id}", "address": "1 Test St", "city": "Test", "state": "TS", "zip_code": "00000"
+    })
+    customer = await post(client, "/customers/", {
+        "first_name": "Load", "last_name": f"Test {run_id}", "email": f"load-{run_id}@example.com",
+        "phone": "555-000-0000", "driver_license": f"LT{run_id}"
+    })
+    vehicle_ids = []
+    for i in range(vehicles):
+        vehicle = await post(client, "/vehicles/", {
+            "model": "Hot", "make": "Load", "license_plate": f"{run_id}{i:03d}"[:10], "year": 2024,
+            "daily_rate": "50.00", "location_id": location["location_id"]
+        })
+        vehicle_ids.append(vehicle["vehicle_id"])
+    return {"location_id": location["location_id"], "customer_id": customer["customer_id"], "vehicle_ids": vehicle_ids}
+
+
+def booking(fixtures: dict, vehicle_id: int, start: datetime, end: datetime, as_rental: bool) -> tuple:
+    common = {
+        "customer_id": fixtures["customer_id"], "vehicle_id": vehicle_id,
+        "pickup_location_id": fixtures["location_id"], "return_location_id": fixtures["location_id"]
+    }
+    if as_rental:
+        return "/rentals/", {
+            **common, "start_date": start.isoformat(), "end_date": end.isoformat(),
+            "daily_rate": "50.00", "total_amount": "100.00"
+        }
+    return "/reservations/", {**common, "reserved_start_date": start.isoformat(), "reserved_end_date": end.isoformat()}
+
+
+async def run(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        fixtures = await create_fixtures(client, args.vehicles)
+        # Non-overlapping two-day slots, far enough ahead not to collide with real data
+        origin = datetime(datetime.now().year + 5, 1, 1, 10)
+        slots = [(origin + timedelta(days=3 * i), origin + timedelta(days=3 * i + 2)) for i in range(args.slots)]
+        targets = [
+            (fixtures["vehicle_ids"][i % args.vehicles], (i // args.vehicles) % args.slots)
+            for i in range(args.requests)
+        ]
+        start_gate = asyncio.Event()
+
+        async def attempt(i: int, vehicle_id: int, slot: int) -> tuple:
+            path, body = booking(fixtures, vehicle_id, *slots[slot], as_rental=i % 2 == 1)
+            await start_gate.wait()
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                status = response.status_code
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            return vehicle_id, slot, status, time.perf_counter() - started
+
+        tasks = [asyncio.create_task(attempt(i, vehicle_id, slot)) for i, (vehicle_id, slot) in enumerate(targets)]
+        await asyncio.sleep(0.1)
+        started = time.perf_counter()
+        start_gate.set()
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        # What the server stored, per (vehicle, slot)
+        stored = collections.Counter()
+        customer_id = fixtures["customer_id"]
+        reservations = (await client.get(f"/reservations/customer/{customer_id}")).json()
+        rentals, cursor = [], None
+        while True:
+            params = {"limit": 100, **({"cursor": cursor} if cursor else {})}
+            response = await client.get(f"/rentals/customer/{customer_id}", params=params)
+            rentals.extend(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        starts = {start.isoformat(): slot for slot, (start, _) in enumerate(slots)}
+        for row in reservations:
+            stored[row["vehicle_id"], starts.get(row["reserved_start_date"])] += 1
+        for row in rentals:
+            stored[row["vehicle_id"], starts.get(row["start_date"])] += 1
+
+    outcomes = collections.defaultdict(collections.Counter)
+    for vehicle_id, slot, status, _ in results:
+        outcomes[vehicle_id, slot][status] += 1
+    latencies = sorted(latency for *_, latency in results)
+    statuses = collections.Counter(status for _, _, status, _ in results)
+    print(f"{args.requests} bookings for {args.vehicles} vehicles x {args.slots} slots, "
+          f"concurrency {args.concurrency}: {elapsed:.2f} s, {args.requests / elapsed:.0f} req/s")
+    print(f"statuses {dict(statuses)}; p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} ms")
+
+    # A request lost to a transport error has an unknown outcome, so the stored bookings decide
+    failures = []
+    for key, counts in sorted(outcomes.items()):
+        unexpected = {status: count for status, count in counts.items() if isinstance(status, int) and status not in (201, 400)}
+        if counts[201] > 1 or unexpected:
+            failures.append(f"vehicle {key[0]} slot {key[1]}: {dict(counts)}")
+        if stored[key] != 1:
+            failures.append(f"vehicle {key[0]} slot {key[1]}: {stored[key]} bookings stored")
+    for failure in failures:
+        print("FAIL", failure)
+    if not failures:
+        print(f"OK: exactly one winner for each of {len(outcomes)} slots")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Race concurrent bookings for hot vehicles against a running server")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the API")
+    parser.add_argument("--requests", type=int, default=500, help="Booking requests in total")
+    parser.add_argument("--concurrency", type=int, default=200, help="Requests in flight at once")
+    parser.add_argument("--vehicles", type=int, default=2, help="Hot vehicles the requests compete for")
+    parser.add_argument("--slots", type=int, default=5, help="Bookable slots per vehicle")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    sys.exit(asyncio.run(run(parser.parse_args())))
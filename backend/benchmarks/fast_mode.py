@@ -0,0 +1,90 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Compares the default and fast (?fast=true) response modes of GET /payments/failed on a table of
+# failed payments, in process through TestClient so only the app's own work is timed. Uses a
+# throwaway SQLite database unless --database-url is given; either way it inserts --rows payments.
+#
+#   python benchmarks/fast_mode.py --rows 10000 --runs 5
+
+parser = argparse.ArgumentParser(description="Time the default and fast response modes on a large list endpoint")
+parser.add_argument("--rows", type=int, default=10000, help="Failed payments to insert")
+parser.add_argument("--runs", type=int, default=5, help="Timed requests per mode")
+parser.add_argument("--database-url", help="Database to use instead of a temporary SQLite file")
+args = parser.parse_args()
+
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/fast_mode.db"
+os.environ["OVERDUE_SCAN_INTERVAL"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import main
+import migrations
+import models
+from database import SessionLocal, engine
+
+
+def seed(rows: int) -> None:
+    with SessionLocal() as db:
+        location = models.Location(name="Bench", address="1 Bench St", city="Bench", state="BS", zip_code="00000")
+        customer = models.Customer(
+            first_name="Bench", last_name="Mark", email=f"bench-{time.time_ns()}@example.com", phone="555-000-0000",
+            driver_license=f"B{time.time_ns() % 10 ** 12}"
+        )
+        db.add_all([location, customer])
+        db.flush()
+        vehicle = models.Vehicle(
+            model="Bench", make="Bench", license_plate=f"B{time.time_ns() % 10 ** 8}", year=2024,
+            daily_rate=Decimal("50.00"), location_id=location.location_id
+        )
+        db.add(vehicle)
+        db.flush()
+        start = datetime(2024, 1, 1, 10)
+        rental = models.Rental(
+            customer_id=customer.customer_id, vehicle_id=vehicle.vehicle_id, pickup_location_id=location.location_id,
+            return_location_id=location.location_id, start_date=start, end_date=start + timedelta(days=2),
+            daily_rate=Decimal("50.00"), total_amount=Decimal("100.00"), status="Completed"
+        )
+        db.add(rental)
+        db.flush()
+        db.execute(insert(models.Payment), [
+            {
+                "rental_id": rental.rental_id, "payment_date": start + timedelta(minutes=i), "amount": Decimal("100.00"),
+                "method": "Credit Card", "transaction_id": f"txn-{i:08d}", "status": "Failed", "payment_type": "Rental"
+            }
+            for i in range(rows)
+        ])
+        db.commit()
+
+
+def timed(client: TestClient, params: dict, runs: int) -> tuple:
+    body = client.get("/payments/failed", params=params).content  # warm-up
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get("/payments/failed", params=params)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+    return body, timings
+
+
+if __name__ == "__main__":
+    migrations.upgrade()
+    seed(args.rows)
+    with TestClient(main.app) as client:
+        default_body, default_ms = timed(client, {}, args.runs)
+        fast_body, fast_ms = timed(client, {"fast": "true"}, args.runs)
+    print(f"GET /payments/failed, {args.rows} rows, {args.runs} runs per mode on {engine.dialect.name}")
+    for mode, timings in (("default", default_ms), ("fast", fast_ms)):
+        print(f"{mode:>8}: mean {statistics.mean(timings):7.1f} ms, min {min(timings):7.1f} ms")
+    print(f"speedup {statistics.mean(default_ms) / statistics.mean(fast_ms):.2f}x; "
+          f"bodies {'identical' if default_body == fast_body else 'DIFFER'} ({len(default_body)} bytes)")
+    sys.exit(0 if default_body == fast_body else 1)
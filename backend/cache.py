@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+PENDING_CHANGES_KEY = "after_commit_pending"
+
+
+# In-memory state derived from the database is only updated once the writing
+# transaction commits; a rollback discards the queued changes
+def run_after_commit(db: Session, change: Callable[[], None]) -> None:
+    db.info.setdefault(PENDING_CHANGES_KEY, []).append(change)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_changes(session: Session) -> None:
+    for change in session.info.pop(PENDING_CHANGES_KEY, []):
+        change()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_changes(session: Session) -> None:
+    session.info.pop(PENDING_CHANGES_KEY, None)
+
+
+# Small thread-safe cache whose entries expire after a fixed time-to-live. With a maxsize it
+# also evicts the least recently used entry once full.
+class TTLCache:
+    def __init__(self, ttl: float, maxsize: Optional[int] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        # Bumped by every invalidation; a value computed across an invalidation is not stored,
+        # so a read that raced a write cannot put the old rows back
+        self._generation = 0
+
+    # With store=False a miss is computed but not kept, for values read from a source that may be
+    # older than what the cache has already been invalidated for
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], store: bool = True) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        value = factory()
+        if not store:
+            return value
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                if self.maxsize is not None:
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Hashable = None) -> None:
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl
+            }
@@ -1,39 +1,287 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, func, desc, asc
+from sqlalchemy.orm import Session, aliased, joinedload, make_transient_to_detached
+from sqlalchemy import and_, or_, func, desc, asc, select, event, insert, update, literal_column, case, text, Date
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.inspection import inspect
-from typing import List, Optional, Dict, Any
-from datetime import datetime, date
-from decimal import Decimal
+from typing import List, Optional, Dict, Any, Callable, Iterable, Iterator
+from datetime import datetime, date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import partial
+from contextlib import ExitStack, contextmanager
+from itertools import chain
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
 
 import models as models
 import schemas as schema
+from cache import TTLCache, run_after_commit
+from database import is_replica, unit_of_work
+from customer_search import customer_search_index, normalize_phone
+from customer_leaderboard import customer_location, latest_completed_rentals, spending_leaderboard
+from vehicle_facets import vehicle_facet_index, facet_values, FIELDS as FACET_FIELDS
+from availability import (
+    Occupancy, availability_index, occupancy_for, queue_occupancy,
+    BLOCKING_RESERVATION_STATUSES, BLOCKING_RENTAL_STATUSES, BLOCKING_MAINTENANCE_STATUSES
+)
+
+# Bookings for one vehicle are serialized by a row lock on Vehicle (across workers) and a
+# striped in-process lock (within a worker, and on backends without SELECT ... FOR UPDATE)
+VEHICLE_LOCK_STRIPES = 64
+# Attempts per booking and the backoff step between them, in seconds
+BOOKING_ATTEMPTS = 3
+BOOKING_RETRY_DELAY = 0.05
+# Longest a booking waits for another request's lock on the vehicle row, in seconds (PostgreSQL)
+BOOKING_LOCK_TIMEOUT = float(os.getenv("BOOKING_LOCK_TIMEOUT", "2"))
+
+# Rows per INSERT batch and values per IN lookup for bulk imports
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+# "database" (pg_trgm), "memory" (in-process n-gram index) or "auto" to pick by dialect
+CUSTOMER_SEARCH_BACKEND = os.getenv("CUSTOMER_SEARCH_BACKEND", "auto")
+
+_vehicle_locks = [threading.Lock() for _ in range(VEHICLE_LOCK_STRIPES)]
+# Same striping for async mode, where bookings are coroutines on one thread
+_async_vehicle_locks = [asyncio.Lock() for _ in range(VEHICLE_LOCK_STRIPES)]
+
+def booking_stripes(vehicle_ids: Iterable[int]) -> List[int]:
+    # Taken in ascending order, so writes that lock several vehicles cannot deadlock each other
+    return sorted({vehicle_id % VEHICLE_LOCK_STRIPES for vehicle_id in vehicle_ids})
+
+def async_booking_locks(vehicle_ids: Iterable[int]) -> List[asyncio.Lock]:
+    return [_async_vehicle_locks[stripe] for stripe in booking_stripes(vehicle_ids)]
+
+# SQLite ignores FOR UPDATE, so there the stripe lock is all that serializes bookings of a vehicle
+def holds_row_locks(db: Session) -> bool:
+    return db.get_bind().dialect.name != "sqlite"
+
+@contextmanager
+def vehicle_booking_lock(db: Session, vehicle_id: int):
+    with vehicles_booking_lock(db, [vehicle_id]) as vehicles:
+        yield vehicles.get(vehicle_id)
+
+# Stripe locks, then the Vehicle rows, both in ascending order; yields the locked vehicles by id
+@contextmanager
+def vehicles_booking_lock(db: Session, vehicle_ids: Iterable[int]) -> Iterator[Dict[int, models.Vehicle]]:
+    vehicle_ids = sorted(set(vehicle_ids))
+    with ExitStack() as stack:
+        for stripe in booking_stripes(vehicle_ids):
+            stack.enter_context(_vehicle_locks[stripe])
+        if db.get_bind().dialect.name == "postgresql":
+            # A booking waiting on an uncommitted one fails with a retryable lock timeout instead
+            # of holding its thread until that request commits
+            db.execute(text(f"SET LOCAL lock_timeout = {int(BOOKING_LOCK_TIMEOUT * 1000)}"))
+        yield {
+            vehicle.vehicle_id: vehicle for vehicle in db.query(models.Vehicle).filter(
+                models.Vehicle.vehicle_id.in_(vehicle_ids)
+            ).order_by(models.Vehicle.vehicle_id).with_for_update()
+        }
+
+# End a write: commit and reload the rows, or in unit-of-work mode just flush. Flushed rows are
+# already current, since INSERTs and UPDATEs return server-generated values with RETURNING.
+def save(db: Session, *objs: models.Base) -> None:
+    if unit_of_work(db):
+        db.flush()
+        return
+    db.commit()
+    for obj in objs:
+        db.refresh(obj)
+
+# Errors a booking can succeed after on retry: overlap-constraint violations, serialization
+# failures, deadlocks and lock timeouts (PostgreSQL SQLSTATEs, MySQL error codes, SQLite busy)
+RETRYABLE_SQLSTATES = ("23P01", "40001", "40P01", "55P03")
+RETRYABLE_MYSQL_ERRORS = (1205, 1213)
+RETRYABLE_SQLITE_ERRORS = ("SQLITE_BUSY", "SQLITE_LOCKED")
+
+def is_retryable(exc: DBAPIError) -> bool:
+    orig = exc.orig
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if sqlstate is not None:
+        return sqlstate in RETRYABLE_SQLSTATES
+    if getattr(orig, "sqlite_errorname", None) in RETRYABLE_SQLITE_ERRORS:
+        return True
+    return bool(orig.args) and orig.args[0] in RETRYABLE_MYSQL_ERRORS
+
+def book_vehicle(db: Session, *, vehicle_id: int, start_date: datetime, end_date: datetime,
+                 create: Callable[[models.Vehicle], Optional[models.Base]],
+                 exclude: Optional[tuple] = None,
+                 on_booked: Optional[Callable[[Session, models.Base], None]] = None) -> Optional[models.Base]:
+    # Check and insert under the vehicle lock in one transaction. A retryable error rolls back
+    # and propagates so the caller can back off and call again (see main.run_booking); any other
+    # integrity error is a bad request. on_booked writes anything that has to commit together with
+    # the booking, such as the stored Idempotency-Key response.
+    try:
+        with vehicle_booking_lock(db, vehicle_id) as vehicle:
+            if vehicle is None or vehicle_occupancy.has_conflict(
+                db, vehicle_id=vehicle_id, start_date=start_date, end_date=end_date, exclude=exclude
+            ):
+                db.rollback()
+                return None
+            booking = create(vehicle)
+            if booking is None:
+                db.rollback()
+                return None
+            if on_booked is not None:
+                on_booked(db, booking)
+            # The booking has to be visible to the next check before the vehicle is unlocked. The
+            # row lock from FOR UPDATE lasts until the request commits; without one (SQLite) the
+            # booking commits here, before the stripe lock is released, even in unit-of-work mode.
+            if unit_of_work(db) and not holds_row_locks(db):
+                db.commit()
+            return booking
+    except DBAPIError as exc:
+        db.rollback()
+        if isinstance(exc, IntegrityError) and not is_retryable(exc):
+            raise ValueError(f"Booking rejected by the database: {exc.orig}") from exc
+        raise
+
+# Raised by a batch change that would double-book; ids are the rows that overlap a booking or
+# each other
+class BookingConflict(Exception):
+    def __init__(self, ids: List[Any]):
+        super().__init__(f"Overlapping bookings: {ids}")
+        self.ids = ids
+
+def book_vehicles(db: Session, *, vehicle_ids: Iterable[int], book: Callable[[], Any]) -> Any:
+    # book_vehicle for writes that can book several vehicles at once, such as batch status
+    # changes: book runs under the lock of every vehicle and raises BookingConflict instead of
+    # inserting an overlap. Errors roll back and propagate as in book_vehicle.
+    try:
+        with vehicles_booking_lock(db, vehicle_ids):
+            result = book()
+            if unit_of_work(db) and not holds_row_locks(db):
+                db.commit()
+            return result
+    except BookingConflict:
+        db.rollback()
+        raise
+    except DBAPIError as exc:
+        db.rollback()
+        if isinstance(exc, IntegrityError) and not is_retryable(exc):
+            raise ValueError(f"Booking rejected by the database: {exc.orig}") from exc
+        raise
+
+# A page of rows plus the keyset cursor for the page that follows it (None on the last page)
+class Page(list):
+    def __init__(self, items=(), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+# Cursors are opaque to clients: url-safe base64 of the JSON-encoded (sort key, primary key)
+def encode_cursor(values: List[Any]) -> str:
+    payload = json.dumps([value.isoformat() if isinstance(value, (datetime, date)) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: List[Any]) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if value is not None and python_type in (datetime, date):
+                value = python_type.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
 
 # Base CRUD class
 class CRUDBase:
-    def __init__(self, model):
+    def __init__(self, model, cache: Optional[TTLCache] = None):
         self.model = model
         self.pk = inspect(model).primary_key[0].name
+        # Optional read-through cache for get/get_multi; cleared after any write through this instance
+        self.cache = cache
     
     def get(self, db: Session, id: Any) -> Optional[models.Base]:
-        return db.query(self.model).filter(getattr(self.model, self.pk) == id).first()
+        return self.cached(db, ("get", id), lambda: db.query(self.model).filter(getattr(self.model, self.pk) == id).first())
+    
+    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        return self.cached(
+            db, ("get_multi", skip, limit, cursor),
+            lambda: self.paginate(db.query(self.model), skip=skip, limit=limit, cursor=cursor)
+        )
+    
+    def get_multi_rows(self, db: Session, *, columns: List[Any], skip: int = 0, limit: int = 100,
+                       cursor: Optional[str] = None) -> Page:
+        # Column-only get_multi returning Row tuples, for responses that skip ORM objects entirely
+        return self.paginate(db.query(*columns), skip=skip, limit=limit, cursor=cursor)
     
-    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[models.Base]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+    def cached(self, db: Session, key: Any, load: Callable[[], Any]) -> Any:
+        # Rows are cached as detached snapshots and merged into the caller's session without a
+        # query, so every request gets its own instance and can update it as usual
+        if self.cache is None:
+            return load()
+        snapshot = self.cache.get_or_set(key, lambda: self._snapshot(load()), store=not is_replica(db))
+        if isinstance(snapshot, Page):
+            return Page([db.merge(row, load=False) for row in snapshot], snapshot.next_cursor)
+        if isinstance(snapshot, list):
+            return [db.merge(row, load=False) for row in snapshot]
+        return db.merge(snapshot, load=False) if snapshot is not None else None
+    
+    def _snapshot(self, result: Any) -> Any:
+        def detach(obj):
+            copy = self.model(**{attr.key: getattr(obj, attr.key) for attr in inspect(self.model).column_attrs})
+            make_transient_to_detached(copy)
+            return copy
+        
+        if isinstance(result, Page):
+            return Page([detach(row) for row in result], result.next_cursor)
+        if isinstance(result, list):
+            return [detach(row) for row in result]
+        return detach(result) if result is not None else None
+    
+    def invalidate_cache(self, db: Session) -> None:
+        if self.cache is not None:
+            run_after_commit(db, self.cache.invalidate)
+    
+    def paginate(self, query, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                 sort_column=None, descending: bool = False) -> Page:
+        # Rows are ordered by (sort_column, pk). With a cursor the page starts right after the
+        # encoded key instead of at an offset, so deep pages cost the same as the first one.
+        pk_column = getattr(self.model, self.pk)
+        columns = [sort_column, pk_column] if sort_column is not None else [pk_column]
+        order = desc if descending else asc
+        
+        if cursor:
+            values = decode_cursor(cursor, columns)
+            after = None
+            for column, value in reversed(list(zip(columns, values))):
+                beyond = column < value if descending else column > value
+                after = beyond if after is None else or_(beyond, and_(column == value, after))
+            query = query.filter(after)
+        
+        query = query.order_by(*[order(column) for column in columns])
+        if skip and not cursor:
+            query = query.offset(skip)
+        rows = query.limit(limit).all()
+        next_cursor = None
+        if rows and len(rows) == limit:
+            next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+        return Page(rows, next_cursor)
     
     def create(self, db: Session, *, obj_in: schema.BaseModel) -> models.Base:
         obj_data = obj_in.model_dump()
         db_obj = self.model(**obj_data)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        self.on_write(db, db_obj)
+        self.invalidate_cache(db)
+        save(db, db_obj)
         return db_obj
     
     def update(self, db: Session, *, db_obj: models.Base, obj_in: schema.BaseModel) -> models.Base:
         obj_data = obj_in.model_dump(exclude_unset=True)
         for field, value in obj_data.items():
             setattr(db_obj, field, value)
-        db.commit()
-        db.refresh(db_obj)
+        self.on_write(db, db_obj)
+        self.invalidate_cache(db)
+        save(db, db_obj)
         return db_obj
     
     def delete(self, db: Session, *, id: Any) -> models.Base:
@@ -44,9 +292,251 @@ class CRUDBase:
         # return obj
         obj = db.query(self.model).filter(getattr(self.model, self.pk) == id).first()
         if obj:
+            self.on_delete(db, obj)
+            self.invalidate_cache(db)
             db.delete(obj)
-            db.commit()
+            save(db)
         return obj
+    
+    def existing_values(self, db: Session, column: Any, values: Iterable[Any]) -> set:
+        # Which of the values are already stored, with one IN query per chunk instead of one per value
+        values = list(values)
+        found = set()
+        for start in range(0, len(values), IMPORT_BATCH_SIZE):
+            found.update(value for (value,) in db.query(column).filter(column.in_(values[start:start + IMPORT_BATCH_SIZE])))
+        return found
+    
+    def bulk_create(self, db: Session, *, rows: List[Dict[str, Any]], batch_size: int = IMPORT_BATCH_SIZE) -> List[int]:
+        # Batched executemany INSERTs returning the new keys in row order. No objects are flushed,
+        # so the derived state that flush events would maintain is updated here instead.
+        statement = insert(self.model).returning(getattr(self.model, self.pk), sort_by_parameter_order=True)
+        ids = []
+        for start in range(0, len(rows), batch_size):
+            ids.extend(db.scalars(statement, rows[start:start + batch_size]))
+        self.on_bulk_create(db, ids, rows)
+        self.invalidate_cache(db)
+        if issubclass(self.model, DashboardSummary.source_models):
+            run_after_commit(db, dashboard.invalidate)
+        save(db)
+        return ids
+    
+    def vehicle_ids(self, db: Session, *, ids: List[Any]) -> List[int]:
+        # Vehicles the listed rows are booked on, for models with a vehicle_id
+        return sorted({
+            vehicle_id for vehicle_id, in db.query(self.model.vehicle_id).filter(getattr(self.model, self.pk).in_(ids))
+        })
+    
+    def book_many(self, db: Session, *, ids: List[Any], values: Dict[str, Any], vehicle_ids: List[int]) -> List[models.Base]:
+        # update_many for changes that can make rows block their vehicles again (say, back from
+        # Cancelled): it runs under the vehicles' booking locks and overlaps raise BookingConflict
+        return book_vehicles(db, vehicle_ids=vehicle_ids, book=lambda: self.update_many(db, ids=ids, values=values))
+    
+    def update_many(self, db: Session, *, ids: List[Any], values: Dict[str, Any]) -> List[models.Base]:
+        # One UPDATE ... RETURNING for every listed row; missing ids are skipped. As with
+        # bulk_create no objects are flushed, so on_bulk_update maintains the derived state, and
+        # the rows come back as detached copies that stay loaded after the commit.
+        statement = update(self.model).where(getattr(self.model, self.pk).in_(ids)).values(**values).returning(self.model)
+        rows = db.scalars(statement, execution_options={"synchronize_session": False}).all()
+        self.on_bulk_update(db, rows)
+        self.invalidate_cache(db)
+        if rows and issubclass(self.model, DashboardSummary.source_models):
+            run_after_commit(db, dashboard.invalidate)
+        updated = self._snapshot(rows)
+        save(db)
+        return updated
+    
+    # Hooks for derived state kept alongside a row; they run inside the write's transaction
+    def on_write(self, db: Session, db_obj: models.Base) -> None:
+        pass
+    
+    def on_delete(self, db: Session, db_obj: models.Base) -> None:
+        pass
+    
+    def on_bulk_create(self, db: Session, ids: List[int], rows: List[Dict[str, Any]]) -> None:
+        pass
+    
+    def on_bulk_update(self, db: Session, db_objs: List[models.Base]) -> None:
+        pass
+
+# Occupancy timeline operations
+class CRUDVehicleOccupancy(CRUDBase):
+    def sync(self, db: Session, source: models.Base) -> None:
+        db.flush()
+        occupancy = occupancy_for(source)
+        row = db.query(models.VehicleOccupancy).filter(
+            and_(
+                models.VehicleOccupancy.source_type == occupancy.source_type,
+                models.VehicleOccupancy.source_id == occupancy.source_id
+            )
+        ).first()
+        if occupancy.blocking:
+            if row is None:
+                row = models.VehicleOccupancy(source_type=occupancy.source_type, source_id=occupancy.source_id)
+                db.add(row)
+            row.vehicle_id = occupancy.vehicle_id
+            row.start_time = occupancy.start
+            row.end_time = occupancy.end
+        elif row is not None:
+            db.delete(row)
+        queue_occupancy(db, occupancy)
+    
+    def sync_many(self, db: Session, sources: List[models.Base]) -> None:
+        # Set-based sync: drop the sources' rows and re-insert the ones that still block
+        occupancies = [occupancy_for(source) for source in sources]
+        for source_type in {occupancy.source_type for occupancy in occupancies}:
+            db.query(models.VehicleOccupancy).filter(
+                and_(
+                    models.VehicleOccupancy.source_type == source_type,
+                    models.VehicleOccupancy.source_id.in_(
+                        [occupancy.source_id for occupancy in occupancies if occupancy.source_type == source_type]
+                    )
+                )
+            ).delete(synchronize_session=False)
+        conflicts = self.overlapping(db, [occupancy for occupancy in occupancies if occupancy.blocking])
+        if conflicts:
+            raise BookingConflict(conflicts)
+        blocking = [
+            {
+                "vehicle_id": occupancy.vehicle_id,
+                "source_type": occupancy.source_type,
+                "source_id": occupancy.source_id,
+                "start_time": occupancy.start,
+                "end_time": occupancy.end,
+            }
+            for occupancy in occupancies if occupancy.blocking
+        ]
+        if blocking:
+            db.execute(insert(models.VehicleOccupancy), blocking)
+        for occupancy in occupancies:
+            queue_occupancy(db, occupancy)
+    
+    def overlapping(self, db: Session, occupancies: List[Occupancy]) -> List[Any]:
+        # Source ids of the occupancies that overlap one already on the timeline or each other
+        conflicts = {
+            occupancy.source_id for occupancy in occupancies if self.has_conflict(
+                db, vehicle_id=occupancy.vehicle_id, start_date=occupancy.start, end_date=occupancy.end
+            )
+        }
+        latest = None
+        for occupancy in sorted(occupancies, key=lambda occupancy: (occupancy.vehicle_id, occupancy.start)):
+            if latest is not None and latest.vehicle_id == occupancy.vehicle_id and occupancy.start < latest.end:
+                conflicts.update((latest.source_id, occupancy.source_id))
+            if latest is None or latest.vehicle_id != occupancy.vehicle_id or occupancy.end > latest.end:
+                latest = occupancy
+        return sorted(conflicts)
+    
+    def remove(self, db: Session, source: models.Base) -> None:
+        occupancy = occupancy_for(source)._replace(blocking=False)
+        db.query(models.VehicleOccupancy).filter(
+            and_(
+                models.VehicleOccupancy.source_type == occupancy.source_type,
+                models.VehicleOccupancy.source_id == occupancy.source_id
+            )
+        ).delete(synchronize_session=False)
+        queue_occupancy(db, occupancy)
+    
+    def has_conflict(self, db: Session, *, vehicle_id: int, start_date: datetime, end_date: datetime,
+                     exclude: Optional[tuple] = None) -> bool:
+        query = db.query(models.VehicleOccupancy.occupancy_id).filter(
+            and_(
+                models.VehicleOccupancy.vehicle_id == vehicle_id,
+                models.VehicleOccupancy.start_time < end_date,
+                models.VehicleOccupancy.end_time > start_date
+            )
+        )
+        if exclude is not None:
+            query = query.filter(
+                or_(
+                    models.VehicleOccupancy.source_type != exclude[0],
+                    models.VehicleOccupancy.source_id != exclude[1]
+                )
+            )
+        return db.query(query.exists()).scalar()
+    
+    def get_intervals_in_window(self, db: Session, *, start_date: datetime, end_date: datetime,
+                                location_id: Optional[int] = None) -> List[tuple]:
+        query = db.query(
+            models.VehicleOccupancy.vehicle_id,
+            models.VehicleOccupancy.start_time,
+            models.VehicleOccupancy.end_time
+        ).filter(
+            and_(
+                models.VehicleOccupancy.start_time < end_date,
+                models.VehicleOccupancy.end_time > start_date
+            )
+        )
+        if location_id is not None:
+            query = query.join(models.Vehicle).filter(models.Vehicle.location_id == location_id)
+        return query.all()
+    
+    def backfill(self, db: Session, *, batch_size: int = 1000) -> int:
+        # Populate the timeline from existing rows; used when the table is first introduced
+        if db.query(models.VehicleOccupancy.occupancy_id).first() is not None:
+            return 0
+        sources = [
+            db.query(models.Reservation).filter(models.Reservation.status.in_(BLOCKING_RESERVATION_STATUSES)),
+            db.query(models.Rental).filter(models.Rental.status.in_(BLOCKING_RENTAL_STATUSES)),
+            db.query(models.MaintenanceSchedule).filter(models.MaintenanceSchedule.status.in_(BLOCKING_MAINTENANCE_STATUSES)),
+        ]
+        count = 0
+        batch = []
+        for query in sources:
+            for source in query.yield_per(batch_size):
+                occupancy = occupancy_for(source)
+                batch.append({
+                    "vehicle_id": occupancy.vehicle_id,
+                    "source_type": occupancy.source_type,
+                    "source_id": occupancy.source_id,
+                    "start_time": occupancy.start,
+                    "end_time": occupancy.end,
+                })
+                if len(batch) >= batch_size:
+                    db.bulk_insert_mappings(models.VehicleOccupancy, batch)
+                    count += len(batch)
+                    batch = []
+        if batch:
+            db.bulk_insert_mappings(models.VehicleOccupancy, batch)
+            count += len(batch)
+        db.commit()
+        availability_index.reset()
+        return count
+    
+    def find_overlaps(self, db: Session, *, limit: int = 100) -> List[tuple]:
+        # Pairs of occupancy rows that overlap on the same vehicle, as
+        # (vehicle_id, source_type, source_id, other_source_type, other_source_id)
+        first = aliased(models.VehicleOccupancy)
+        second = aliased(models.VehicleOccupancy)
+        return db.query(
+            first.vehicle_id, first.source_type, first.source_id, second.source_type, second.source_id
+        ).join(
+            second,
+            and_(
+                second.vehicle_id == first.vehicle_id,
+                second.occupancy_id > first.occupancy_id,
+                second.start_time < first.end_time,
+                second.end_time > first.start_time
+            )
+        ).order_by(first.vehicle_id, first.start_time, second.start_time).limit(limit).all()
+    
+    def add_overlap_constraint(self, db: Session) -> List[tuple]:
+        # Adds the PostgreSQL exclusion constraint once the timeline has no overlaps. Returns the
+        # overlapping rows that keep it from being added; they have to be resolved by hand, and
+        # until then bookings are still checked under the vehicle lock.
+        if db.get_bind().dialect.name != "postgresql":
+            return []
+        exists = db.execute(
+            text("SELECT 1 FROM pg_constraint WHERE conname = :name"),
+            {"name": models.VEHICLE_OCCUPANCY_OVERLAP_CONSTRAINT}
+        ).first()
+        if exists is not None:
+            return []
+        overlaps = self.find_overlaps(db)
+        if overlaps:
+            db.rollback()
+            return overlaps
+        db.execute(models.vehicle_occupancy_overlap_ddl)
+        db.commit()
+        return []
 
 # Customer CRUD operations
 class CRUDCustomer(CRUDBase):
@@ -62,34 +552,160 @@ class CRUDCustomer(CRUDBase):
             joinedload(models.Customer.vehicle_preferences)
         ).filter(models.Customer.customer_id == customer_id).first()
     
+    def on_write(self, db: Session, db_obj: models.Customer) -> None:
+        db.flush()
+        run_after_commit(db, partial(
+            customer_search_index.upsert,
+            db_obj.customer_id, db_obj.first_name, db_obj.last_name, db_obj.email, db_obj.phone
+        ))
+    
+    def on_delete(self, db: Session, db_obj: models.Customer) -> None:
+        run_after_commit(db, partial(customer_search_index.remove, db_obj.customer_id))
+        run_after_commit(db, partial(spending_leaderboard.remove, db_obj.customer_id))
+    
+    def on_bulk_create(self, db: Session, ids: List[int], rows: List[Dict[str, Any]]) -> None:
+        def index():
+            for customer_id, row in zip(ids, rows):
+                customer_search_index.upsert(customer_id, row["first_name"], row["last_name"], row["email"], row["phone"])
+        run_after_commit(db, index)
+    
     def search_customers(self, db: Session, *, search_term: str, skip: int = 0, limit: int = 100) -> List[models.Customer]:
-        return db.query(models.Customer).filter(
-            or_(
-                models.Customer.first_name.ilike(f"%{search_term}%"),
-                models.Customer.last_name.ilike(f"%{search_term}%"),
-                models.Customer.email.ilike(f"%{search_term}%"),
-                models.Customer.phone.ilike(f"%{search_term}%")
-            )
+        # PostgreSQL answers from its pg_trgm indexes; elsewhere the in-process n-gram index does
+        backend = CUSTOMER_SEARCH_BACKEND
+        if backend == "auto":
+            backend = "database" if db.get_bind().dialect.name == "postgresql" else "memory"
+        if backend == "database":
+            return self._search_database(db, search_term=search_term, skip=skip, limit=limit)
+        
+        customer_search_index.ensure_loaded(db)
+        customer_ids = customer_search_index.search(search_term, skip=skip, limit=limit)
+        if not customer_ids:
+            return []
+        customers = {
+            customer.customer_id: customer
+            for customer in db.query(models.Customer).filter(models.Customer.customer_id.in_(customer_ids))
+        }
+        return [customers[customer_id] for customer_id in customer_ids if customer_id in customers]
+    
+    def _search_database(self, db: Session, *, search_term: str, skip: int, limit: int) -> List[models.Customer]:
+        term = search_term.strip().lower()
+        digits = normalize_phone(search_term)
+        # Literal arguments so the expression matches the phone-digits index definition
+        phone_digits = func.regexp_replace(
+            models.Customer.phone, literal_column("'[^0-9]'"), literal_column("''"), literal_column("'g'")
+        )
+        conditions = [
+            models.Customer.first_name.icontains(term, autoescape=True),
+            models.Customer.last_name.icontains(term, autoescape=True),
+            models.Customer.email.icontains(term, autoescape=True)
+        ]
+        similarities = [
+            func.similarity(func.lower(models.Customer.first_name), term),
+            func.similarity(func.lower(models.Customer.last_name), term),
+            func.similarity(func.lower(models.Customer.email), term)
+        ]
+        if digits:
+            conditions.append(phone_digits.contains(digits, autoescape=True))
+            similarities.append(func.similarity(phone_digits, digits))
+        return db.query(models.Customer).filter(or_(*conditions)).order_by(
+            desc(func.greatest(*similarities)),
+            models.Customer.customer_id
         ).offset(skip).limit(limit).all()
     
-    def get_top_customers(self, db: Session, *, limit: int = 10) -> List[models.Customer]:
-        return db.query(models.Customer).join(models.CustomerMembershipProfile).order_by(
-            desc(models.CustomerMembershipProfile.lifetime_spending)
+    def get_top_customers(self, db: Session, *, limit: int = 10, tier: Optional[str] = None,
+                          location_id: Optional[int] = None) -> List[models.Customer]:
+        # Served from the in-memory leaderboard; the database only fetches the customers by key
+        if limit > spending_leaderboard.size:
+            return self._top_customers_database(db, limit=limit, tier=tier, location_id=location_id)
+        spending_leaderboard.ensure_loaded(db)
+        customer_ids = spending_leaderboard.top(limit, tier=tier, location_id=location_id)
+        if not customer_ids:
+            return []
+        customers = {
+            customer.customer_id: customer
+            for customer in db.query(models.Customer).filter(models.Customer.customer_id.in_(customer_ids))
+        }
+        return [customers[customer_id] for customer_id in customer_ids if customer_id in customers]
+    
+    def _top_customers_database(self, db: Session, *, limit: int, tier: Optional[str],
+                                location_id: Optional[int]) -> List[models.Customer]:
+        query = db.query(models.Customer).join(models.CustomerMembershipProfile)
+        if tier is not None:
+            query = query.filter(models.CustomerMembershipProfile.membership_tier == tier)
+        if location_id is not None:
+            query = query.join(models.Rental, models.Rental.customer_id == models.Customer.customer_id).filter(
+                and_(
+                    models.Rental.rental_id.in_(latest_completed_rentals(db).scalar_subquery()),
+                    models.Rental.pickup_location_id == location_id
+                )
+            )
+        return query.order_by(
+            desc(models.CustomerMembershipProfile.lifetime_spending),
+            models.Customer.customer_id
         ).limit(limit).all()
 
 # Vehicle CRUD operations
 class CRUDVehicle(CRUDBase):
-    def get_available_vehicles(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[models.Vehicle]:
+    def on_write(self, db: Session, db_obj: models.Vehicle) -> None:
+        db.flush()
+        run_after_commit(db, partial(availability_index.set_vehicle_location, db_obj.vehicle_id, db_obj.location_id))
+    
+    def on_delete(self, db: Session, db_obj: models.Vehicle) -> None:
+        run_after_commit(db, partial(availability_index.remove_vehicle, db_obj.vehicle_id))
+    
+    def on_bulk_create(self, db: Session, ids: List[int], rows: List[Dict[str, Any]]) -> None:
+        def index():
+            for vehicle_id, row in zip(ids, rows):
+                availability_index.set_vehicle_location(vehicle_id, row["location_id"])
+                vehicle_facet_index.upsert(vehicle_id, tuple(row[field] for field in FACET_FIELDS))
+        run_after_commit(db, index)
+    
+    def on_bulk_update(self, db: Session, db_objs: List[models.Vehicle]) -> None:
+        changes = [(vehicle.vehicle_id, vehicle.location_id, facet_values(vehicle)) for vehicle in db_objs]
+        def index():
+            for vehicle_id, location_id, values in changes:
+                availability_index.set_vehicle_location(vehicle_id, location_id)
+                vehicle_facet_index.upsert(vehicle_id, values)
+        run_after_commit(db, index)
+    
+    def get_by_ids(self, db: Session, *, vehicle_ids: List[int]) -> List[models.Vehicle]:
+        if not vehicle_ids:
+            return []
         return db.query(models.Vehicle).filter(
+            models.Vehicle.vehicle_id.in_(vehicle_ids)
+        ).order_by(models.Vehicle.vehicle_id).all()
+    
+    def get_ids(self, db: Session, *, location_id: Optional[int] = None) -> List[int]:
+        query = db.query(models.Vehicle.vehicle_id)
+        if location_id is not None:
+            query = query.filter(models.Vehicle.location_id == location_id)
+        return [vehicle_id for vehicle_id, in query]
+    
+    def get_dimensions(self, db: Session, *, location_id: Optional[int] = None, make: Optional[str] = None) -> List[tuple]:
+        query = db.query(models.Vehicle.vehicle_id, models.Vehicle.location_id, models.Vehicle.make)
+        if location_id is not None:
+            query = query.filter(models.Vehicle.location_id == location_id)
+        if make is not None:
+            query = query.filter(models.Vehicle.make == make)
+        return query.all()
+    
+    def get_available_between(self, db: Session, *, start_date: datetime, end_date: datetime, location_id: Optional[int] = None) -> List[models.Vehicle]:
+        availability_index.ensure_loaded(db)
+        vehicle_ids = availability_index.available_vehicle_ids(start=start_date, end=end_date, location_id=location_id)
+        return self.get_by_ids(db, vehicle_ids=vehicle_ids)
+    
+    def get_available_vehicles(self, db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        query = db.query(models.Vehicle).filter(
             models.Vehicle.availability == True
-        ).offset(skip).limit(limit).all()
+        )
+        return self.paginate(query, skip=skip, limit=limit, cursor=cursor)
     
     def get_by_license_plate(self, db: Session, *, license_plate: str) -> Optional[models.Vehicle]:
         return db.query(models.Vehicle).filter(
             models.Vehicle.license_plate == license_plate
         ).first()
     
-    def filter_vehicles(self, db: Session, *, filters: schema.VehicleFilters, skip: int = 0, limit: int = 100) -> List[models.Vehicle]:
+    def filter_vehicles(self, db: Session, *, filters: schema.VehicleFilters, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
         query = db.query(models.Vehicle)
         
         if filters.make:
@@ -113,7 +729,17 @@ class CRUDVehicle(CRUDBase):
         if filters.max_daily_rate:
             query = query.filter(models.Vehicle.daily_rate <= filters.max_daily_rate)
         
-        return query.offset(skip).limit(limit).all()
+        return self.paginate(query, skip=skip, limit=limit, cursor=cursor)
+    
+    def filter_vehicles_faceted(self, db: Session, *, filters: schema.VehicleFilters, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+        # Matching ids and facet counts come from the in-memory facet index; only the page is read
+        vehicle_facet_index.ensure_loaded(db)
+        vehicle_ids, facets = vehicle_facet_index.search(filters)
+        return {
+            "total": len(vehicle_ids),
+            "vehicles": self.get_by_ids(db, vehicle_ids=vehicle_ids[skip:skip + limit]),
+            "facets": facets
+        }
     
     def get_with_features(self, db: Session, vehicle_id: int) -> Optional[models.Vehicle]:
         return db.query(models.Vehicle).options(
@@ -126,8 +752,7 @@ class CRUDVehicle(CRUDBase):
         vehicle = db.query(models.Vehicle).filter(models.Vehicle.vehicle_id == vehicle_id).first()
         if vehicle:
             vehicle.availability = available
-            db.commit()
-            db.refresh(vehicle)
+            save(db, vehicle)
         return vehicle
     
     def get_vehicles_needing_maintenance(self, db: Session) -> List[models.Vehicle]:
@@ -135,30 +760,123 @@ class CRUDVehicle(CRUDBase):
             models.VehicleMaintenanceRecord.next_service_due <= date.today()
         ).all()
 
+# Late fee policy: once a rental is LATE_FEE_GRACE_HOURS past its end date, every started day
+# costs LATE_FEE_DAILY_MULTIPLIER x its daily rate, up to LATE_FEE_MAX_DAYS days
+LATE_FEE_GRACE_HOURS = float(os.getenv("LATE_FEE_GRACE_HOURS", "0"))
+LATE_FEE_DAILY_MULTIPLIER = Decimal(os.getenv("LATE_FEE_DAILY_MULTIPLIER", "0.5"))
+LATE_FEE_MAX_DAYS = int(os.getenv("LATE_FEE_MAX_DAYS", "30"))
+# Rentals per UPDATE (and transaction) in the overdue scan
+OVERDUE_BATCH_SIZE = int(os.getenv("OVERDUE_BATCH_SIZE", "1000"))
+
+def late_fee(daily_rate: Decimal, end_date: datetime, returned_at: datetime) -> Decimal:
+    late = returned_at - end_date - timedelta(hours=LATE_FEE_GRACE_HOURS)
+    if late <= timedelta(0):
+        return Decimal("0.00")
+    days = min(-(-late // timedelta(days=1)), LATE_FEE_MAX_DAYS)
+    return (daily_rate * LATE_FEE_DAILY_MULTIPLIER * days).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+def late_fee_expression(now: datetime):
+    # late_fee() as SQL for rentals still out at `now`: one CASE branch per chargeable day,
+    # longest first, so every dialect can evaluate it without date arithmetic. ROUND on decimals
+    # rounds half away from zero like ROUND_HALF_UP, so the scanner and a return charge the same cent.
+    due = now - timedelta(hours=LATE_FEE_GRACE_HOURS)
+    days = case(
+        *((models.Rental.end_date < due - timedelta(days=day - 1), day) for day in range(LATE_FEE_MAX_DAYS, 1, -1)),
+        else_=1
+    )
+    return func.round(models.Rental.daily_rate * LATE_FEE_DAILY_MULTIPLIER * days, 2)
+
+def is_overdue(rental: models.Rental, now: datetime) -> bool:
+    return (rental.status or "Active") == "Active" and rental.actual_return_date is None and rental.end_date < now
+
 # Rental CRUD operations
 class CRUDRental(CRUDBase):
-    def get_active_rentals(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[models.Rental]:
-        return db.query(models.Rental).filter(
+    def on_write(self, db: Session, db_obj: models.Rental) -> None:
+        # Keeps the overdue flag right for returns and extensions; the scanner handles time passing
+        db_obj.is_overdue = is_overdue(db_obj, datetime.now())
+        revenue_rollup.track(db, db_obj)
+        vehicle_occupancy.sync(db, db_obj)
+    
+    def on_delete(self, db: Session, db_obj: models.Rental) -> None:
+        revenue_rollup.track(db, db_obj, deleted=True)
+        vehicle_occupancy.remove(db, db_obj)
+    
+    def get_active_rentals(self, db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        query = db.query(models.Rental).filter(
             models.Rental.status == "Active"
-        ).offset(skip).limit(limit).all()
+        )
+        return self.paginate(query, skip=skip, limit=limit, cursor=cursor)
     
-    def get_customer_rentals(self, db: Session, *, customer_id: int, skip: int = 0, limit: int = 100) -> List[models.Rental]:
-        return db.query(models.Rental).filter(
+    def get_customer_rentals(self, db: Session, *, customer_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        query = db.query(models.Rental).filter(
             models.Rental.customer_id == customer_id
-        ).order_by(desc(models.Rental.created_at)).offset(skip).limit(limit).all()
+        )
+        return self.paginate(query, skip=skip, limit=limit, cursor=cursor, sort_column=models.Rental.created_at, descending=True)
     
     def get_overdue_rentals(self, db: Session) -> List[models.Rental]:
-        return db.query(models.Rental).filter(
-            and_(
-                models.Rental.status == "Active",
-                models.Rental.end_date < datetime.now(),
-                models.Rental.actual_return_date.is_(None)
-            )
+        # Reads the flag kept by scan_overdue, so it lags by up to one scan interval
+        return db.query(models.Rental).filter(models.Rental.is_overdue == True).order_by(
+            models.Rental.end_date, models.Rental.rental_id
         ).all()
     
-    def filter_rentals(self, db: Session, *, filters: schema.RentalFilters, skip: int = 0, limit: int = 100) -> List[models.Rental]:
-        query = db.query(models.Rental)
-        
+    def scan_overdue(self, db: Session) -> Dict[str, int]:
+        # Flags rentals that went overdue, clears the flag on ones that no longer are, and
+        # accrues late fees, each as batched set-based UPDATEs committed per batch
+        now = datetime.now()
+        overdue = and_(
+            models.Rental.status == "Active",
+            models.Rental.actual_return_date.is_(None),
+            models.Rental.end_date < now
+        )
+        fee = late_fee_expression(now)
+        return {
+            "flagged": self._update_in_batches(
+                db, and_(overdue, models.Rental.is_overdue == False), {"is_overdue": True}
+            ),
+            "cleared": self._update_in_batches(
+                db, and_(models.Rental.is_overdue == True, ~overdue), {"is_overdue": False}
+            ),
+            # Fees only grow, so fees entered by hand above the policy are kept
+            "late_fees_accrued": self._update_in_batches(
+                db,
+                and_(
+                    models.Rental.is_overdue == True,
+                    models.Rental.end_date < now - timedelta(hours=LATE_FEE_GRACE_HOURS),
+                    or_(models.Rental.late_fees.is_(None), models.Rental.late_fees < fee)
+                ),
+                {"late_fees": fee}
+            )
+        }
+    
+    def _update_in_batches(self, db: Session, criteria, values: Dict[str, Any]) -> int:
+        # Short transactions: matching ids are walked in key order a batch at a time, and the
+        # criteria are repeated in the UPDATE so rows changed in between are skipped
+        updated = 0
+        last_id = 0
+        while True:
+            ids = [
+                rental_id for rental_id, in db.query(models.Rental.rental_id).filter(
+                    and_(criteria, models.Rental.rental_id > last_id)
+                ).order_by(models.Rental.rental_id).limit(OVERDUE_BATCH_SIZE)
+            ]
+            if not ids:
+                return updated
+            changed = db.query(models.Rental).filter(
+                and_(models.Rental.rental_id.in_(ids), criteria)
+            ).update(values, synchronize_session=False)
+            # Bulk UPDATEs skip the flush hooks, so the dashboard's overdue count is refreshed here
+            if changed:
+                run_after_commit(db, dashboard.invalidate)
+            updated += changed
+            save(db)
+            renew_lease(db)
+            last_id = ids[-1]
+    
+    def filter_rentals(self, db: Session, *, filters: schema.RentalFilters, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        query = self.apply_filters(db.query(models.Rental), filters)
+        return self.paginate(query, skip=skip, limit=limit, cursor=cursor, sort_column=models.Rental.created_at, descending=True)
+    
+    def apply_filters(self, query, filters: schema.RentalFilters):
         if filters.customer_id:
             query = query.filter(models.Rental.customer_id == filters.customer_id)
         if filters.vehicle_id:
@@ -173,8 +891,13 @@ class CRUDRental(CRUDBase):
             query = query.filter(models.Rental.pickup_location_id == filters.pickup_location_id)
         if filters.return_location_id:
             query = query.filter(models.Rental.return_location_id == filters.return_location_id)
-        
-        return query.order_by(desc(models.Rental.created_at)).offset(skip).limit(limit).all()
+        return query
+    
+    def stream_rentals(self, db: Session, *, filters: schema.RentalFilters, columns: List[Any],
+                       batch_size: int = 1000) -> Iterator[Any]:
+        # yield_per streams through a server-side cursor where the driver supports one
+        query = self.apply_filters(db.query(*columns), filters).order_by(models.Rental.rental_id)
+        return query.yield_per(batch_size)
     
     def get_with_details(self, db: Session, rental_id: int) -> Optional[models.Rental]:
         return db.query(models.Rental).options(
@@ -194,7 +917,12 @@ class CRUDRental(CRUDBase):
             rental.mileage_end = return_data.get('mileage_end')
             rental.fuel_level_end = return_data.get('fuel_level_end')
             rental.status = "Completed"
-            rental.late_fees = return_data.get('late_fees', Decimal('0.00'))
+            rental.is_overdue = False
+            # Without fees entered by hand the late fee policy applies, up to the actual return
+            late_fees = return_data.get('late_fees')
+            if late_fees is None:
+                late_fees = late_fee(rental.daily_rate, rental.end_date, rental.actual_return_date)
+            rental.late_fees = late_fees
             rental.damage_fees = return_data.get('damage_fees', Decimal('0.00'))
             
             # Update vehicle availability
@@ -204,10 +932,48 @@ class CRUDRental(CRUDBase):
                 if rental.mileage_end:
                     vehicle.mileage = rental.mileage_end
             
-            db.commit()
-            db.refresh(rental)
+            revenue_rollup.track(db, rental)
+            vehicle_occupancy.sync(db, rental)
+            save(db, rental)
         return rental
     
+    def book(self, db: Session, *, obj_in: schema.RentalCreate,
+             on_booked: Optional[Callable[[Session, models.Rental], None]] = None) -> Optional[models.Rental]:
+        def create(vehicle: models.Vehicle) -> models.Rental:
+            vehicle.availability = False
+            return self.create(db, obj_in=obj_in)
+        
+        return book_vehicle(
+            db,
+            vehicle_id=obj_in.vehicle_id,
+            start_date=obj_in.start_date,
+            end_date=obj_in.end_date,
+            create=create,
+            on_booked=on_booked
+        )
+    
+    def get_intervals_in_window(self, db: Session, *, start_date: datetime, end_date: datetime,
+                                location_id: Optional[int] = None, make: Optional[str] = None) -> List[tuple]:
+        # (vehicle_id, start, end, total_amount) of rentals overlapping the window; a rental
+        # runs until it was returned, or until its end date while still out
+        returned = func.coalesce(models.Rental.actual_return_date, models.Rental.end_date)
+        query = db.query(
+            models.Rental.vehicle_id, models.Rental.start_date, returned, models.Rental.total_amount
+        ).filter(
+            and_(
+                models.Rental.status != "Cancelled",
+                models.Rental.start_date < end_date,
+                returned > start_date
+            )
+        )
+        if location_id is not None or make is not None:
+            query = query.join(models.Vehicle, models.Vehicle.vehicle_id == models.Rental.vehicle_id)
+            if location_id is not None:
+                query = query.filter(models.Vehicle.location_id == location_id)
+            if make is not None:
+                query = query.filter(models.Vehicle.make == make)
+        return query.all()
+    
     def get_rental_revenue(self, db: Session, *, start_date: date, end_date: date) -> Decimal:
         result = db.query(func.sum(models.Rental.total_amount)).filter(
             and_(
@@ -218,61 +984,226 @@ class CRUDRental(CRUDBase):
         ).scalar()
         return result or Decimal('0.00')
 
+# Daily revenue rollups
+REVENUE_MEASURES = ("rental_count", "revenue", "late_fees", "damage_fees")
+REVENUE_PERIODS = ("day", "week", "month")
+# Rental attributes that decide which bucket a rental counts in and how much it adds
+REVENUE_SOURCE_FIELDS = ("status", "start_date", "pickup_location_id", "vehicle_id", "total_amount", "late_fees", "damage_fees")
+UPSERT_INSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+def period_start(day: date, group_by: str) -> date:
+    if group_by == "week":
+        return day - timedelta(days=day.weekday())
+    if group_by == "month":
+        return day.replace(day=1)
+    return day
+
+class CRUDRevenueRollup(CRUDBase):
+    def track(self, db: Session, rental: models.Rental, *, deleted: bool = False) -> None:
+        # Moves the rental's contribution from its old bucket to its new one. Reads the attribute
+        # history, so it has to run before the flush that resets it.
+        state = inspect(rental)
+        before = None if state.pending or state.transient else self._source_values(state, previous=True)
+        after = None if deleted else self._source_values(state, previous=False)
+        if before == after:
+            return
+        deltas = [
+            (values, sign) for values, sign in ((before, -1), (after, 1))
+            if values is not None and values["status"] == "Completed"
+        ]
+        if not deltas:
+            return
+        makes = dict(db.query(models.Vehicle.vehicle_id, models.Vehicle.make).filter(
+            models.Vehicle.vehicle_id.in_({values["vehicle_id"] for values, _ in deltas})
+        ))
+        self.add(db, [
+            {
+                "revenue_date": values["start_date"].date(),
+                "location_id": values["pickup_location_id"],
+                "make": makes.get(values["vehicle_id"], "Unknown"),
+                "rental_count": sign,
+                "revenue": sign * (values["total_amount"] or 0),
+                "late_fees": sign * (values["late_fees"] or 0),
+                "damage_fees": sign * (values["damage_fees"] or 0),
+            }
+            for values, sign in deltas
+        ])
+    
+    def _source_values(self, state, *, previous: bool) -> Dict[str, Any]:
+        values = {}
+        for field in REVENUE_SOURCE_FIELDS:
+            history = state.attrs[field].history
+            values[field] = history.deleted[0] if previous and history.deleted else getattr(state.object, field)
+        return values
+    
+    def add(self, db: Session, deltas: List[Dict[str, Any]]) -> None:
+        # Adds the deltas to their buckets, creating missing ones; a single upsert where the
+        # dialect has ON CONFLICT, otherwise an UPDATE per bucket with an INSERT when none matched
+        merged: Dict[tuple, Dict[str, Any]] = {}
+        for delta in deltas:
+            key = (delta["revenue_date"], delta["location_id"], delta["make"])
+            if key in merged:
+                for measure in REVENUE_MEASURES:
+                    merged[key][measure] += delta[measure]
+            else:
+                merged[key] = dict(delta)
+        table = self.model.__table__
+        upsert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        if upsert is not None:
+            statement = upsert(table).values(list(merged.values()))
+            db.execute(statement.on_conflict_do_update(
+                index_elements=["revenue_date", "location_id", "make"],
+                set_={measure: table.c[measure] + statement.excluded[measure] for measure in REVENUE_MEASURES}
+            ))
+            return
+        for (revenue_date, location_id, make), delta in merged.items():
+            updated = db.execute(update(table).where(
+                and_(table.c.revenue_date == revenue_date, table.c.location_id == location_id, table.c.make == make)
+            ).values({measure: table.c[measure] + delta[measure] for measure in REVENUE_MEASURES})).rowcount
+            if not updated:
+                db.execute(insert(table).values(delta))
+    
+    def rebuild(self, db: Session, *, start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+        # Recomputes the buckets for [start_date, end_date] from Rental with one DELETE and one
+        # INSERT ... SELECT ... GROUP BY; repairs drift from changes made outside the CRUD layer
+        rollup = self.model
+        rental = models.Rental
+        deleted = db.query(rollup)
+        source = db.query(
+            func.date(rental.start_date),
+            rental.pickup_location_id,
+            models.Vehicle.make,
+            func.count(),
+            func.sum(rental.total_amount),
+            func.sum(func.coalesce(rental.late_fees, 0)),
+            func.sum(func.coalesce(rental.damage_fees, 0))
+        ).join(models.Vehicle, models.Vehicle.vehicle_id == rental.vehicle_id).filter(rental.status == "Completed")
+        if start_date is not None:
+            deleted = deleted.filter(rollup.revenue_date >= start_date)
+            source = source.filter(rental.start_date >= start_date)
+        if end_date is not None:
+            deleted = deleted.filter(rollup.revenue_date <= end_date)
+            source = source.filter(rental.start_date < end_date + timedelta(days=1))
+        source = source.group_by(func.date(rental.start_date), rental.pickup_location_id, models.Vehicle.make)
+        deleted.delete(synchronize_session=False)
+        db.execute(insert(rollup).from_select(
+            ["revenue_date", "location_id", "make", *REVENUE_MEASURES], source.subquery().select()
+        ))
+        save(db)
+        query = db.query(func.count()).select_from(rollup)
+        if start_date is not None:
+            query = query.filter(rollup.revenue_date >= start_date)
+        if end_date is not None:
+            query = query.filter(rollup.revenue_date <= end_date)
+        return query.scalar()
+    
+    def backfill(self, db: Session) -> int:
+        # Fills the table on first start; an empty table means nothing was rolled up yet
+        if db.query(self.model.revenue_date).first() is not None:
+            return 0
+        return self.rebuild(db)
+    
+    def report(self, db: Session, *, start_date: date, end_date: date, group_by: str = "day",
+               by_location: bool = False, by_make: bool = False, location_id: Optional[int] = None,
+               make: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Sums rollup rows per day (and location/make) in the database, then folds days into
+        # weeks or months here, which keeps the SQL the same on every dialect
+        rollup = self.model
+        dimensions = [rollup.revenue_date]
+        if by_location:
+            dimensions.append(rollup.location_id)
+        if by_make:
+            dimensions.append(rollup.make)
+        query = db.query(*dimensions, *(func.sum(getattr(rollup, measure)) for measure in REVENUE_MEASURES)).filter(
+            # Buckets emptied by deletions are left in place at zero
+            and_(rollup.revenue_date >= start_date, rollup.revenue_date <= end_date, rollup.rental_count != 0)
+        )
+        if location_id is not None:
+            query = query.filter(rollup.location_id == location_id)
+        if make is not None:
+            query = query.filter(rollup.make == make)
+        periods: Dict[tuple, Dict[str, Any]] = {}
+        for row in query.group_by(*dimensions):
+            key = (period_start(row[0], group_by), *row[1:len(dimensions)])
+            sums = row[len(dimensions):]
+            if key not in periods:
+                periods[key] = {"period_start": key[0], **dict(zip(REVENUE_MEASURES, sums))}
+                if by_location:
+                    periods[key]["location_id"] = row[1]
+                if by_make:
+                    periods[key]["make"] = row[len(dimensions) - 1]
+            else:
+                for measure, value in zip(REVENUE_MEASURES, sums):
+                    periods[key][measure] += value
+        return [periods[key] for key in sorted(periods)]
+
 # Reservation CRUD operations
 class CRUDReservation(CRUDBase):
-    def get_active_reservations(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[models.Reservation]:
-        return db.query(models.Reservation).filter(
+    def on_write(self, db: Session, db_obj: models.Reservation) -> None:
+        vehicle_occupancy.sync(db, db_obj)
+    
+    def on_delete(self, db: Session, db_obj: models.Reservation) -> None:
+        vehicle_occupancy.remove(db, db_obj)
+    
+    def on_bulk_update(self, db: Session, db_objs: List[models.Reservation]) -> None:
+        vehicle_occupancy.sync_many(db, db_objs)
+    
+    def get_active_reservations(self, db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        query = db.query(models.Reservation).filter(
             models.Reservation.status == "Active"
-        ).offset(skip).limit(limit).all()
+        )
+        return self.paginate(query, skip=skip, limit=limit, cursor=cursor)
     
     def get_customer_reservations(self, db: Session, *, customer_id: int) -> List[models.Reservation]:
         return db.query(models.Reservation).filter(
             models.Reservation.customer_id == customer_id
         ).order_by(desc(models.Reservation.reservation_date)).all()
     
+    def book(self, db: Session, *, obj_in: schema.ReservationCreate) -> Optional[models.Reservation]:
+        return book_vehicle(
+            db,
+            vehicle_id=obj_in.vehicle_id,
+            start_date=obj_in.reserved_start_date,
+            end_date=obj_in.reserved_end_date,
+            create=lambda vehicle: self.create(db, obj_in=obj_in)
+        )
+    
     def check_vehicle_availability(self, db: Session, *, vehicle_id: int, start_date: datetime, end_date: datetime) -> bool:
-        conflicting_reservations = db.query(models.Reservation).filter(
-            and_(
-                models.Reservation.vehicle_id == vehicle_id,
-                models.Reservation.status.in_(["Active", "Confirmed"]),
-                or_(
-                    and_(models.Reservation.reserved_start_date <= start_date, models.Reservation.reserved_end_date > start_date),
-                    and_(models.Reservation.reserved_start_date < end_date, models.Reservation.reserved_end_date >= end_date),
-                    and_(models.Reservation.reserved_start_date >= start_date, models.Reservation.reserved_end_date <= end_date)
-                )
-            )
-        ).first()
-        return conflicting_reservations is None
+        # Reservations, active rentals and scheduled maintenance all live on the occupancy timeline
+        return not vehicle_occupancy.has_conflict(db, vehicle_id=vehicle_id, start_date=start_date, end_date=end_date)
     
     def convert_to_rental(self, db: Session, *, reservation_id: int, rental_data: schema.RentalCreate) -> Optional[models.Rental]:
-        reservation = db.query(models.Reservation).filter(models.Reservation.reservation_id == reservation_id).first()
-        if reservation and reservation.status == "Confirmed":
-            # Create rental
-            rental = models.Rental(**rental_data.model_dump())
-            db.add(rental)
-            
-            # Update reservation status
+        # Booked like any other rental, except that the reservation's own slot does not conflict
+        def create(vehicle: models.Vehicle) -> Optional[models.Rental]:
+            reservation = db.query(models.Reservation).filter(
+                models.Reservation.reservation_id == reservation_id
+            ).with_for_update().first()
+            if reservation is None or reservation.status != "Confirmed":
+                return None
             reservation.status = "Converted"
-            
-            # Update vehicle availability
-            vehicle = db.query(models.Vehicle).filter(models.Vehicle.vehicle_id == reservation.vehicle_id).first()
-            if vehicle:
-                vehicle.availability = False
-            
-            db.commit()
-            db.refresh(rental)
-            return rental
-        return None
+            vehicle.availability = False
+            vehicle_occupancy.sync(db, reservation)
+            return rental.create(db, obj_in=rental_data)
+        
+        return book_vehicle(
+            db,
+            vehicle_id=rental_data.vehicle_id,
+            start_date=rental_data.start_date,
+            end_date=rental_data.end_date,
+            create=create,
+            exclude=("Reservation", reservation_id)
+        )
 
 # Employee CRUD operations
 class CRUDEmployee(CRUDBase):
     def get_by_email(self, db: Session, *, email: str) -> Optional[models.Employee]:
         return db.query(models.Employee).filter(models.Employee.email == email).first()
     
-    def get_active_employees(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[models.Employee]:
-        return db.query(models.Employee).filter(
+    def get_active_employees(self, db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        query = db.query(models.Employee).filter(
             models.Employee.is_active == True
-        ).offset(skip).limit(limit).all()
+        )
+        return self.paginate(query, skip=skip, limit=limit, cursor=cursor)
     
     def get_by_role(self, db: Session, *, role: str) -> List[models.Employee]:
         return db.query(models.Employee).filter(
@@ -303,22 +1234,59 @@ class CRUDPayment(CRUDBase):
             models.Payment.rental_id == rental_id
         ).order_by(models.Payment.payment_date).all()
     
-    def get_failed_payments(self, db: Session) -> List[models.Payment]:
-        return db.query(models.Payment).filter(models.Payment.status == "Failed").all()
+    def get_failed_payments(self, db: Session, *, columns: Optional[List[Any]] = None) -> List[models.Payment]:
+        return db.query(*(columns or [models.Payment])).filter(models.Payment.status == "Failed").all()
     
-    def get_payments_by_date_range(self, db: Session, *, start_date: date, end_date: date) -> List[models.Payment]:
-        return db.query(models.Payment).filter(
+    def stream_payments(self, db: Session, *, filters: schema.RentalFilters, columns: List[Any],
+                        batch_size: int = 1000) -> Iterator[Any]:
+        # Payments of the rentals matching the filters
+        query = db.query(*columns).join(models.Rental, models.Payment.rental_id == models.Rental.rental_id)
+        return rental.apply_filters(query, filters).order_by(models.Payment.payment_id).yield_per(batch_size)
+    
+    def completed_in_period(self, query, *, start: datetime, end: datetime):
+        # Half-open range on the bare column, so the (status, payment_date) index serves it
+        return query.filter(
             and_(
-                func.date(models.Payment.payment_date) >= start_date,
-                func.date(models.Payment.payment_date) <= end_date,
-                models.Payment.status == "Completed"
+                models.Payment.status == "Completed",
+                models.Payment.payment_date >= start,
+                models.Payment.payment_date < end
             )
-        ).all()
+        )
+    
+    def get_payments_report(self, db: Session, *, start: datetime, end: datetime) -> Dict[str, Any]:
+        # One grouped query by day, method and payment type; the coarser totals are rolled up
+        # from those groups, of which there are at most days x methods x types
+        day = func.date(models.Payment.payment_date, type_=Date)
+        groups = self.completed_in_period(db.query(
+            day,
+            models.Payment.method,
+            models.Payment.payment_type,
+            func.count(),
+            func.sum(models.Payment.amount)
+        ), start=start, end=end).group_by(day, models.Payment.method, models.Payment.payment_type).all()
+        report = {"total_payments": 0, "total_amount": Decimal("0.00"), "by_method": {}, "by_payment_type": {}, "by_day": {}}
+        for payment_day, method, payment_type, count, amount in groups:
+            report["total_payments"] += count
+            report["total_amount"] += amount
+            for totals, key in (("by_method", method), ("by_payment_type", payment_type), ("by_day", payment_day)):
+                group = report[totals].setdefault(key, {"payments": 0, "amount": Decimal("0.00")})
+                group["payments"] += count
+                group["amount"] += amount
+        report["by_day"] = dict(sorted(report["by_day"].items()))
+        return report
+    
+    def stream_payments_in_period(self, db: Session, *, start: datetime, end: datetime, columns: List[Any],
+                                  batch_size: int = 1000) -> Iterator[Any]:
+        query = self.completed_in_period(db.query(*columns), start=start, end=end)
+        return query.order_by(models.Payment.payment_date, models.Payment.payment_id).yield_per(batch_size)
 
 # Insurance Plan CRUD operations
 class CRUDInsurancePlan(CRUDBase):
     def get_active_plans(self, db: Session) -> List[models.InsurancePlan]:
-        return db.query(models.InsurancePlan).filter(models.InsurancePlan.is_active == True).all()
+        return self.cached(
+            db, ("active_plans",),
+            lambda: db.query(models.InsurancePlan).filter(models.InsurancePlan.is_active == True).all()
+        )
 
 # Incident Report CRUD operations
 class CRUDIncidentReport(CRUDBase):
@@ -334,6 +1302,15 @@ class CRUDIncidentReport(CRUDBase):
 
 # Maintenance Schedule CRUD operations
 class CRUDMaintenanceSchedule(CRUDBase):
+    def on_write(self, db: Session, db_obj: models.MaintenanceSchedule) -> None:
+        vehicle_occupancy.sync(db, db_obj)
+    
+    def on_delete(self, db: Session, db_obj: models.MaintenanceSchedule) -> None:
+        vehicle_occupancy.remove(db, db_obj)
+    
+    def on_bulk_update(self, db: Session, db_objs: List[models.MaintenanceSchedule]) -> None:
+        vehicle_occupancy.sync_many(db, db_objs)
+    
     def get_vehicle_maintenance(self, db: Session, *, vehicle_id: int) -> List[models.MaintenanceSchedule]:
         return db.query(models.MaintenanceSchedule).filter(
             models.MaintenanceSchedule.vehicle_id == vehicle_id
@@ -360,6 +1337,14 @@ class CRUDMaintenanceSchedule(CRUDBase):
 
 # Membership operations
 class CRUDMembershipProfile(CRUDBase):
+    def on_write(self, db: Session, db_obj: models.CustomerMembershipProfile) -> None:
+        run_after_commit(db, partial(
+            spending_leaderboard.upsert, db_obj.customer_id, db_obj.lifetime_spending, db_obj.membership_tier
+        ))
+    
+    def on_delete(self, db: Session, db_obj: models.CustomerMembershipProfile) -> None:
+        run_after_commit(db, partial(spending_leaderboard.remove, db_obj.customer_id))
+    
     def update_points(self, db: Session, *, customer_id: int, points_to_add: int) -> Optional[models.CustomerMembershipProfile]:
         profile = db.query(models.CustomerMembershipProfile).filter(
             models.CustomerMembershipProfile.customer_id == customer_id
@@ -367,11 +1352,11 @@ class CRUDMembershipProfile(CRUDBase):
         if profile:
             profile.points_balance += points_to_add
             profile.last_activity_date = date.today()
-            db.commit()
-            db.refresh(profile)
+            save(db, profile)
         return profile
     
     def update_spending(self, db: Session, *, customer_id: int, amount: Decimal) -> Optional[models.CustomerMembershipProfile]:
+        # Called after a rental completes, which may change the customer's leaderboard location
         profile = db.query(models.CustomerMembershipProfile).filter(
             models.CustomerMembershipProfile.customer_id == customer_id
         ).first()
@@ -379,21 +1364,189 @@ class CRUDMembershipProfile(CRUDBase):
             profile.lifetime_spending += amount
             profile.lifetime_rentals += 1
             profile.last_activity_date = date.today()
-            db.commit()
-            db.refresh(profile)
+            run_after_commit(db, partial(
+                spending_leaderboard.upsert, customer_id, profile.lifetime_spending, profile.membership_tier,
+                customer_location(db, customer_id)
+            ))
+            save(db, profile)
         return profile
 
+# Idempotency keys for retried POSTs; stored responses are replayed until they expire
+IDEMPOTENCY_KEY_TTL = float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))
+
+class CRUDIdempotencyKey(CRUDBase):
+    def __init__(self, model):
+        super().__init__(model)
+        self._next_purge = 0.0
+    
+    def claim(self, db: Session, *, scope: str, key: str, request_hash: str) -> Optional[models.IdempotencyKey]:
+        # Returns the stored record while the key is live. Otherwise the key is claimed in the
+        # current transaction, so it commits or rolls back together with the row the request creates.
+        now = datetime.now()
+        self._purge_expired(db, now)
+        record = db.get(self.model, (scope, key))
+        if record is not None:
+            if record.expires_at > now:
+                return record
+            db.delete(record)
+            db.flush()
+        db.add(self.model(
+            scope=scope, idempotency_key=key, request_hash=request_hash,
+            expires_at=now + timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+        ))
+        try:
+            db.flush()
+        except IntegrityError:
+            # A concurrent request with the same key claimed it first
+            db.rollback()
+            return db.get(self.model, (scope, key))
+        return None
+    
+    def complete(self, db: Session, *, scope: str, key: str, request_hash: str, status_code: int,
+                 response_body: str) -> None:
+        stored = db.query(self.model).filter(
+            and_(self.model.scope == scope, self.model.idempotency_key == key)
+        ).update({"status_code": status_code, "response_body": response_body}, synchronize_session=False)
+        if not stored:
+            # A booking retry rolled the claim back along with its own attempt
+            db.add(self.model(
+                scope=scope, idempotency_key=key, request_hash=request_hash,
+                status_code=status_code, response_body=response_body,
+                expires_at=datetime.now() + timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+            ))
+        save(db)
+    
+    def _purge_expired(self, db: Session, now: datetime) -> None:
+        # Expired keys are deleted in one indexed range DELETE every IDEMPOTENCY_PURGE_INTERVAL
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + IDEMPOTENCY_PURGE_INTERVAL
+        db.query(self.model).filter(self.model.expires_at <= now).delete(synchronize_session=False)
+
+# Leader leases for background jobs. A job that can outlast the lease calls renew_lease between
+# batches; the scheduler running it puts its renewal in the session's info.
+RENEW_LEASE_KEY = "renew_lease"
+
+def renew_lease(db: Session) -> None:
+    renew = db.info.get(RENEW_LEASE_KEY)
+    if renew is not None:
+        renew(db)
+
+class CRUDSchedulerLease(CRUDBase):
+    def acquire(self, db: Session, *, name: str, owner: str, ttl: float) -> bool:
+        # Takes the lease if it is free or expired, or renews it for its current owner
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=ttl)
+        taken = db.query(self.model).filter(
+            and_(self.model.name == name, or_(self.model.owner == owner, self.model.expires_at <= now))
+        ).update({"owner": owner, "expires_at": expires_at}, synchronize_session=False)
+        if not taken:
+            if db.get(self.model, name) is not None:
+                db.rollback()
+                return False
+            db.add(self.model(name=name, owner=owner, expires_at=expires_at))
+        try:
+            save(db)
+        except IntegrityError:
+            # Another worker created the lease first
+            db.rollback()
+            return False
+        return True
+    
+    def release(self, db: Session, *, name: str, owner: str) -> None:
+        db.query(self.model).filter(
+            and_(self.model.name == name, self.model.owner == owner)
+        ).update({"expires_at": datetime.now()}, synchronize_session=False)
+        save(db)
+
+# Dashboard aggregates
+class DashboardSummary:
+    # Rows of these models feed the summary counters
+    source_models = (models.Customer, models.Vehicle, models.Rental, models.VehicleMaintenanceRecord)
+    
+    def __init__(self, ttl: float):
+        self.cache = TTLCache(ttl)
+    
+    def get_summary(self, db: Session) -> Dict[str, Any]:
+        return self.cache.get_or_set("summary", lambda: self._compute(db), store=not is_replica(db))
+    
+    def invalidate(self) -> None:
+        self.cache.invalidate()
+    
+    def _compute(self, db: Session) -> Dict[str, Any]:
+        # Every counter is a scalar subquery so the whole summary is a single round trip
+        def count(model, *criteria):
+            return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+        
+        row = db.query(
+            count(models.Customer).label("total_customers"),
+            count(models.Vehicle).label("total_vehicles"),
+            count(models.Vehicle, models.Vehicle.availability == True).label("available_vehicles"),
+            count(models.Rental, models.Rental.status == "Active").label("active_rentals"),
+            # The flag kept by scan_overdue, so the count matches /rentals/overdue
+            count(models.Rental, models.Rental.is_overdue == True).label("overdue_rentals"),
+            select(func.count(func.distinct(models.VehicleMaintenanceRecord.vehicle_id))).where(
+                models.VehicleMaintenanceRecord.next_service_due <= date.today()
+            ).scalar_subquery().label("vehicles_needing_maintenance"),
+            select(func.coalesce(func.sum(models.Rental.total_amount), 0)).where(
+                models.Rental.status == "Completed"
+            ).scalar_subquery().label("total_revenue")
+        ).one()
+        summary = dict(row._mapping)
+        summary["total_revenue"] = Decimal(summary["total_revenue"])
+        return summary
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_dashboard_on_write(session: Session, flush_context) -> None:
+    if any(isinstance(obj, DashboardSummary.source_models) for obj in chain(session.new, session.dirty, session.deleted)):
+        run_after_commit(session, dashboard.invalidate)
+
+# The facet index follows every flushed vehicle change, whichever code path made it
+@event.listens_for(Session, "after_flush")
+def _sync_vehicle_facets(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, models.Vehicle):
+            run_after_commit(session, partial(vehicle_facet_index.upsert, obj.vehicle_id, facet_values(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, models.Vehicle):
+            run_after_commit(session, partial(vehicle_facet_index.remove, obj.vehicle_id))
+
+# Reference data (locations, plans, features, tiers) rarely changes and is read on every page load
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "256"))
+
+def reference_cache() -> TTLCache:
+    return TTLCache(REFERENCE_CACHE_TTL, maxsize=REFERENCE_CACHE_SIZE)
+
+# Hit/miss counters per cache, looked up at call time
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        "locations": location.cache.stats(),
+        "insurance_plans": insurance_plan.cache.stats(),
+        "vehicle_features": vehicle_feature.cache.stats(),
+        "membership_tiers": membership_tier.cache.stats(),
+        "dashboard": dashboard.cache.stats(),
+        "customer_leaderboard": spending_leaderboard.stats(),
+        "availability_index": availability_index.stats()
+    }
+
 # Initialize CRUD instances
 customer = CRUDCustomer(models.Customer)
 vehicle = CRUDVehicle(models.Vehicle)
 rental = CRUDRental(models.Rental)
 reservation = CRUDReservation(models.Reservation)
 employee = CRUDEmployee(models.Employee)
-location = CRUDLocation(models.Location)
+location = CRUDLocation(models.Location, cache=reference_cache())
 payment = CRUDPayment(models.Payment)
-insurance_plan = CRUDInsurancePlan(models.InsurancePlan)
+insurance_plan = CRUDInsurancePlan(models.InsurancePlan, cache=reference_cache())
 incident_report = CRUDIncidentReport(models.IncidentReport)
 maintenance_schedule = CRUDMaintenanceSchedule(models.MaintenanceSchedule)
+idempotency_key = CRUDIdempotencyKey(models.IdempotencyKey)
+revenue_rollup = CRUDRevenueRollup(models.DailyRevenueRollup)
+scheduler_lease = CRUDSchedulerLease(models.SchedulerLease)
 membership_profile = CRUDMembershipProfile(models.CustomerMembershipProfile)
-vehicle_feature = CRUDBase(models.VehicleFeature)
-membership_tier = CRUDBase(models.MembershipTier)
\ No newline at end of file
+vehicle_feature = CRUDBase(models.VehicleFeature, cache=reference_cache())
+membership_tier = CRUDBase(models.MembershipTier, cache=reference_cache())
+vehicle_occupancy = CRUDVehicleOccupancy(models.VehicleOccupancy)
+dashboard = DashboardSummary(ttl=float(os.getenv("DASHBOARD_CACHE_TTL", "15")))
\ No newline at end of file
@@ -0,0 +1,226 @@
+import bisect
+import heapq
+import os
+import threading
+import time
+from decimal import Decimal
+from functools import partial
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import desc, func
+from sqlalchemy.orm import Session
+
+import models as models
+
+# Customers kept per ranking; the top-spending endpoint cannot ask for more
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "50"))
+# Seconds between comparisons of the overall ranking with the database
+LEADERBOARD_CHECK_INTERVAL = float(os.getenv("LEADERBOARD_CHECK_INTERVAL", "600"))
+
+# Passed as location_id when a change does not move the customer to another location
+UNCHANGED = object()
+
+# (lifetime_spending, membership_tier, location_id)
+Entry = Tuple[Decimal, Optional[str], Optional[int]]
+# (tier, location_id); None in a position means "any"
+Segment = Tuple[Optional[str], Optional[int]]
+
+
+def segments(entry: Entry) -> Set[Segment]:
+    _, tier, location_id = entry
+    return {(None, None), (tier, None), (None, location_id), (tier, location_id)}
+
+
+# A customer's location is the pickup location of their completed rental with the highest id. The
+# leaderboard load, the database fallback for large limits and spending updates all use it.
+def latest_completed_rentals(db: Session):
+    return db.query(func.max(models.Rental.rental_id)).filter(
+        models.Rental.status == "Completed"
+    ).group_by(models.Rental.customer_id)
+
+
+def customer_location(db: Session, customer_id: int) -> Optional[int]:
+    return db.query(models.Rental.pickup_location_id).filter(
+        models.Rental.customer_id == customer_id,
+        models.Rental.status == "Completed"
+    ).order_by(desc(models.Rental.rental_id)).limit(1).scalar()
+
+
+# Top customers by lifetime spending, overall and per membership tier, location (the pickup location
+# of the customer's latest completed rental) and both. Each ranking holds at most `size` customers
+# sorted by (-spending, customer_id), so reads are O(limit). Every customer's entry is kept too, so
+# a ranking that loses a member to someone outside it is rebuilt in memory on its next read.
+class SpendingLeaderboard:
+    def __init__(self, size: int = LEADERBOARD_SIZE, check_interval: float = LEADERBOARD_CHECK_INTERVAL):
+        self.size = size
+        self.check_interval = check_interval
+        self.checks = 0
+        self.repairs = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._next_check = 0.0
+        self._entries: Dict[int, Entry] = {}
+        self._rankings: Dict[Segment, List[Tuple[Decimal, int]]] = {}
+        self._stale: Set[Segment] = set()
+        # Changes made while check() rebuilds the leaderboard, replayed onto the rebuilt one
+        self._pending: Optional[List[Callable[[], None]]] = None
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._load(db)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._entries.clear()
+            self._rankings.clear()
+            self._stale.clear()
+
+    def _load(self, db: Session) -> None:
+        self._entries, self._rankings = self._build(db)
+        self._stale = set()
+        self._loaded = True
+
+    def _build(self, db: Session) -> Tuple[Dict[int, Entry], Dict[Segment, List[Tuple[Decimal, int]]]]:
+        locations = dict(db.query(models.Rental.customer_id, models.Rental.pickup_location_id).filter(
+            models.Rental.rental_id.in_(latest_completed_rentals(db).scalar_subquery())
+        ))
+        entries = {
+            customer_id: (spending or Decimal("0.00"), tier, locations.get(customer_id))
+            for customer_id, spending, tier in db.query(
+                models.CustomerMembershipProfile.customer_id,
+                models.CustomerMembershipProfile.lifetime_spending,
+                models.CustomerMembershipProfile.membership_tier
+            ).yield_per(10000)
+        }
+        members: Dict[Segment, List[Tuple[Decimal, int]]] = {}
+        for customer_id, entry in entries.items():
+            for segment in segments(entry):
+                members.setdefault(segment, []).append((-entry[0], customer_id))
+        return entries, {segment: heapq.nsmallest(self.size, items) for segment, items in members.items()}
+
+    # Incremental maintenance; no-ops until loaded since the load reads committed rows
+    def upsert(self, customer_id: int, spending: Decimal, tier: Optional[str], location_id=UNCHANGED) -> None:
+        if not self._loaded:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(partial(self.upsert, customer_id, spending, tier, location_id))
+            old = self._entries.get(customer_id)
+            if location_id is UNCHANGED:
+                location_id = old[2] if old else None
+            new = (spending or Decimal("0.00"), tier, location_id)
+            self._entries[customer_id] = new
+            self._move(customer_id, old, new)
+
+    def remove(self, customer_id: int) -> None:
+        if not self._loaded:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(partial(self.remove, customer_id))
+            old = self._entries.pop(customer_id, None)
+            if old is not None:
+                self._move(customer_id, old, None)
+
+    def top(self, limit: int, *, tier: Optional[str] = None, location_id: Optional[int] = None) -> List[int]:
+        with self._lock:
+            segment = (tier, location_id)
+            if segment in self._stale:
+                self._rebuild(segment)
+            return [customer_id for _, customer_id in self._rankings.get(segment, ())[:limit]]
+
+    def check(self, db: Session) -> None:
+        # Compares the overall ranking with the database every check_interval seconds and
+        # reloads everything on a mismatch, repairing changes that bypassed the CRUD layer. Run by
+        # the background scheduler on a primary session, since a replica may not have the rows yet.
+        if not self._loaded or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.check_interval
+        expected = [
+            (-(spending or Decimal("0.00")), customer_id)
+            for customer_id, spending in db.query(
+                models.CustomerMembershipProfile.customer_id,
+                models.CustomerMembershipProfile.lifetime_spending
+            ).order_by(
+                desc(models.CustomerMembershipProfile.lifetime_spending),
+                models.CustomerMembershipProfile.customer_id
+            ).limit(self.size)
+        ]
+        with self._lock:
+            self.checks += 1
+            if (None, None) in self._stale:
+                self._rebuild((None, None))
+            if self._rankings.get((None, None), []) == expected:
+                return
+            self.repairs += 1
+            self._pending = []
+        # The reload reads every profile, so it runs without the lock and the result is swapped in
+        try:
+            entries, rankings = self._build(db)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._entries, self._rankings, self._stale = entries, rankings, set()
+            for change in pending:
+                change()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "customers": len(self._entries),
+                "rankings": len(self._rankings),
+                "stale": len(self._stale),
+                "checks": self.checks,
+                "repairs": self.repairs
+            }
+
+    def _move(self, customer_id: int, old: Optional[Entry], new: Optional[Entry]) -> None:
+        old_segments = segments(old) if old else set()
+        new_segments = segments(new) if new else set()
+        for segment in old_segments | new_segments:
+            if segment in self._stale:
+                continue
+            ranking = self._rankings.setdefault(segment, [])
+            full = len(ranking) >= self.size
+            was_ranked = False
+            if segment in old_segments:
+                was_ranked = _discard(ranking, (-old[0], customer_id))
+            if segment not in new_segments:
+                # A full ranking that loses a member may owe its last place to someone outside it
+                if was_ranked and full:
+                    self._stale.add(segment)
+                continue
+            item = (-new[0], customer_id)
+            if was_ranked and full and item > (-old[0], customer_id) and (not ranking or item > ranking[-1]):
+                # Spending went down past the last place; someone outside the ranking may now be ahead
+                self._stale.add(segment)
+                continue
+            if len(ranking) < self.size or item < ranking[-1]:
+                bisect.insort(ranking, item)
+                del ranking[self.size:]
+
+    def _rebuild(self, segment: Segment) -> None:
+        self._rankings[segment] = heapq.nsmallest(
+            self.size,
+            ((-entry[0], customer_id) for customer_id, entry in self._entries.items() if segment in segments(entry))
+        )
+        self._stale.discard(segment)
+
+
+def _discard(ranking: List[Tuple[Decimal, int]], item: Tuple[Decimal, int]) -> bool:
+    position = bisect.bisect_left(ranking, item)
+    if position < len(ranking) and ranking[position] == item:
+        del ranking[position]
+        return True
+    return False
+
+
+spending_leaderboard = SpendingLeaderboard()
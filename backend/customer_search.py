@@ -0,0 +1,148 @@
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import models as models
+
+GRAM_SIZE = 3
+NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    return NON_DIGITS.sub("", value or "")
+
+
+def grams(value: str) -> Set[str]:
+    # Trigrams for substring matching, plus "^"-tagged 1- and 2-char prefixes so that
+    # short typeahead terms still resolve through the index
+    keys = {value[i:i + GRAM_SIZE] for i in range(len(value) - GRAM_SIZE + 1)}
+    keys.update("^" + value[:size] for size in range(1, GRAM_SIZE) if len(value) >= size)
+    return keys
+
+
+def query_keys(term: str) -> Set[str]:
+    if len(term) >= GRAM_SIZE:
+        return {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}
+    return {"^" + term}
+
+
+def match_score(value: str, term: str) -> int:
+    if not term or not value:
+        return 0
+    if value == term:
+        return 3
+    if value.startswith(term):
+        return 2
+    if len(term) >= GRAM_SIZE and term in value:
+        return 1
+    return 0
+
+
+# In-process n-gram inverted index over customer names, email and normalized phone
+class CustomerSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        # customer_id -> (first_name, last_name, email, phone digits), all normalized
+        self._documents: Dict[int, Tuple[str, str, str, str]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            rows = db.query(
+                models.Customer.customer_id,
+                models.Customer.first_name,
+                models.Customer.last_name,
+                models.Customer.email,
+                models.Customer.phone
+            ).yield_per(10000)
+            for customer_id, first_name, last_name, email, phone in rows:
+                self._insert(customer_id, self._document(first_name, last_name, email, phone))
+            self._loaded = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._documents.clear()
+            self._postings.clear()
+
+    # Incremental maintenance; no-ops until loaded since the load reads committed rows
+    def upsert(self, customer_id: int, first_name: str, last_name: str, email: str, phone: str) -> None:
+        if not self._loaded:
+            return
+        with self._lock:
+            self._delete(customer_id)
+            self._insert(customer_id, self._document(first_name, last_name, email, phone))
+
+    def remove(self, customer_id: int) -> None:
+        if not self._loaded:
+            return
+        with self._lock:
+            self._delete(customer_id)
+
+    def search(self, search_term: str, *, skip: int = 0, limit: int = 100) -> List[int]:
+        term = search_term.strip().lower()
+        digits = normalize_phone(search_term)
+        with self._lock:
+            candidates = self._candidates(term)
+            if digits and digits != term:
+                candidates |= self._candidates(digits)
+            ranked = []
+            for customer_id in candidates:
+                first_name, last_name, email, phone = self._documents[customer_id]
+                score = max(
+                    match_score(first_name, term),
+                    match_score(last_name, term),
+                    match_score(email, term),
+                    match_score(phone, digits)
+                )
+                if score:
+                    ranked.append((-score, customer_id))
+        ranked.sort()
+        return [customer_id for _, customer_id in ranked[skip:skip + limit]]
+
+    def _candidates(self, term: str) -> Set[int]:
+        if not term:
+            return set()
+        postings = [self._postings.get(key) for key in query_keys(term)]
+        if any(posting is None for posting in postings):
+            return set()
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    @staticmethod
+    def _document(first_name: str, last_name: str, email: str, phone: str) -> Tuple[str, str, str, str]:
+        return ((first_name or "").lower(), (last_name or "").lower(), (email or "").lower(), normalize_phone(phone))
+
+    def _insert(self, customer_id: int, document: Tuple[str, str, str, str]) -> None:
+        self._documents[customer_id] = document
+        for key in self._keys(document):
+            self._postings.setdefault(key, set()).add(customer_id)
+
+    def _delete(self, customer_id: int) -> None:
+        document = self._documents.pop(customer_id, None)
+        if document is None:
+            return
+        for key in self._keys(document):
+            posting = self._postings.get(key)
+            if posting is not None:
+                posting.discard(customer_id)
+                if not posting:
+                    del self._postings[key]
+
+    @staticmethod
+    def _keys(document: Iterable[str]) -> Set[str]:
+        keys: Set[str] = set()
+        for value in document:
+            if value:
+                keys |= grams(value)
+        return keys
+
+
+customer_search_index = CustomerSearchIndex()
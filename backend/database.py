@@ -1,13 +1,129 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
+import itertools
 import os
+from pool_metrics import PoolMetrics, timed_pool_class
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Pool sizing is per worker process. Pre-ping and recycling keep connections that the server or
+# a proxy dropped while idle from surfacing as errors on the next request.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Every engine's pool with the metrics collected from its events, by engine name
+pools = {}
+
+def pooled_engine(url: str, name: str, factory=create_engine):
+    settings = {"recycle": DB_POOL_RECYCLE, "pre_ping": DB_POOL_PRE_PING}
+    parsed = make_url(url)
+    pool_class = parsed.get_dialect().get_pool_class(parsed)
+    # Size, overflow and timeout only apply to queue pools; in-memory SQLite uses a singleton pool
+    queue_pool = issubclass(pool_class, QueuePool)
+    if queue_pool:
+        settings["max_overflow"] = DB_MAX_OVERFLOW
+    metrics = PoolMetrics(settings)
+    options = {"pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": DB_POOL_PRE_PING}
+    if queue_pool:
+        options.update(
+            poolclass=timed_pool_class(pool_class, metrics),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+    created = factory(url, **options)
+    pool = getattr(created, "sync_engine", created).pool
+    metrics.listen(pool)
+    pools[name] = (metrics, pool)
+    return created
+
+def pool_stats() -> dict:
+    return {name: metrics.snapshot(pool) for name, (metrics, pool) in pools.items()}
+
+engine = pooled_engine(DATABASE_URL, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Schema upgrades and backfills (migrations.upgrade) run when a worker starts. With several
+# workers, turn this off and run `python migrations.py` once per deploy instead.
+DATABASE_MIGRATE_ON_STARTUP = os.getenv("DATABASE_MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Unit-of-work mode: CRUD methods on a request's session only flush, and the request commits once
+# when the endpoint finishes, so composite flows are atomic and each write costs one round trip.
+# The flag lives on the session, so startup code and CLI tools keep committing as they go.
+# The exception is SQLite, which has no row locks: there a booking (POST /reservations/, POST
+# /rentals/, reservation conversion) commits as soon as it is inserted, and whatever the request
+# writes after it, such as the stored Idempotency-Key response, commits separately.
+DATABASE_UNIT_OF_WORK = os.getenv("DATABASE_UNIT_OF_WORK", "false").lower() in ("1", "true", "yes")
+UNIT_OF_WORK_KEY = "unit_of_work"
+
+def unit_of_work(db) -> bool:
+    return db.info.get(UNIT_OF_WORK_KEY, False)
+
+# Read-only replicas for GET endpoints, as a comma-separated list of URLs. Reads rotate over
+# them; a client that has just written reads from the primary for REPLICA_STICKY_SECONDS so it
+# sees its own writes through replication lag.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+replica_engines = [pooled_engine(url, f"replica-{i}") for i, url in enumerate(DATABASE_REPLICA_URLS)]
+_replica_cycle = itertools.cycle(replica_engines)
+# Set on sessions bound to a replica. Process-wide caches are only filled from the primary: a
+# lagging replica read right after an invalidation would otherwise cache the old rows for a TTL.
+REPLICA_KEY = "replica"
+
+def is_replica(db) -> bool:
+    return db.info.get(REPLICA_KEY, False)
+
+def replica_session():
+    if not replica_engines:
+        return SessionLocal()
+    return SessionLocal(bind=next(_replica_cycle), info={REPLICA_KEY: True})
+
+# Async mode (experimental, off by default) serves requests through an async engine and
+# AsyncSession; it needs an async driver (asyncpg, aiosqlite, aiomysql). The sync engine above is
+# still used at startup and by CLI tools.
+# Only the database I/O is awaited: ORM hydration, response serialization and the in-memory index
+# updates all run on the event-loop thread, so CPU-heavy requests stall every other request on the
+# worker. In benchmarks/async_mode.py it is slower than sync mode at 50 and 200 in flight and no
+# faster anywhere else; it can only help when database latency dominates, not CPU.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite", "mysql": "aiomysql"}
+
+def async_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+async_engine = None
+AsyncSessionLocal = None
+async_replica_engines = []
+if DATABASE_ASYNC:
+    # Imported here since sqlalchemy.ext.asyncio requires greenlet, which sync mode does not need
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+    async_engine = pooled_engine(ASYNC_DATABASE_URL, "async", create_async_engine)
+    # Nothing may lazy-load outside the session's greenlet, so committed objects stay loaded
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    async_replica_engines = [
+        pooled_engine(async_url(url), f"async-replica-{i}", create_async_engine)
+        for i, url in enumerate(DATABASE_REPLICA_URLS)
+    ]
+    _async_replica_cycle = itertools.cycle(async_replica_engines)
+
+def async_replica_session():
+    if not async_replica_engines:
+        return AsyncSessionLocal()
+    return AsyncSessionLocal(bind=next(_async_replica_cycle), info={REPLICA_KEY: True})
+
 Base = declarative_base()
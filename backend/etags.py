@@ -0,0 +1,54 @@
+import hashlib
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy.inspection import inspect
+
+
+def fingerprint(obj: Any) -> tuple:
+    # Versioned rows are identified by their version; anything else by its column values
+    state = inspect(obj)
+    table = state.mapper.local_table.name
+    version = getattr(obj, "version", None)
+    if version is not None:
+        return (table, state.identity, version)
+    return (table, state.identity, tuple(getattr(obj, attr.key) for attr in state.mapper.column_attrs))
+
+
+def with_related(obj: Any, *relationships: str) -> List[Any]:
+    # The object plus the already loaded related rows its response embeds
+    objects = [obj]
+    for name in relationships:
+        value = getattr(obj, name)
+        if isinstance(value, list):
+            objects.extend(value)
+        elif value is not None:
+            objects.append(value)
+    return objects
+
+
+def entity_tag(objects: Iterable[Any], *extra: Any) -> str:
+    digest = hashlib.sha1()
+    for obj in objects:
+        digest.update(repr(fingerprint(obj)).encode())
+    for value in extra:
+        digest.update(repr(value).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def rows_tag(rows: Iterable[Any], *extra: Any) -> str:
+    # Column-only Row tuples carry no identity or version, so their values are hashed directly
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(repr(tuple(row)).encode())
+    for value in extra:
+        digest.update(repr(value).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so a W/ prefix is ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
@@ -0,0 +1,66 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Iterator, List
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from serialization import dumps
+
+# Rows fetched per round trip; memory use is bounded by one batch whatever the export size
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def ndjson_chunks(keys: List[str], rows: Iterable[Any]) -> Iterator[bytes]:
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(dict(zip(keys, row))))
+        if len(chunk) == EXPORT_BATCH_SIZE:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+
+def csv_chunks(keys: List[str], rows: Iterable[Any]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def streaming_export(name: str, export_format: str, keys: List[str],
+                     session_factory: Callable[[], Session],
+                     fetch: Callable[[Session, int], Iterable[Any]]) -> StreamingResponse:
+    # The body is produced after the endpoint returns, so the export owns its session rather
+    # than borrowing the request-scoped one
+    def body() -> Iterator[bytes]:
+        with session_factory() as db:
+            rows = fetch(db, EXPORT_BATCH_SIZE)
+            chunks = csv_chunks if export_format == "csv" else ndjson_chunks
+            yield from chunks(keys, rows)
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'}
+    )
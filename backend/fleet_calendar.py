@@ -0,0 +1,62 @@
+import base64
+from datetime import date, datetime, time, timedelta
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+
+# Build a vehicles x days booked matrix from occupancy intervals in one vectorized pass.
+# Each vehicle's row is packed into a little-endian bitmap: bit i of the byte string
+# (byte i // 8, bit i % 8) is set when the vehicle is occupied at any point on from_date + i.
+def build_calendar(
+    vehicle_ids: Sequence[int],
+    intervals: Sequence[Tuple[int, datetime, datetime]],
+    from_date: date,
+    to_date: date
+) -> List[dict]:
+    days = (to_date - from_date).days + 1
+    vehicles = np.asarray(sorted(vehicle_ids), dtype=np.int64)
+    grid = np.zeros((len(vehicles), days + 1), dtype=np.int64)
+
+    if len(intervals) and len(vehicles):
+        origin = datetime.combine(from_date, time.min)
+        count = len(intervals)
+        interval_vehicles = np.fromiter((row[0] for row in intervals), dtype=np.int64, count=count)
+        # Offsets from the window origin in days; timedelta arithmetic is far cheaper than
+        # converting each datetime to datetime64
+        starts = np.fromiter(((row[1] - origin).total_seconds() for row in intervals), dtype=np.float64, count=count)
+        ends = np.fromiter(((row[2] - origin).total_seconds() for row in intervals), dtype=np.float64, count=count)
+
+        rows = np.searchsorted(vehicles, interval_vehicles)
+        rows = np.minimum(rows, len(vehicles) - 1)
+        known = vehicles[rows] == interval_vehicles
+
+        # A day is booked if the interval covers any part of it: floor the start, ceil the end
+        first_day = np.clip(np.floor(starts / SECONDS_PER_DAY), 0, days).astype(np.int64)
+        last_day = np.clip(np.ceil(ends / SECONDS_PER_DAY), 0, days).astype(np.int64)
+        keep = known & (last_day > first_day)
+
+        # Difference array: +1 where an interval starts, -1 where it stops, then a running sum
+        width = days + 1
+        cells = grid.size
+        grid += np.bincount(rows[keep] * width + first_day[keep], minlength=cells).reshape(grid.shape)
+        grid -= np.bincount(rows[keep] * width + last_day[keep], minlength=cells).reshape(grid.shape)
+
+    booked = np.cumsum(grid[:, :days], axis=1) > 0
+    packed = np.packbits(booked, axis=1, bitorder="little")
+    booked_days = booked.sum(axis=1)
+
+    return [
+        {
+            "vehicle_id": int(vehicle_id),
+            "bitmap": base64.b64encode(packed[row].tobytes()).decode("ascii"),
+            "booked_days": int(booked_days[row])
+        }
+        for row, vehicle_id in enumerate(vehicles)
+    ]
+
+
+def window_bounds(from_date: date, to_date: date) -> Tuple[datetime, datetime]:
+    return datetime.combine(from_date, time.min), datetime.combine(to_date + timedelta(days=1), time.min)
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+
+
+def parse_rows(body: bytes, content_type: Optional[str]) -> List[Dict[str, Any]]:
+    # A JSON array of objects, or CSV with a header row; empty CSV cells are left out so the
+    # schema defaults apply
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("Import body must be UTF-8")
+    if media_type in CSV_MEDIA_TYPES:
+        return [{key: value for key, value in row.items() if value != ""} for row in csv.DictReader(io.StringIO(text))]
+    try:
+        rows = json.loads(text)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"Invalid JSON: {exc.msg}")
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Import body must be a JSON array of objects")
+    return rows
+
+
+def _validation_messages(exc: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()]
+
+
+def import_rows(db: Session, crud_obj, create_schema: Type[BaseModel], rows: List[Dict[str, Any]], *,
+                unique: Sequence[str] = (), references: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Validate every row, check unique fields and foreign keys for the whole import with set-based
+    # lookups, insert the rows that passed and report the others by position
+    errors: Dict[int, List[str]] = defaultdict(list)
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, create_schema.model_validate(row).model_dump()))
+        except ValidationError as exc:
+            errors[index].extend(_validation_messages(exc))
+
+    for field in unique:
+        taken = crud_obj.existing_values(db, getattr(crud_obj.model, field), {data[field] for _, data in valid})
+        seen = set()
+        for index, data in valid:
+            value = data[field]
+            if value in taken:
+                errors[index].append(f"{field}: {value} already exists")
+            elif value in seen:
+                errors[index].append(f"{field}: {value} appears more than once in the import")
+            seen.add(value)
+
+    for field, column in (references or {}).items():
+        values = {data[field] for _, data in valid if data[field] is not None}
+        known = crud_obj.existing_values(db, column, values)
+        for index, data in valid:
+            if data[field] is not None and data[field] not in known:
+                errors[index].append(f"{field}: {data[field]} does not exist")
+
+    accepted = [data for index, data in valid if index not in errors]
+    ids = crud_obj.bulk_create(db, rows=accepted) if accepted else []
+    return {
+        "received": len(rows),
+        "created": len(ids),
+        "ids": ids,
+        "errors": [{"row": index, "errors": messages} for index, messages in sorted(errors.items())]
+    }
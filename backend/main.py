@@ -1,22 +1,75 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from decimal import Decimal
+from contextlib import AsyncExitStack, asynccontextmanager
+import asyncio
+import hashlib
+import math
+import os
+import time
 
 import models as models, schemas as schema, crud as crud
-from database import SessionLocal, engine
+import etags
+import exports
+import fleet_calendar
+import imports
+import migrations
+import scheduler
+import serialization
+import snapshots
+import utilization
+from database import (
+    SessionLocal, AsyncSessionLocal, DATABASE_ASYNC, DATABASE_MIGRATE_ON_STARTUP, DATABASE_REPLICA_URLS,
+    DATABASE_UNIT_OF_WORK, REPLICA_STICKY_SECONDS, UNIT_OF_WORK_KEY, async_replica_session, pool_stats,
+    replica_session, unit_of_work
+)
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+MAX_CALENDAR_DAYS = 366
+MAX_UTILIZATION_DAYS = 1096
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+
+def load_indexes() -> None:
+    with SessionLocal() as db:
+        crud.spending_leaderboard.ensure_loaded(db)
+        if DATABASE_ASYNC or DATABASE_REPLICA_URLS:
+            # Coroutines share a thread, so the indexes' lazy loading (guarded by re-entrant locks)
+            # could run twice at once; async mode loads them up front instead. With replicas the
+            # first load must come from the primary, or writes still in replication lag would be
+            # missing from the index for good.
+            for index in (crud.availability_index, crud.customer_search_index, crud.vehicle_facet_index):
+                index.ensure_loaded(db)
+
+# Background jobs: every worker runs a scheduler thread, and the one holding the lease does the work
+OVERDUE_SCAN_INTERVAL = float(os.getenv("OVERDUE_SCAN_INTERVAL", "300"))
+background_jobs = scheduler.Scheduler("background-jobs", OVERDUE_SCAN_INTERVAL, SessionLocal)
+background_jobs.add_job("overdue_rentals", crud.rental.scan_overdue)
+# Each worker has its own leaderboard and availability index, so every worker checks them, leader or not
+background_jobs.add_job("spending_leaderboard", crud.spending_leaderboard.check, leader_only=False)
+background_jobs.add_job("availability_index", crud.availability_index.check, leader_only=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema and derived tables are brought up to date before the first request
+    if DATABASE_MIGRATE_ON_STARTUP:
+        await run_in_threadpool(migrations.upgrade)
+    await run_in_threadpool(load_indexes)
+    background_jobs.start()
+    yield
+    await run_in_threadpool(background_jobs.stop)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Car Rental Management System",
     description="A comprehensive car rental management system with customer management, vehicle tracking, reservations, and rentals.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 origins = [
@@ -30,15 +83,196 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # allows GET, POST, PUT, PATCH, DELETE, OPTIONS...
     allow_headers=["*"],  # allows Content-Type, Authorization, etc.
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", IDEMPOTENT_REPLAY_HEADER],
 )
 
-# Dependency: get DB session
-def get_db():
-    db = SessionLocal()
+# Dependency: get DB session. In unit-of-work mode the request commits once, after the endpoint
+# returns; write endpoints declare it with scope="function" so that commit happens before the
+# response is sent, and an exception skips it and rolls everything back.
+if DATABASE_ASYNC:
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            db.info[UNIT_OF_WORK_KEY] = DATABASE_UNIT_OF_WORK
+            yield db
+            if unit_of_work(db):
+                await db.commit()
+else:
+    def get_db():
+        # On SQLite a booking commits early under its lock; its rows stay loaded for the response
+        db = SessionLocal(expire_on_commit=not DATABASE_UNIT_OF_WORK)
+        db.info[UNIT_OF_WORK_KEY] = DATABASE_UNIT_OF_WORK
+        try:
+            yield db
+            if unit_of_work(db):
+                db.commit()
+        finally:
+            db.close()
+
+# Read-only endpoints use a replica, except for a client that wrote within the last
+# REPLICA_STICKY_SECONDS: the write response sets a cookie holding the time until which its reads
+# stay on the primary
+PRIMARY_UNTIL_COOKIE = "read_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def reads_from_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def read_session_factory(request: Request, use_async: bool = DATABASE_ASYNC):
+    if use_async:
+        return AsyncSessionLocal if reads_from_primary(request) else async_replica_session
+    return SessionLocal if reads_from_primary(request) else replica_session
+
+if DATABASE_REPLICA_URLS:
+    @app.middleware("http")
+    async def read_your_writes(request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_UNTIL_COOKIE, str(time.time() + REPLICA_STICKY_SECONDS),
+                max_age=math.ceil(REPLICA_STICKY_SECONDS), httponly=True, samesite="lax"
+            )
+        return response
+
+if DATABASE_ASYNC:
+    async def get_read_db(request: Request):
+        async with read_session_factory(request)() as db:
+            yield db
+else:
+    def get_read_db(request: Request):
+        db = read_session_factory(request)()
+        try:
+            yield db
+        finally:
+            db.close()
+
+# CRUD methods are written against a sync Session. In async mode they run on the AsyncSession's
+# connection through run_sync, so no thread is held while a query waits; otherwise they are
+# offloaded to the threadpool.
+async def run(db, fn, *args, **kwargs):
+    if DATABASE_ASYNC:
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+# Bookings take a threading stripe lock around their queries. Coroutines share the event loop
+# thread, so in async mode they first queue on the matching asyncio stripe instead of blocking it.
+# A booking that hit a lock timeout, deadlock or overlap violation is retried after an
+# asyncio.sleep, which holds neither the event loop nor a threadpool thread.
+async def run_booking(db, vehicle_id: int, fn, *args, **kwargs):
+    return await run_batch_booking(db, [vehicle_id], fn, *args, **kwargs)
+
+async def run_batch_booking(db, vehicle_ids: List[int], fn, /, *args, **kwargs):
+    for attempt in range(crud.BOOKING_ATTEMPTS):
+        try:
+            if DATABASE_ASYNC:
+                async with AsyncExitStack() as stack:
+                    for lock in crud.async_booking_locks(vehicle_ids):
+                        await stack.enter_async_context(lock)
+                    return await run(db, fn, *args, **kwargs)
+            return await run(db, fn, *args, **kwargs)
+        except DBAPIError as exc:
+            if not crud.is_retryable(exc) or attempt == crud.BOOKING_ATTEMPTS - 1:
+                raise
+        await asyncio.sleep(crud.BOOKING_RETRY_DELAY * (attempt + 1))
+
+# Batch status changes into a status that blocks the vehicle are booked like single bookings,
+# under every affected vehicle's lock; overlaps are refused with a 409 naming the rows
+async def batch_update_status(db, crud_obj, ids: List[int], status: str, blocking_statuses):
+    values = {"status": status}
+    if status not in blocking_statuses:
+        return await run(db, crud_obj.update_many, ids=ids, values=values)
+    vehicle_ids = await run(db, crud_obj.vehicle_ids, ids=ids)
+    try:
+        return await run_batch_booking(db, vehicle_ids, crud_obj.book_many, ids=ids, values=values, vehicle_ids=vehicle_ids)
+    except crud.BookingConflict as exc:
+        raise HTTPException(
+            status_code=409, detail={"message": "Vehicle is not available for the selected dates", "conflicting_ids": exc.ids}
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+# Bulk imports take a JSON array or a CSV body (Content-Type: text/csv) and insert every valid row;
+# rejected rows are reported by position instead of failing the whole import
+async def bulk_import(request: Request, db, crud_obj, create_schema, **checks):
     try:
-        yield db
-    finally:
-        db.close()
+        rows = imports.parse_rows(await request.body(), request.headers.get("content-type"))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return await run(db, imports.import_rows, crud_obj, create_schema, rows, **checks)
+
+# A POST sent with an Idempotency-Key creates its row once: retries with the same key and body get
+# the stored response back. The request runs as a unit of work, so the claimed key, the new row
+# and the stored response commit together and a concurrent retry cannot insert a second row.
+# create(record) gets a callback for flows that commit before the endpoint returns (bookings on
+# SQLite): called with the session and the new row, it stores the response in that transaction.
+async def idempotent_create(db, scope: str, key: Optional[str], payload, response_schema, create):
+    if key is None:
+        return await create(None)
+    db.info[UNIT_OF_WORK_KEY] = True
+    request_hash = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+    stored = await run(db, crud.idempotency_key.claim, scope=scope, key=key, request_hash=request_hash)
+    if stored is not None:
+        if stored.request_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if stored.status_code is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        return Response(
+            stored.response_body, status_code=stored.status_code, media_type="application/json",
+            headers={IDEMPOTENT_REPLAY_HEADER: "true"}
+        )
+    recorded = []
+    
+    def record(session: Session, obj) -> None:
+        body = response_schema.model_validate(obj).model_dump_json()
+        crud.idempotency_key.complete(
+            session, scope=scope, key=key, request_hash=request_hash,
+            status_code=status.HTTP_201_CREATED, response_body=body
+        )
+        recorded.append(body)
+    
+    created = await create(record)
+    if recorded:
+        # A retried booking records again, so the last body is the one that committed
+        body = recorded[-1]
+    else:
+        body = response_schema.model_validate(created).model_dump_json()
+        await run(
+            db, crud.idempotency_key.complete, scope=scope, key=key, request_hash=request_hash,
+            status_code=status.HTTP_201_CREATED, response_body=body
+        )
+    return Response(body, status_code=status.HTTP_201_CREATED, media_type="application/json")
+
+# Keyset pagination: list endpoints return the cursor for the following page in a header
+def with_next_cursor(response: Response, page: crud.Page) -> crud.Page:
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return page
+
+# Conditional GET: a matching If-None-Match is answered with 304 before the response_model
+# serialization runs; the ETag comes from row versions (or column values for unversioned rows)
+def conditional(response: Response, if_none_match: Optional[str], result, etag: str):
+    response.headers["ETag"] = etag
+    if etags.matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=passthrough_headers(response))
+    return result
+
+def conditional_page(response: Response, if_none_match: Optional[str], page: crud.Page):
+    with_next_cursor(response, page)
+    return conditional(response, if_none_match, page, etags.entity_tag(page, page.next_cursor))
+
+# Fast mode: column-only Row tuples are encoded as-is, skipping response_model validation
+def fast_page(response: Response, if_none_match: Optional[str], page: crud.Page):
+    with_next_cursor(response, page)
+    not_modified = conditional(response, if_none_match, None, etags.rows_tag(page, page.next_cursor))
+    if not_modified is not None:
+        return not_modified
+    return serialization.FastJSONResponse(serialization.rows_as_dicts(page), headers=passthrough_headers(response))
+
+# Headers set on the injected response that a directly returned Response has to carry over
+def passthrough_headers(response: Response) -> dict:
+    return {name: response.headers[name] for name in ("ETag", NEXT_CURSOR_HEADER) if name in response.headers}
 
 # Exception handlers
 @app.exception_handler(ValueError)
@@ -57,146 +291,208 @@ async def root():
         # "docs": "/docs"
     }
 
+# =============================================================================
+# DASHBOARD ENDPOINTS
+# =============================================================================
+
+@app.get("/dashboard/summary", response_model=schema.DashboardSummary)
+async def get_dashboard_summary(db: Session = Depends(get_read_db)):
+    """Get fleet-wide dashboard counters"""
+    return await run(db, crud.dashboard.get_summary)
+
 # =============================================================================
 # CUSTOMER ENDPOINTS
 # =============================================================================
 
 @app.post("/customers/", response_model=schema.Customer, status_code=status.HTTP_201_CREATED)
-def create_customer(customer: schema.CustomerCreate, db: Session = Depends(get_db)):
+async def create_customer(customer: schema.CustomerCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new customer"""
     # Check if email already exists
-    db_customer = crud.customer.get_by_email(db, email=customer.email)
+    db_customer = await run(db, crud.customer.get_by_email, email=customer.email)
     if db_customer:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Check if driver license already exists
-    db_customer = crud.customer.get_by_driver_license(db, driver_license=customer.driver_license)
+    db_customer = await run(db, crud.customer.get_by_driver_license, driver_license=customer.driver_license)
     if db_customer:
         raise HTTPException(status_code=400, detail="Driver license already registered")
     
-    return crud.customer.create(db=db, obj_in=customer)
+    return await run(db, crud.customer.create, obj_in=customer)
+
+@app.post("/customers/bulk", response_model=schema.BulkImportResult)
+async def bulk_import_customers(request: Request, db: Session = Depends(get_db, scope="function")):
+    """Import customers from a JSON array or CSV"""
+    return await bulk_import(request, db, crud.customer, schema.CustomerCreate, unique=("email", "driver_license"))
 
 @app.get("/customers/", response_model=List[schema.Customer])
-def read_customers(
+async def read_customers(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get all customers with pagination"""
-    customers = crud.customer.get_multi(db, skip=skip, limit=limit)
+    customers = with_next_cursor(response, await run(db, crud.customer.get_multi, skip=skip, limit=limit, cursor=cursor))
     return customers
 
 @app.get("/customers/{customer_id}", response_model=schema.CustomerWithProfile)
-def read_customer(customer_id: int, db: Session = Depends(get_db)):
+async def read_customer(customer_id: int, db: Session = Depends(get_read_db)):
     """Get customer by ID with profile information"""
-    db_customer = crud.customer.get_with_profile(db, customer_id=customer_id)
+    db_customer = await run(db, crud.customer.get_with_profile, customer_id=customer_id)
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     return db_customer
 
 @app.put("/customers/{customer_id}", response_model=schema.Customer)
-def update_customer(
+async def update_customer(
     customer_id: int, 
     customer: schema.CustomerUpdate, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Update customer information"""
-    db_customer = crud.customer.get(db, id=customer_id)
+    db_customer = await run(db, crud.customer.get, id=customer_id)
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    return crud.customer.update(db=db, db_obj=db_customer, obj_in=customer)
+    return await run(db, crud.customer.update, db_obj=db_customer, obj_in=customer)
 
 @app.delete("/customers/{customer_id}")
-def delete_customer(customer_id: int, db: Session = Depends(get_db)):
+async def delete_customer(customer_id: int, db: Session = Depends(get_db, scope="function")):
     """Delete a customer"""
-    db_customer = crud.customer.delete(db=db, id=customer_id)
+    db_customer = await run(db, crud.customer.delete, id=customer_id)
     if db_customer is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     return {"message": "Customer deleted successfully"}
 
 @app.get("/customers/search/", response_model=List[schema.Customer])
-def search_customers(
+async def search_customers(
     q: str = Query(..., min_length=1),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Search customers by name, email, or phone"""
-    return crud.customer.search_customers(db, search_term=q, skip=skip, limit=limit)
+    return await run(db, crud.customer.search_customers, search_term=q, skip=skip, limit=limit)
 
 @app.get("/customers/top/spending", response_model=List[schema.Customer])
-def get_top_customers(limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+async def get_top_customers(
+    limit: int = Query(10, ge=1, le=50),
+    tier: Optional[str] = Query(None, description="Only customers in this membership tier"),
+    location_id: Optional[int] = Query(None, description="Only customers whose latest completed rental started here"),
+    db: Session = Depends(get_read_db)
+):
     """Get top customers by lifetime spending"""
-    return crud.customer.get_top_customers(db, limit=limit)
+    return await run(db, crud.customer.get_top_customers, limit=limit, tier=tier, location_id=location_id)
 
 # =============================================================================
 # VEHICLE ENDPOINTS
 # =============================================================================
 
 @app.post("/vehicles/", response_model=schema.Vehicle, status_code=status.HTTP_201_CREATED)
-def create_vehicle(vehicle: schema.VehicleCreate, db: Session = Depends(get_db)):
+async def create_vehicle(vehicle: schema.VehicleCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new vehicle"""
     # Check if license plate already exists
-    db_vehicle = crud.vehicle.get_by_license_plate(db, license_plate=vehicle.license_plate)
+    db_vehicle = await run(db, crud.vehicle.get_by_license_plate, license_plate=vehicle.license_plate)
     if db_vehicle:
         raise HTTPException(status_code=400, detail="License plate already exists")
     
-    return crud.vehicle.create(db=db, obj_in=vehicle)
+    return await run(db, crud.vehicle.create, obj_in=vehicle)
+
+@app.post("/vehicles/bulk", response_model=schema.BulkImportResult)
+async def bulk_import_vehicles(request: Request, db: Session = Depends(get_db, scope="function")):
+    """Import vehicles from a JSON array or CSV"""
+    return await bulk_import(
+        request, db, crud.vehicle, schema.VehicleCreate,
+        unique=("license_plate",), references={"location_id": models.Location.location_id}
+    )
 
 @app.get("/vehicles/", response_model=List[schema.Vehicle])
-def read_vehicles(
+async def read_vehicles(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Get all vehicles with pagination"""
-    return crud.vehicle.get_multi(db, skip=skip, limit=limit)
+    return conditional_page(response, if_none_match, await run(db, crud.vehicle.get_multi, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/vehicles/available", response_model=List[schema.Vehicle])
-def get_available_vehicles(
+async def get_available_vehicles(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Get all available vehicles"""
-    return crud.vehicle.get_available_vehicles(db, skip=skip, limit=limit)
+    return conditional_page(response, if_none_match, await run(db, crud.vehicle.get_available_vehicles, skip=skip, limit=limit, cursor=cursor))
+
+@app.get("/vehicles/available-between", response_model=List[schema.Vehicle])
+async def get_vehicles_available_between(
+    start: datetime = Query(..., description="Start of the requested window"),
+    end: datetime = Query(..., description="End of the requested window"),
+    location_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get every vehicle with nothing on its occupancy timeline overlapping the window"""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="End must be after start")
+    return await run(db, crud.vehicle.get_available_between, start_date=start, end_date=end, location_id=location_id)
 
 @app.get("/vehicles/{vehicle_id}", response_model=schema.VehicleWithFeatures)
-def read_vehicle(vehicle_id: int, db: Session = Depends(get_db)):
+async def read_vehicle(
+    response: Response,
+    vehicle_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
     """Get vehicle by ID with features and maintenance info"""
-    db_vehicle = crud.vehicle.get_with_features(db, vehicle_id=vehicle_id)
+    db_vehicle = await run(db, crud.vehicle.get_with_features, vehicle_id=vehicle_id)
     if db_vehicle is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
-    return db_vehicle
+    etag = etags.entity_tag(etags.with_related(db_vehicle, "features", "maintenance_record"))
+    return conditional(response, if_none_match, db_vehicle, etag)
 
 @app.put("/vehicles/{vehicle_id}", response_model=schema.Vehicle)
-def update_vehicle(
+async def update_vehicle(
     vehicle_id: int,
     vehicle: schema.VehicleUpdate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Update vehicle information"""
-    db_vehicle = crud.vehicle.get(db, id=vehicle_id)
+    db_vehicle = await run(db, crud.vehicle.get, id=vehicle_id)
     if db_vehicle is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
-    return crud.vehicle.update(db=db, db_obj=db_vehicle, obj_in=vehicle)
+    return await run(db, crud.vehicle.update, db_obj=db_vehicle, obj_in=vehicle)
+
+@app.patch("/vehicles/batch", response_model=List[schema.Vehicle])
+async def batch_update_vehicles(batch: schema.VehicleBatchUpdate, db: Session = Depends(get_db, scope="function")):
+    """Apply availability and location changes to many vehicles in one update"""
+    values = batch.model_dump(exclude_unset=True, exclude={"vehicle_ids"})
+    if not values:
+        raise HTTPException(status_code=400, detail="No changes given")
+    return await run(db, crud.vehicle.update_many, ids=batch.vehicle_ids, values=values)
 
 @app.patch("/vehicles/{vehicle_id}/availability")
-def update_vehicle_availability(
+async def update_vehicle_availability(
     vehicle_id: int,
     available: bool,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Update vehicle availability status"""
-    db_vehicle = crud.vehicle.update_availability(db, vehicle_id=vehicle_id, available=available)
+    db_vehicle = await run(db, crud.vehicle.update_availability, vehicle_id=vehicle_id, available=available)
     if db_vehicle is None:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     return {"message": f"Vehicle availability updated to {available}"}
 
 @app.get("/vehicles/filter/", response_model=List[schema.Vehicle])
-def filter_vehicles(
+async def filter_vehicles(
+    response: Response,
     make: Optional[str] = None,
     model: Optional[str] = None,
     fuel_type: Optional[str] = None,
@@ -209,7 +505,8 @@ def filter_vehicles(
     max_daily_rate: Optional[Decimal] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Filter vehicles by various criteria"""
     filters = schema.VehicleFilters(
@@ -224,84 +521,165 @@ def filter_vehicles(
         min_daily_rate=min_daily_rate,
         max_daily_rate=max_daily_rate
     )
-    return crud.vehicle.filter_vehicles(db, filters=filters, skip=skip, limit=limit)
+    return with_next_cursor(response, await run(db, crud.vehicle.filter_vehicles, filters=filters, skip=skip, limit=limit, cursor=cursor))
+
+@app.get("/vehicles/filter/faceted", response_model=schema.VehicleFacetedResults)
+async def filter_vehicles_faceted(
+    make: Optional[str] = None,
+    model: Optional[str] = None,
+    fuel_type: Optional[str] = None,
+    transmission: Optional[str] = None,
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    availability: Optional[bool] = None,
+    location_id: Optional[int] = None,
+    min_daily_rate: Optional[Decimal] = None,
+    max_daily_rate: Optional[Decimal] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    db: Session = Depends(get_read_db)
+):
+    """Filter vehicles and return facet counts for make, fuel type, transmission, year, location and daily rate"""
+    filters = schema.VehicleFilters(
+        make=make,
+        model=model,
+        fuel_type=fuel_type,
+        transmission=transmission,
+        min_year=min_year,
+        max_year=max_year,
+        availability=availability,
+        location_id=location_id,
+        min_daily_rate=min_daily_rate,
+        max_daily_rate=max_daily_rate
+    )
+    return await run(db, crud.vehicle.filter_vehicles_faceted, filters=filters, skip=skip, limit=limit)
 
 @app.get("/vehicles/maintenance/needed", response_model=List[schema.Vehicle])
-def get_vehicles_needing_maintenance(db: Session = Depends(get_db)):
+async def get_vehicles_needing_maintenance(db: Session = Depends(get_read_db)):
     """Get vehicles that need maintenance"""
-    return crud.vehicle.get_vehicles_needing_maintenance(db)
+    return await run(db, crud.vehicle.get_vehicles_needing_maintenance)
+
+# =============================================================================
+# FLEET CALENDAR ENDPOINTS
+# =============================================================================
+
+@app.get("/fleet/calendar", response_model=schema.FleetCalendar)
+async def get_fleet_calendar(
+    from_date: date = Query(..., alias="from", description="First day of the calendar"),
+    to_date: date = Query(..., alias="to", description="Last day of the calendar (inclusive)"),
+    location_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get a per-vehicle bitmap of booked days for a date range"""
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_date - from_date).days >= MAX_CALENDAR_DAYS:
+        raise HTTPException(status_code=400, detail=f"Calendar range is limited to {MAX_CALENDAR_DAYS} days")
+    
+    window_start, window_end = fleet_calendar.window_bounds(from_date, to_date)
+    vehicle_ids = await run(db, crud.vehicle.get_ids, location_id=location_id)
+    intervals = await run(
+        db, crud.vehicle_occupancy.get_intervals_in_window,
+        start_date=window_start, end_date=window_end, location_id=location_id
+    )
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "days": (to_date - from_date).days + 1,
+        "location_id": location_id,
+        "vehicles": fleet_calendar.build_calendar(vehicle_ids, intervals, from_date, to_date)
+    }
 
 # =============================================================================
 # RESERVATION ENDPOINTS
 # =============================================================================
 
 @app.post("/reservations/", response_model=schema.Reservation, status_code=status.HTTP_201_CREATED)
-def create_reservation(reservation: schema.ReservationCreate, db: Session = Depends(get_db)):
+async def create_reservation(reservation: schema.ReservationCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new reservation"""
-    # Check vehicle availability
-    is_available = crud.reservation.check_vehicle_availability(
-        db,
-        vehicle_id=reservation.vehicle_id,
-        start_date=reservation.reserved_start_date,
-        end_date=reservation.reserved_end_date
-    )
-    if not is_available:
+    # Availability check and insert happen under a per-vehicle lock
+    db_reservation = await run_booking(db, reservation.vehicle_id, crud.reservation.book, obj_in=reservation)
+    if db_reservation is None:
         raise HTTPException(status_code=400, detail="Vehicle is not available for the selected dates")
-    
-    return crud.reservation.create(db=db, obj_in=reservation)
+    return db_reservation
 
 @app.get("/reservations/", response_model=List[schema.Reservation])
-def read_reservations(
+async def read_reservations(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fast: bool = Query(False, description="Encode rows directly, skipping response model validation"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Get all reservations"""
-    return crud.reservation.get_multi(db, skip=skip, limit=limit)
+    if fast:
+        columns = serialization.response_columns(models.Reservation, schema.Reservation)
+        return fast_page(response, if_none_match, await run(db, crud.reservation.get_multi_rows, columns=columns, skip=skip, limit=limit, cursor=cursor))
+    return conditional_page(response, if_none_match, await run(db, crud.reservation.get_multi, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/reservations/active", response_model=List[schema.Reservation])
-def get_active_reservations(
+async def get_active_reservations(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Get active reservations"""
-    return crud.reservation.get_active_reservations(db, skip=skip, limit=limit)
+    return conditional_page(response, if_none_match, await run(db, crud.reservation.get_active_reservations, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/reservations/{reservation_id}", response_model=schema.Reservation)
-def read_reservation(reservation_id: int, db: Session = Depends(get_db)):
+async def read_reservation(
+    response: Response,
+    reservation_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
     """Get reservation by ID"""
-    db_reservation = crud.reservation.get(db, id=reservation_id)
+    db_reservation = await run(db, crud.reservation.get, id=reservation_id)
     if db_reservation is None:
         raise HTTPException(status_code=404, detail="Reservation not found")
-    return db_reservation
+    return conditional(response, if_none_match, db_reservation, etags.entity_tag([db_reservation]))
+
+@app.patch("/reservations/batch", response_model=List[schema.Reservation])
+async def batch_update_reservations(batch: schema.ReservationBatchUpdate, db: Session = Depends(get_db, scope="function")):
+    """Apply a status change to many reservations in one update"""
+    return await batch_update_status(
+        db, crud.reservation, batch.reservation_ids, batch.status, crud.BLOCKING_RESERVATION_STATUSES
+    )
 
 @app.put("/reservations/{reservation_id}", response_model=schema.Reservation)
-def update_reservation(
+async def update_reservation(
     reservation_id: int,
     reservation: schema.ReservationUpdate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Update reservation"""
-    db_reservation = crud.reservation.get(db, id=reservation_id)
+    db_reservation = await run(db, crud.reservation.get, id=reservation_id)
     if db_reservation is None:
         raise HTTPException(status_code=404, detail="Reservation not found")
     
-    return crud.reservation.update(db=db, db_obj=db_reservation, obj_in=reservation)
+    return await run(db, crud.reservation.update, db_obj=db_reservation, obj_in=reservation)
 
 @app.get("/reservations/customer/{customer_id}", response_model=List[schema.Reservation])
-def get_customer_reservations(customer_id: int, db: Session = Depends(get_db)):
+async def get_customer_reservations(customer_id: int, db: Session = Depends(get_read_db)):
     """Get customer's reservations"""
-    return crud.reservation.get_customer_reservations(db, customer_id=customer_id)
+    return await run(db, crud.reservation.get_customer_reservations, customer_id=customer_id)
 
 @app.post("/reservations/{reservation_id}/convert", response_model=schema.Rental)
-def convert_reservation_to_rental(
+async def convert_reservation_to_rental(
     reservation_id: int,
     rental_data: schema.RentalCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Convert a reservation to a rental"""
-    rental = crud.reservation.convert_to_rental(db, reservation_id=reservation_id, rental_data=rental_data)
+    rental = await run_booking(
+        db, rental_data.vehicle_id, crud.reservation.convert_to_rental,
+        reservation_id=reservation_id, rental_data=rental_data
+    )
     if rental is None:
         raise HTTPException(status_code=400, detail="Cannot convert reservation to rental")
     return rental
@@ -311,55 +689,85 @@ def convert_reservation_to_rental(
 # =============================================================================
 
 @app.post("/rentals/", response_model=schema.Rental, status_code=status.HTTP_201_CREATED)
-def create_rental(rental: schema.RentalCreate, db: Session = Depends(get_db)):
+async def create_rental(
+    rental: schema.RentalCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db, scope="function")
+):
     """Create a new rental"""
-    # Update vehicle availability
-    crud.vehicle.update_availability(db, vehicle_id=rental.vehicle_id, available=False)
-    return crud.rental.create(db=db, obj_in=rental)
+    async def book(record):
+        # Availability check, vehicle availability update and insert happen under a per-vehicle lock
+        db_rental = await run_booking(db, rental.vehicle_id, crud.rental.book, obj_in=rental, on_booked=record)
+        if db_rental is None:
+            raise HTTPException(status_code=400, detail="Vehicle is not available for the selected dates")
+        return db_rental
+    
+    return await idempotent_create(db, "rentals", idempotency_key, rental, schema.Rental, book)
 
 @app.get("/rentals/", response_model=List[schema.Rental])
-def read_rentals(
+async def read_rentals(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fast: bool = Query(False, description="Encode rows directly, skipping response model validation"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Get all rentals"""
-    return crud.rental.get_multi(db, skip=skip, limit=limit)
+    if fast:
+        columns = serialization.response_columns(models.Rental, schema.Rental)
+        return fast_page(response, if_none_match, await run(db, crud.rental.get_multi_rows, columns=columns, skip=skip, limit=limit, cursor=cursor))
+    return conditional_page(response, if_none_match, await run(db, crud.rental.get_multi, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/rentals/active", response_model=List[schema.Rental])
-def get_active_rentals(
+async def get_active_rentals(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Get active rentals"""
-    return crud.rental.get_active_rentals(db, skip=skip, limit=limit)
+    return conditional_page(response, if_none_match, await run(db, crud.rental.get_active_rentals, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/rentals/overdue", response_model=List[schema.Rental])
-def get_overdue_rentals(db: Session = Depends(get_db)):
+async def get_overdue_rentals(db: Session = Depends(get_read_db)):
     """Get overdue rentals"""
-    return crud.rental.get_overdue_rentals(db)
+    return await run(db, crud.rental.get_overdue_rentals)
 
 @app.get("/rentals/{rental_id}", response_model=schema.RentalWithDetails)
-def read_rental(rental_id: int, db: Session = Depends(get_db)):
+async def read_rental(
+    response: Response,
+    rental_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
     """Get rental by ID with full details"""
-    db_rental = crud.rental.get_with_details(db, rental_id=rental_id)
+    db_rental = await run(db, crud.rental.get_with_details, rental_id=rental_id)
     if db_rental is None:
         raise HTTPException(status_code=404, detail="Rental not found")
-    return db_rental
+    etag = etags.entity_tag(etags.with_related(
+        db_rental, "customer", "vehicle", "employee", "pickup_location", "return_location", "payments", "incident_reports"
+    ))
+    return conditional(response, if_none_match, db_rental, etag)
 
 @app.get("/rentals/customer/{customer_id}", response_model=List[schema.Rental])
-def get_customer_rentals(
+async def get_customer_rentals(
+    response: Response,
     customer_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get customer's rental history"""
-    return crud.rental.get_customer_rentals(db, customer_id=customer_id, skip=skip, limit=limit)
+    return with_next_cursor(response, await run(db, crud.rental.get_customer_rentals, customer_id=customer_id, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/rentals/filter/", response_model=List[schema.Rental])
-def filter_rentals(
+async def filter_rentals(
+    response: Response,
     customer_id: Optional[int] = None,
     vehicle_id: Optional[int] = None,
     status: Optional[str] = None,
@@ -369,7 +777,8 @@ def filter_rentals(
     return_location_id: Optional[int] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Filter rentals by various criteria"""
     filters = schema.RentalFilters(
@@ -381,245 +790,365 @@ def filter_rentals(
         pickup_location_id=pickup_location_id,
         return_location_id=return_location_id
     )
-    return crud.rental.filter_rentals(db, filters=filters, skip=skip, limit=limit)
+    return with_next_cursor(response, await run(db, crud.rental.filter_rentals, filters=filters, skip=skip, limit=limit, cursor=cursor))
 
 @app.patch("/rentals/{rental_id}/return", response_model=schema.Rental)
-def return_rental_vehicle(
+async def return_rental_vehicle(
     rental_id: int,
     mileage_end: Optional[int] = None,
     fuel_level_end: Optional[Decimal] = None,
     late_fees: Optional[Decimal] = None,
     damage_fees: Optional[Decimal] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Return a rental vehicle"""
     return_data = {
         "actual_return_date": datetime.now(),
         "mileage_end": mileage_end,
         "fuel_level_end": fuel_level_end,
-        "late_fees": late_fees or Decimal('0.00'),
+        "late_fees": late_fees,
         "damage_fees": damage_fees or Decimal('0.00')
     }
     
-    rental = crud.rental.return_vehicle(db, rental_id=rental_id, return_data=return_data)
+    rental = await run(db, crud.rental.return_vehicle, rental_id=rental_id, return_data=return_data)
     if rental is None:
         raise HTTPException(status_code=404, detail="Rental not found")
     
     # Update customer membership spending
-    crud.membership_profile.update_spending(db, customer_id=rental.customer_id, amount=rental.total_amount)
+    await run(
+        db, crud.membership_profile.update_spending,
+        customer_id=rental.customer_id, amount=rental.total_amount
+    )
     
     return rental
 
 @app.get("/rentals/revenue/report")
-def get_rental_revenue(
+async def get_rental_revenue(
     start_date: date = Query(..., description="Start date for revenue report"),
     end_date: date = Query(..., description="End date for revenue report"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get rental revenue for a date range"""
-    revenue = crud.rental.get_rental_revenue(db, start_date=start_date, end_date=end_date)
+    revenue = await run(db, crud.rental.get_rental_revenue, start_date=start_date, end_date=end_date)
     return {
         "start_date": start_date,
         "end_date": end_date,
         "total_revenue": revenue
     }
 
+# =============================================================================
+# REPORT ENDPOINTS
+# =============================================================================
+
+@app.get("/reports/revenue", response_model=schema.RevenueReport)
+async def get_revenue_report(
+    start_date: date = Query(..., description="First day of the report"),
+    end_date: date = Query(..., description="Last day of the report, inclusive"),
+    group_by: str = Query("day", pattern="^(day|week|month)$"),
+    by_location: bool = Query(False, description="Break each period down by pickup location"),
+    by_make: bool = Query(False, description="Break each period down by vehicle make"),
+    location_id: Optional[int] = None,
+    make: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get completed-rental revenue per day, week or month from the daily rollups"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    rows = await run(
+        db, crud.revenue_rollup.report, start_date=start_date, end_date=end_date, group_by=group_by,
+        by_location=by_location, by_make=by_make, location_id=location_id, make=make
+    )
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "group_by": group_by,
+        "total_rentals": sum(row["rental_count"] for row in rows),
+        "total_revenue": sum((row["revenue"] for row in rows), Decimal("0.00")),
+        "rows": rows
+    }
+
+@app.get("/reports/utilization", response_model=schema.UtilizationReport)
+async def get_utilization_report(
+    from_date: date = Query(..., alias="from", description="First day of the report"),
+    to_date: date = Query(..., alias="to", description="Last day of the report (inclusive)"),
+    group_by: str = Query("location", pattern="^(vehicle|location|make|day)$"),
+    location_id: Optional[int] = None,
+    make: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get the share of time on rent, idle gaps and revenue per available day for the fleet"""
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (to_date - from_date).days >= MAX_UTILIZATION_DAYS:
+        raise HTTPException(status_code=400, detail=f"Utilization range is limited to {MAX_UTILIZATION_DAYS} days")
+    
+    window_start, window_end = fleet_calendar.window_bounds(from_date, to_date)
+    vehicles = await run(db, crud.vehicle.get_dimensions, location_id=location_id, make=make)
+    rentals = await run(
+        db, crud.rental.get_intervals_in_window,
+        start_date=window_start, end_date=window_end, location_id=location_id, make=make
+    )
+    report = await run_in_threadpool(utilization.utilization_report, vehicles, rentals, from_date, to_date, group_by)
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "group_by": group_by,
+        "location_id": location_id,
+        "make": make,
+        **report
+    }
+
+@app.post("/reports/revenue/rebuild", response_model=schema.RevenueRollupRebuild)
+async def rebuild_revenue_rollups(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db, scope="function")
+):
+    """Recompute the daily revenue rollups for a date range (all dates by default) from the rentals"""
+    buckets = await run(db, crud.revenue_rollup.rebuild, start_date=start_date, end_date=end_date)
+    return {"start_date": start_date, "end_date": end_date, "buckets": buckets}
+
 # =============================================================================
 # EMPLOYEE ENDPOINTS
 # =============================================================================
 
 @app.post("/employees/", response_model=schema.Employee, status_code=status.HTTP_201_CREATED)
-def create_employee(employee: schema.EmployeeCreate, db: Session = Depends(get_db)):
+async def create_employee(employee: schema.EmployeeCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new employee"""
     # Check if email already exists
-    db_employee = crud.employee.get_by_email(db, email=employee.email)
+    db_employee = await run(db, crud.employee.get_by_email, email=employee.email)
     if db_employee:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    return crud.employee.create(db=db, obj_in=employee)
+    return await run(db, crud.employee.create, obj_in=employee)
 
 @app.get("/employees/", response_model=List[schema.Employee])
-def read_employees(
+async def read_employees(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get all employees"""
-    return crud.employee.get_multi(db, skip=skip, limit=limit)
+    return with_next_cursor(response, await run(db, crud.employee.get_multi, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/employees/active", response_model=List[schema.Employee])
-def get_active_employees(
+async def get_active_employees(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get active employees"""
-    return crud.employee.get_active_employees(db, skip=skip, limit=limit)
+    return with_next_cursor(response, await run(db, crud.employee.get_active_employees, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/employees/{employee_id}", response_model=schema.Employee)
-def read_employee(employee_id: int, db: Session = Depends(get_db)):
+async def read_employee(employee_id: int, db: Session = Depends(get_read_db)):
     """Get employee by ID"""
-    db_employee = crud.employee.get(db, id=employee_id)
+    db_employee = await run(db, crud.employee.get, id=employee_id)
     if db_employee is None:
         raise HTTPException(status_code=404, detail="Employee not found")
     return db_employee
 
 @app.get("/employees/role/{role}", response_model=List[schema.Employee])
-def get_employees_by_role(role: str, db: Session = Depends(get_db)):
+async def get_employees_by_role(role: str, db: Session = Depends(get_read_db)):
     """Get employees by role"""
-    return crud.employee.get_by_role(db, role=role)
+    return await run(db, crud.employee.get_by_role, role=role)
 
 @app.get("/employees/location/{location_id}", response_model=List[schema.Employee])
-def get_employees_by_location(location_id: int, db: Session = Depends(get_db)):
+async def get_employees_by_location(location_id: int, db: Session = Depends(get_read_db)):
     """Get employees by location"""
-    return crud.employee.get_by_location(db, location_id=location_id)
+    return await run(db, crud.employee.get_by_location, location_id=location_id)
 
 # =============================================================================
 # LOCATION ENDPOINTS
 # =============================================================================
 
 @app.post("/locations/", response_model=schema.Location, status_code=status.HTTP_201_CREATED)
-def create_location(location: schema.LocationCreate, db: Session = Depends(get_db)):
+async def create_location(location: schema.LocationCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new location"""
-    return crud.location.create(db=db, obj_in=location)
+    return await run(db, crud.location.create, obj_in=location)
+
+@app.post("/locations/bulk", response_model=schema.BulkImportResult)
+async def bulk_import_locations(request: Request, db: Session = Depends(get_db, scope="function")):
+    """Import locations from a JSON array or CSV"""
+    return await bulk_import(
+        request, db, crud.location, schema.LocationCreate, references={"manager_id": models.Employee.employee_id}
+    )
 
 @app.get("/locations/", response_model=List[schema.Location])
-def read_locations(
+async def read_locations(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get all locations"""
-    return crud.location.get_multi(db, skip=skip, limit=limit)
+    return with_next_cursor(response, await run(db, crud.location.get_multi, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/locations/{location_id}", response_model=schema.LocationWithEmployees)
-def read_location(location_id: int, db: Session = Depends(get_db)):
+async def read_location(location_id: int, db: Session = Depends(get_read_db)):
     """Get location by ID with employees and vehicles"""
-    db_location = crud.location.get_with_details(db, location_id=location_id)
+    db_location = await run(db, crud.location.get_with_details, location_id=location_id)
     if db_location is None:
         raise HTTPException(status_code=404, detail="Location not found")
     return db_location
 
 @app.get("/locations/city/{city}", response_model=List[schema.Location])
-def get_locations_by_city(city: str, db: Session = Depends(get_db)):
+async def get_locations_by_city(city: str, db: Session = Depends(get_read_db)):
     """Get locations by city"""
-    return crud.location.get_by_city(db, city=city)
+    return await run(db, crud.location.get_by_city, city=city)
 
 # =============================================================================
 # PAYMENT ENDPOINTS
 # =============================================================================
 
 @app.post("/payments/", response_model=schema.Payment, status_code=status.HTTP_201_CREATED)
-def create_payment(payment: schema.PaymentCreate, db: Session = Depends(get_db)):
+async def create_payment(
+    payment: schema.PaymentCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db, scope="function")
+):
     """Create a new payment"""
-    return crud.payment.create(db=db, obj_in=payment)
+    return await idempotent_create(
+        db, "payments", idempotency_key, payment, schema.Payment,
+        lambda record: run(db, crud.payment.create, obj_in=payment)
+    )
 
 @app.get("/payments/rental/{rental_id}", response_model=List[schema.Payment])
-def get_rental_payments(rental_id: int, db: Session = Depends(get_db)):
+async def get_rental_payments(rental_id: int, db: Session = Depends(get_read_db)):
     """Get payments for a rental"""
-    return crud.payment.get_rental_payments(db, rental_id=rental_id)
+    return await run(db, crud.payment.get_rental_payments, rental_id=rental_id)
 
 @app.get("/payments/failed", response_model=List[schema.Payment])
-def get_failed_payments(db: Session = Depends(get_db)):
+async def get_failed_payments(
+    fast: bool = Query(False, description="Encode rows directly, skipping response model validation"),
+    db: Session = Depends(get_read_db)
+):
     """Get failed payments"""
-    return crud.payment.get_failed_payments(db)
-
-@app.get("/payments/report")
-def get_payments_report(
+    if fast:
+        columns = serialization.response_columns(models.Payment, schema.Payment)
+        return serialization.FastJSONResponse(serialization.rows_as_dicts(await run(db, crud.payment.get_failed_payments, columns=columns)))
+    return await run(db, crud.payment.get_failed_payments)
+
+@app.get("/payments/report", response_model=schema.PaymentsReport)
+async def get_payments_report(
+    request: Request,
     start_date: date = Query(..., description="Start date for payments report"),
-    end_date: date = Query(..., description="End date for payments report"),
-    db: Session = Depends(get_db)
+    end_date: date = Query(..., description="End date for payments report, inclusive"),
+    details: bool = Query(False, description="Stream the completed payments in the range instead of the totals"),
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    db: Session = Depends(get_read_db)
 ):
-    """Get payments report for a date range"""
-    payments = crud.payment.get_payments_by_date_range(db, start_date=start_date, end_date=end_date)
-    total_amount = sum(payment.amount for payment in payments)
-    return {
-        "start_date": start_date,
-        "end_date": end_date,
-        "total_payments": len(payments),
-        "total_amount": total_amount,
-        "payments": payments
-    }
+    """Get completed payment totals by method, payment type and day for a date range"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    start = datetime.combine(start_date, datetime.min.time())
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    if details:
+        columns = serialization.response_columns(models.Payment, schema.Payment)
+        return exports.streaming_export(
+            f"payments-{start_date}-{end_date}", export_format, [column.key for column in columns],
+            read_session_factory(request, use_async=False),
+            lambda session, batch_size: crud.payment.stream_payments_in_period(
+                session, start=start, end=end, columns=columns, batch_size=batch_size
+            )
+        )
+    report = await run(db, crud.payment.get_payments_report, start=start, end=end)
+    return {"start_date": start_date, "end_date": end_date, **report}
 
 # =============================================================================
 # INSURANCE ENDPOINTS
 # =============================================================================
 
 @app.post("/insurance-plans/", response_model=schema.InsurancePlan, status_code=status.HTTP_201_CREATED)
-def create_insurance_plan(plan: schema.InsurancePlanCreate, db: Session = Depends(get_db)):
+async def create_insurance_plan(plan: schema.InsurancePlanCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new insurance plan"""
-    return crud.insurance_plan.create(db=db, obj_in=plan)
+    return await run(db, crud.insurance_plan.create, obj_in=plan)
 
 @app.get("/insurance-plans/", response_model=List[schema.InsurancePlan])
-def read_insurance_plans(db: Session = Depends(get_db)):
+async def read_insurance_plans(db: Session = Depends(get_read_db)):
     """Get all insurance plans"""
-    return crud.insurance_plan.get_multi(db)
+    return await run(db, crud.insurance_plan.get_multi)
 
 @app.get("/insurance-plans/active", response_model=List[schema.InsurancePlan])
-def get_active_insurance_plans(db: Session = Depends(get_db)):
+async def get_active_insurance_plans(db: Session = Depends(get_read_db)):
     """Get active insurance plans"""
-    return crud.insurance_plan.get_active_plans(db)
+    return await run(db, crud.insurance_plan.get_active_plans)
 
 # =============================================================================
 # INCIDENT REPORT ENDPOINTS
 # =============================================================================
 
 @app.post("/incidents/", response_model=schema.IncidentReport, status_code=status.HTTP_201_CREATED)
-def create_incident_report(incident: schema.IncidentReportCreate, db: Session = Depends(get_db)):
+async def create_incident_report(incident: schema.IncidentReportCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new incident report"""
-    return crud.incident_report.create(db=db, obj_in=incident)
+    return await run(db, crud.incident_report.create, obj_in=incident)
 
 @app.get("/incidents/", response_model=List[schema.IncidentReport])
-def read_incident_reports(
+async def read_incident_reports(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get all incident reports"""
-    return crud.incident_report.get_multi(db, skip=skip, limit=limit)
+    return with_next_cursor(response, await run(db, crud.incident_report.get_multi, skip=skip, limit=limit, cursor=cursor))
 
 @app.get("/incidents/rental/{rental_id}", response_model=List[schema.IncidentReport])
-def get_rental_incidents(rental_id: int, db: Session = Depends(get_db)):
+async def get_rental_incidents(rental_id: int, db: Session = Depends(get_read_db)):
     """Get incidents for a rental"""
-    return crud.incident_report.get_rental_incidents(db, rental_id=rental_id)
+    return await run(db, crud.incident_report.get_rental_incidents, rental_id=rental_id)
 
 @app.get("/incidents/open", response_model=List[schema.IncidentReport])
-def get_open_incidents(db: Session = Depends(get_db)):
+async def get_open_incidents(db: Session = Depends(get_read_db)):
     """Get open incident reports"""
-    return crud.incident_report.get_open_incidents(db)
+    return await run(db, crud.incident_report.get_open_incidents)
 
 # =============================================================================
 # MAINTENANCE ENDPOINTS
 # =============================================================================
 
 @app.post("/maintenance/", response_model=schema.MaintenanceSchedule, status_code=status.HTTP_201_CREATED)
-def create_maintenance_schedule(maintenance: schema.MaintenanceScheduleCreate, db: Session = Depends(get_db)):
+async def create_maintenance_schedule(maintenance: schema.MaintenanceScheduleCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new maintenance schedule"""
-    return crud.maintenance_schedule.create(db=db, obj_in=maintenance)
+    return await run(db, crud.maintenance_schedule.create, obj_in=maintenance)
+
+@app.patch("/maintenance/batch", response_model=List[schema.MaintenanceSchedule])
+async def batch_update_maintenance(batch: schema.MaintenanceScheduleBatchUpdate, db: Session = Depends(get_db, scope="function")):
+    """Apply a status change to many maintenance schedules in one update"""
+    return await batch_update_status(
+        db, crud.maintenance_schedule, batch.schedule_ids, batch.status, crud.BLOCKING_MAINTENANCE_STATUSES
+    )
 
 @app.get("/maintenance/vehicle/{vehicle_id}", response_model=List[schema.MaintenanceSchedule])
-def get_vehicle_maintenance(vehicle_id: int, db: Session = Depends(get_db)):
+async def get_vehicle_maintenance(vehicle_id: int, db: Session = Depends(get_read_db)):
     """Get maintenance schedule for a vehicle"""
-    return crud.maintenance_schedule.get_vehicle_maintenance(db, vehicle_id=vehicle_id)
+    return await run(db, crud.maintenance_schedule.get_vehicle_maintenance, vehicle_id=vehicle_id)
 
 @app.get("/maintenance/scheduled", response_model=List[schema.MaintenanceSchedule])
-def get_scheduled_maintenance(
+async def get_scheduled_maintenance(
     target_date: Optional[date] = Query(None, description="Target date (defaults to today)"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get scheduled maintenance for a specific date"""
-    return crud.maintenance_schedule.get_scheduled_maintenance(db, target_date=target_date)
+    return await run(db, crud.maintenance_schedule.get_scheduled_maintenance, target_date=target_date)
 
 @app.get("/maintenance/mechanic/{mechanic_id}", response_model=List[schema.MaintenanceSchedule])
-def get_mechanic_schedule(
+async def get_mechanic_schedule(
     mechanic_id: int,
     start_date: date = Query(..., description="Start date for schedule"),
     end_date: date = Query(..., description="End date for schedule"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get maintenance schedule for a mechanic"""
-    return crud.maintenance_schedule.get_mechanic_schedule(
-        db, mechanic_id=mechanic_id, start_date=start_date, end_date=end_date
+    return await run(
+        db, crud.maintenance_schedule.get_mechanic_schedule,
+        mechanic_id=mechanic_id, start_date=start_date, end_date=end_date
     )
 
 # =============================================================================
@@ -627,40 +1156,132 @@ def get_mechanic_schedule(
 # =============================================================================
 
 @app.post("/membership/", response_model=schema.CustomerMembershipProfile, status_code=status.HTTP_201_CREATED)
-def create_membership_profile(profile: schema.CustomerMembershipProfileCreate, db: Session = Depends(get_db)):
+async def create_membership_profile(profile: schema.CustomerMembershipProfileCreate, db: Session = Depends(get_db, scope="function")):
     """Create a customer membership profile"""
-    return crud.membership_profile.create(db=db, obj_in=profile)
+    return await run(db, crud.membership_profile.create, obj_in=profile)
 
 @app.patch("/membership/{customer_id}/points")
-def update_customer_points(
+async def update_customer_points(
     customer_id: int,
     points_to_add: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """Update customer points balance"""
-    profile = crud.membership_profile.update_points(db, customer_id=customer_id, points_to_add=points_to_add)
+    profile = await run(db, crud.membership_profile.update_points, customer_id=customer_id, points_to_add=points_to_add)
     if profile is None:
         raise HTTPException(status_code=404, detail="Customer membership profile not found")
     return {"message": f"Added {points_to_add} points to customer {customer_id}"}
 
 @app.get("/membership-tiers/", response_model=List[schema.MembershipTier])
-def get_membership_tiers(db: Session = Depends(get_db)):
+async def get_membership_tiers(db: Session = Depends(get_read_db)):
     """Get all membership tiers"""
-    return crud.membership_tier.get_multi(db)
+    return await run(db, crud.membership_tier.get_multi)
 
 # =============================================================================
 # VEHICLE FEATURES ENDPOINTS
 # =============================================================================
 
 @app.post("/vehicle-features/", response_model=schema.VehicleFeature, status_code=status.HTTP_201_CREATED)
-def create_vehicle_feature(feature: schema.VehicleFeatureCreate, db: Session = Depends(get_db)):
+async def create_vehicle_feature(feature: schema.VehicleFeatureCreate, db: Session = Depends(get_db, scope="function")):
     """Create a new vehicle feature"""
-    return crud.vehicle_feature.create(db=db, obj_in=feature)
+    return await run(db, crud.vehicle_feature.create, obj_in=feature)
 
 @app.get("/vehicle-features/", response_model=List[schema.VehicleFeature])
-def read_vehicle_features(db: Session = Depends(get_db)):
+async def read_vehicle_features(db: Session = Depends(get_read_db)):
     """Get all vehicle features"""
-    return crud.vehicle_feature.get_multi(db)
+    return await run(db, crud.vehicle_feature.get_multi)
+
+# =============================================================================
+# EXPORT ENDPOINTS
+# =============================================================================
+
+@app.get("/exports/rentals")
+def export_rentals(
+    request: Request,
+    customer_id: Optional[int] = None,
+    vehicle_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start_date_from: Optional[date] = None,
+    start_date_to: Optional[date] = None,
+    pickup_location_id: Optional[int] = None,
+    return_location_id: Optional[int] = None,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")
+):
+    """Stream every rental matching the filters as NDJSON or CSV"""
+    filters = schema.RentalFilters(
+        customer_id=customer_id,
+        vehicle_id=vehicle_id,
+        status=status,
+        start_date_from=start_date_from,
+        start_date_to=start_date_to,
+        pickup_location_id=pickup_location_id,
+        return_location_id=return_location_id
+    )
+    columns = serialization.response_columns(models.Rental, schema.Rental)
+    return exports.streaming_export(
+        "rentals", export_format, [column.key for column in columns], read_session_factory(request, use_async=False),
+        lambda db, batch_size: crud.rental.stream_rentals(db, filters=filters, columns=columns, batch_size=batch_size)
+    )
+
+@app.get("/exports/payments")
+def export_payments(
+    request: Request,
+    customer_id: Optional[int] = None,
+    vehicle_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start_date_from: Optional[date] = None,
+    start_date_to: Optional[date] = None,
+    pickup_location_id: Optional[int] = None,
+    return_location_id: Optional[int] = None,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")
+):
+    """Stream the payments of every rental matching the filters as NDJSON or CSV"""
+    filters = schema.RentalFilters(
+        customer_id=customer_id,
+        vehicle_id=vehicle_id,
+        status=status,
+        start_date_from=start_date_from,
+        start_date_to=start_date_to,
+        pickup_location_id=pickup_location_id,
+        return_location_id=return_location_id
+    )
+    columns = serialization.response_columns(models.Payment, schema.Payment)
+    return exports.streaming_export(
+        "payments", export_format, [column.key for column in columns], read_session_factory(request, use_async=False),
+        lambda db, batch_size: crud.payment.stream_payments(db, filters=filters, columns=columns, batch_size=batch_size)
+    )
+
+@app.post("/exports/snapshot")
+async def export_snapshot(
+    tables: Optional[List[str]] = Query(None, description="Tables to export (defaults to all)"),
+    db: Session = Depends(get_db, scope="function")
+):
+    """Append rows created since the last snapshot to the partitioned Parquet snapshot"""
+    if snapshots.pa is None:
+        raise HTTPException(status_code=501, detail="Snapshot exports require pyarrow")
+    return {
+        "output_dir": snapshots.SNAPSHOT_DIR,
+        "rows_written": await run(db, snapshots.export_snapshot, tables=tables)
+    }
+
+# =============================================================================
+# INTERNAL ENDPOINTS
+# =============================================================================
+
+@app.get("/internal/cache-stats")
+def get_cache_stats():
+    """Get hit/miss counters for the in-process caches"""
+    return crud.cache_stats()
+
+@app.get("/internal/scheduler")
+def get_scheduler_stats():
+    """Get this worker's background job scheduler state and last job results"""
+    return background_jobs.stats()
+
+@app.get("/internal/db-pool")
+def get_db_pool_stats():
+    """Get connection pool gauges, event counters and checkout wait times"""
+    return pool_stats()
 
 if __name__ == "__main__":
     import uvicorn
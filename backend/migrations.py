@@ -0,0 +1,98 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+import models as models
+import crud as crud
+from database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# Columns added to tables that predate them. create_all only creates missing tables, so these are
+# added with ALTER TABLE; each needs to be nullable or have a server default for existing rows.
+ADDED_COLUMNS = [
+    models.Vehicle.__table__.c.updated_at,
+    models.Vehicle.__table__.c.version,
+    models.Reservation.__table__.c.updated_at,
+    models.Reservation.__table__.c.version,
+    models.Rental.__table__.c.updated_at,
+    models.Rental.__table__.c.version,
+    models.Rental.__table__.c.is_overdue,
+]
+
+
+def table_index(table, name: str):
+    return next(index for index in table.indexes if index.name == name)
+
+
+# Indexes added to tables that predate them, created after ADDED_COLUMNS if missing
+ADDED_INDEXES = [
+    table_index(models.Payment.__table__, "ix_payment_status_date"),
+    table_index(models.CustomerMembershipProfile.__table__, "ix_CustomerMembershipProfile_lifetime_spending"),
+    table_index(models.Rental.__table__, "ix_Rental_is_overdue"),
+    table_index(models.Rental.__table__, "ix_rental_status_end_date"),
+]
+
+
+# Brings the database up to the current models: creates missing tables and columns, fills the
+# derived tables added after the database was created, and then adds the constraints that need
+# that data in place. Every step is idempotent. The app runs it on startup unless
+# DATABASE_MIGRATE_ON_STARTUP is off, in which case `python migrations.py` runs it once per deploy.
+def upgrade() -> None:
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        add_missing_columns(connection)
+        add_missing_indexes(connection)
+        add_search_indexes(connection)
+    with SessionLocal() as db:
+        crud.vehicle_occupancy.backfill(db)
+        crud.revenue_rollup.backfill(db)
+        overlaps = crud.vehicle_occupancy.add_overlap_constraint(db)
+    for vehicle_id, source_type, source_id, other_type, other_id in overlaps:
+        logger.warning(
+            "Vehicle %s is double-booked by %s %s and %s %s", vehicle_id, source_type, source_id, other_type, other_id
+        )
+    if overlaps:
+        logger.warning(
+            "%s not added: the occupancy timeline has overlapping bookings (first %d listed)",
+            models.VEHICLE_OCCUPANCY_OVERLAP_CONSTRAINT, len(overlaps)
+        )
+
+
+def add_missing_columns(connection: Connection) -> None:
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    existing = {}
+    for column in ADDED_COLUMNS:
+        table = column.table
+        if table.name not in existing:
+            existing[table.name] = {info["name"] for info in inspector.get_columns(table.name)}
+        if column.name in existing[table.name]:
+            continue
+        definition = CreateColumn(column).compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}"))
+        logger.info("Added column %s.%s", table.name, column.name)
+
+
+def add_missing_indexes(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for index in ADDED_INDEXES:
+        if index.name in {info["name"] for info in inspector.get_indexes(index.table.name)}:
+            continue
+        index.create(bind=connection)
+        logger.info("Added index %s", index.name)
+
+
+# pg_trgm indexes for customer search; other dialects search the in-process n-gram index instead
+def add_search_indexes(connection: Connection) -> None:
+    if connection.dialect.name != "postgresql":
+        return
+    for ddl in models.customer_trigram_ddl:
+        connection.execute(ddl)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    upgrade()
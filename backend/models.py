@@ -1,13 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, DECIMAL, Date, DateTime, Boolean, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Text, DECIMAL, Date, DateTime, Boolean, ForeignKey, TIMESTAMP, Index, UniqueConstraint, DDL
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import false, func, literal_column
 from datetime import datetime, date
 
 Base = declarative_base()
 
 class Customer(Base):
     __tablename__ = "Customer"
+    # UPDATEs fetch onupdate values with RETURNING, so flushed rows need no refresh
+    __mapper_args__ = {"eager_defaults": True}
     
     customer_id = Column(Integer, primary_key=True, autoincrement=True)
     first_name = Column(String(50), nullable=False)
@@ -26,6 +28,20 @@ class Customer(Base):
     reservations = relationship("Reservation", back_populates="customer")
     rentals = relationship("Rental", back_populates="customer")
 
+# On PostgreSQL customer search is served by trigram GIN indexes, including one over the
+# phone number reduced to digits so formatted and unformatted numbers match. migrations.upgrade
+# runs these on PostgreSQL, for new and existing databases alike.
+customer_trigram_ddl = [
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'),
+    DDL('CREATE INDEX IF NOT EXISTS ix_customer_first_name_trgm ON "Customer" USING gin (first_name gin_trgm_ops)'),
+    DDL('CREATE INDEX IF NOT EXISTS ix_customer_last_name_trgm ON "Customer" USING gin (last_name gin_trgm_ops)'),
+    DDL('CREATE INDEX IF NOT EXISTS ix_customer_email_trgm ON "Customer" USING gin (email gin_trgm_ops)'),
+    DDL(
+        'CREATE INDEX IF NOT EXISTS ix_customer_phone_digits_trgm ON "Customer" '
+        "USING gin (regexp_replace(phone, '[^0-9]', '', 'g') gin_trgm_ops)"
+    )
+]
+
 class MembershipTier(Base):
     __tablename__ = "MembershipTier"
     
@@ -49,7 +65,7 @@ class CustomerMembershipProfile(Base):
     join_date = Column(Date, default=func.current_date())
     last_activity_date = Column(Date)
     lifetime_rentals = Column(Integer, default=0)
-    lifetime_spending = Column(DECIMAL(10, 2), default=0.00)
+    lifetime_spending = Column(DECIMAL(10, 2), default=0.00, index=True)
     
     # Relationships
     customer = relationship("Customer", back_populates="membership_profile")
@@ -162,6 +178,7 @@ class Location(Base):
 
 class Vehicle(Base):
     __tablename__ = "Vehicle"
+    __mapper_args__ = {"eager_defaults": True}
     
     vehicle_id = Column(Integer, primary_key=True, autoincrement=True)
     model = Column(String(50), nullable=False)
@@ -176,6 +193,9 @@ class Vehicle(Base):
     seating_capacity = Column(Integer, default=5)
     location_id = Column(Integer, ForeignKey("Location.location_id", onupdate="SET NULL"))
     created_at = Column(TIMESTAMP, default=func.current_timestamp())
+    updated_at = Column(TIMESTAMP, default=func.current_timestamp(), onupdate=func.current_timestamp())
+    # Row version, bumped by every UPDATE (ORM or bulk); used for ETags
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
     
     # Relationships
     location = relationship("Location", back_populates="vehicles")
@@ -184,6 +204,7 @@ class Vehicle(Base):
     reservations = relationship("Reservation", back_populates="vehicle")
     rentals = relationship("Rental", back_populates="vehicle")
     maintenance_schedules = relationship("MaintenanceSchedule", back_populates="vehicle")
+    occupancy = relationship("VehicleOccupancy", back_populates="vehicle", passive_deletes=True)
 
 class VehicleFeature(Base):
     __tablename__ = "VehicleFeature"
@@ -219,6 +240,7 @@ class VehicleMaintenanceRecord(Base):
 
 class Reservation(Base):
     __tablename__ = "Reservation"
+    __mapper_args__ = {"eager_defaults": True}
     
     reservation_id = Column(Integer, primary_key=True, autoincrement=True)
     customer_id = Column(Integer, ForeignKey("Customer.customer_id", ondelete="CASCADE"), nullable=False)
@@ -231,6 +253,8 @@ class Reservation(Base):
     status = Column(String(20), default="Active", comment="Active, Confirmed, Cancelled, Converted")
     special_requests = Column(Text)
     estimated_total = Column(DECIMAL(10, 2))
+    updated_at = Column(TIMESTAMP, default=func.current_timestamp(), onupdate=func.current_timestamp())
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
     
     # Relationships
     customer = relationship("Customer", back_populates="reservations")
@@ -241,6 +265,7 @@ class Reservation(Base):
 
 class Rental(Base):
     __tablename__ = "Rental"
+    __mapper_args__ = {"eager_defaults": True}
     
     rental_id = Column(Integer, primary_key=True, autoincrement=True)
     customer_id = Column(Integer, ForeignKey("Customer.customer_id", ondelete="CASCADE"), nullable=False)
@@ -262,7 +287,16 @@ class Rental(Base):
     discount_applied = Column(DECIMAL(8, 2), default=0.00)
     late_fees = Column(DECIMAL(8, 2), default=0.00)
     damage_fees = Column(DECIMAL(8, 2), default=0.00)
+    is_overdue = Column(Boolean, nullable=False, default=False, server_default=false(), index=True,
+                        comment="Set by the overdue scanner; cleared on return or extension")
     created_at = Column(TIMESTAMP, default=func.current_timestamp())
+    updated_at = Column(TIMESTAMP, default=func.current_timestamp(), onupdate=func.current_timestamp())
+    version = Column(Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
+    
+    # The overdue scanner looks for active rentals past their end date
+    __table_args__ = (
+        Index("ix_rental_status_end_date", "status", "end_date"),
+    )
     
     # Relationships
     customer = relationship("Customer", back_populates="rentals")
@@ -343,6 +377,11 @@ class Payment(Base):
     status = Column(String(20), default="Completed", comment="Pending, Completed, Failed, Refunded")
     payment_type = Column(String(20), nullable=False, comment="Rental, Deposit, Late Fee, Damage Fee")
     
+    # Reports select completed payments by a payment_date range
+    __table_args__ = (
+        Index("ix_payment_status_date", "status", "payment_date"),
+    )
+    
     # Relationships
     rental = relationship("Rental", back_populates="payments")
 
@@ -402,4 +441,69 @@ class MaintenanceSchedule(Base):
     
     # Relationships
     vehicle = relationship("Vehicle", back_populates="maintenance_schedules")
-    mechanic = relationship("Employee", back_populates="maintenance_schedules")
\ No newline at end of file
+    mechanic = relationship("Employee", back_populates="maintenance_schedules")
+
+class VehicleOccupancy(Base):
+    __tablename__ = "VehicleOccupancy"
+    
+    occupancy_id = Column(Integer, primary_key=True, autoincrement=True)
+    vehicle_id = Column(Integer, ForeignKey("Vehicle.vehicle_id", ondelete="CASCADE"), nullable=False)
+    source_type = Column(String(20), nullable=False, comment="Reservation, Rental, Maintenance")
+    source_id = Column(Integer, nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("source_type", "source_id", name="uq_vehicle_occupancy_source"),
+        Index("ix_vehicle_occupancy_vehicle_range", "vehicle_id", "start_time", "end_time"),
+    )
+    
+    # Relationships
+    vehicle = relationship("Vehicle", back_populates="occupancy")
+
+# On PostgreSQL the database itself rejects overlapping occupancy for a vehicle.
+# The constraint is deferred so a reservation can hand its slot to a rental in one transaction.
+# It is not created with the table: migrations.upgrade adds it once the backfilled timeline has
+# no overlaps left, since an exclusion constraint cannot be added NOT VALID.
+VEHICLE_OCCUPANCY_OVERLAP_CONSTRAINT = "ex_vehicle_occupancy_overlap"
+vehicle_occupancy_overlap_ddl = DDL(
+    'CREATE EXTENSION IF NOT EXISTS btree_gist; '
+    f'ALTER TABLE "VehicleOccupancy" ADD CONSTRAINT {VEHICLE_OCCUPANCY_OVERLAP_CONSTRAINT} '
+    'EXCLUDE USING gist (vehicle_id WITH =, tsrange(start_time, end_time) WITH &&) '
+    'DEFERRABLE INITIALLY DEFERRED'
+)
+
+# Responses to POSTs sent with an Idempotency-Key header, replayed when the client retries.
+# The primary key is the lookup index and also stops two concurrent retries from both inserting.
+class IdempotencyKey(Base):
+    __tablename__ = "IdempotencyKey"
+    
+    scope = Column(String(50), primary_key=True, comment="Endpoint the key was used on")
+    idempotency_key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, comment="Null until the response is stored")
+    response_body = Column(Text)
+    created_at = Column(DateTime, default=func.current_timestamp())
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# Completed-rental revenue pre-aggregated by the day the rental started, its pickup location and
+# the vehicle's make. Kept current as rentals complete, change or are deleted; rebuildable from Rental.
+class DailyRevenueRollup(Base):
+    __tablename__ = "DailyRevenueRollup"
+    
+    revenue_date = Column(Date, primary_key=True)
+    location_id = Column(Integer, primary_key=True, comment="Pickup location of the rentals")
+    make = Column(String(50), primary_key=True)
+    rental_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(DECIMAL(14, 2), nullable=False, default=0, comment="Sum of total_amount")
+    late_fees = Column(DECIMAL(14, 2), nullable=False, default=0)
+    damage_fees = Column(DECIMAL(14, 2), nullable=False, default=0)
+
+# Background jobs run in one worker at a time: the worker holding an unexpired lease on the
+# job's row is the leader, and renews it on every run
+class SchedulerLease(Base):
+    __tablename__ = "SchedulerLease"
+    
+    name = Column(String(50), primary_key=True)
+    owner = Column(String(100), nullable=False, comment="host:pid:instance of the leading worker")
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool, QueuePool
+
+# Checkout waits kept for the percentile figures; older ones only count towards the totals
+RECENT_WAITS = 1000
+
+
+# Counters fed by pool events, plus how long callers waited for a connection. The pool has no
+# event for the start of a checkout, so waits are timed around the public Pool.connect() by the
+# pool class from timed_pool_class. Only public pool API is used, so SQLAlchemy upgrades that
+# rework the pool internals do not break the metrics.
+class PoolMetrics:
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        # The pool options the engine was created with, reported as they were configured
+        self.settings = dict(settings or {})
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=RECENT_WAITS)
+        self._checked_out = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._recent_waits.append(seconds)
+
+    def listen(self, pool: Pool) -> None:
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.checkouts += 1
+                self._checked_out += 1
+                self.peak_checked_out = max(self.peak_checked_out, self._checked_out)
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self.checkins += 1
+                self._checked_out = max(self._checked_out - 1, 0)
+
+        @event.listens_for(pool, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def snapshot(self, pool: Pool) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent_waits)
+            stats = {
+                "pool_class": type(pool).__name__,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "peak_checked_out": self.peak_checked_out,
+                # Time spent in Pool.connect(): queueing for a free slot, plus opening or
+                # pre-pinging the connection when that happens
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "avg": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                    "max": round(self.wait_max * 1000, 3),
+                    "p50": _percentile_ms(recent, 0.50),
+                    "p95": _percentile_ms(recent, 0.95),
+                    "p99": _percentile_ms(recent, 0.99)
+                }
+            }
+        # Live gauges come from the pool's public methods; only queue pools track them
+        stats["status"] = pool.status()
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                # QueuePool counts overflow from -pool_size until the pool is full
+                overflow=max(pool.overflow(), 0),
+                timeout=pool.timeout()
+            )
+        stats.update(self.settings)
+        return stats
+
+
+def _percentile_ms(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 3)
+
+
+def timed_pool_class(base: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    # connect() is the public checkout entry point, where a queue pool blocks while every
+    # connection is checked out
+    class TimedPool(base):
+        _metrics = metrics
+
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                self._metrics.record_wait(time.perf_counter() - started, timed_out=True)
+                raise
+            self._metrics.record_wait(time.perf_counter() - started)
+            return connection
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
@@ -0,0 +1,127 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud as crud
+
+logger = logging.getLogger(__name__)
+
+# A leader that stops renewing loses the lease after this many intervals
+LEASE_INTERVALS = 3
+# Seconds shutdown waits for a running job
+STOP_TIMEOUT = 10
+
+
+# Raised into a running job when the lease could not be renewed because another worker took it
+class LeaseLost(Exception):
+    pass
+
+
+# Runs its jobs every `interval` seconds on a daemon thread. Every worker process starts one;
+# the worker holding the job group's lease row runs the jobs and the others only retry the lease,
+# so a leader that dies is replaced within LEASE_INTERVALS intervals. Jobs added with
+# leader_only=False maintain per-process state and run in every worker.
+class Scheduler:
+    def __init__(self, name: str, interval: float, session_factory: Callable[[], Session]):
+        self.name = name
+        self.interval = interval
+        self.session_factory = session_factory
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[float] = None
+        self.last_results: Dict[str, Any] = {}
+        self._jobs: List[Tuple[str, Callable[[Session], Any], bool]] = []
+        self._renewed_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_job(self, name: str, job: Callable[[Session], Any], leader_only: bool = True) -> None:
+        self._jobs.append((name, job, leader_only))
+
+    def start(self) -> None:
+        # An interval of 0 disables the scheduler in this worker
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"scheduler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=STOP_TIMEOUT)
+        self._thread = None
+        if self.is_leader:
+            # Hand over without waiting for the lease to expire
+            with self.session_factory() as db:
+                crud.scheduler_lease.release(db, name=self.name, owner=self.owner)
+            self.is_leader = False
+
+    def run_once(self) -> bool:
+        # Runs every job if this worker holds the lease, otherwise only the per-worker ones; a
+        # failing job does not stop the others
+        with self.session_factory() as db:
+            self.is_leader = crud.scheduler_lease.acquire(
+                db, name=self.name, owner=self.owner, ttl=self.interval * LEASE_INTERVALS
+            )
+            self._renewed_at = time.monotonic()
+            db.info[crud.RENEW_LEASE_KEY] = self._renew_lease
+            for name, job, leader_only in self._jobs:
+                if leader_only and not self.is_leader:
+                    continue
+                try:
+                    self.last_results[name] = job(db)
+                except LeaseLost:
+                    # Another worker runs the jobs from here on
+                    db.rollback()
+                    self.is_leader = False
+                    logger.warning("Scheduler %s lost its lease during job %s", self.name, name)
+                except Exception:
+                    db.rollback()
+                    self.failures += 1
+                    logger.exception("Scheduled job %s failed", name)
+            if not self.is_leader:
+                return False
+            self.runs += 1
+            self.last_run = time.time()
+        return True
+
+    def _renew_lease(self, db: Session) -> None:
+        # Renews once per interval while a job runs, well before the LEASE_INTERVALS expiry
+        if not self.is_leader or time.monotonic() - self._renewed_at < self.interval:
+            return
+        if not crud.scheduler_lease.acquire(db, name=self.name, owner=self.owner, ttl=self.interval * LEASE_INTERVALS):
+            raise LeaseLost(self.name)
+        self._renewed_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "owner": self.owner,
+            "interval": self.interval,
+            "running": self._thread is not None,
+            "leader": self.is_leader,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+            "last_results": dict(self.last_results)
+        }
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                # The database may be unreachable; try again next interval
+                self.is_leader = False
+                logger.exception("Scheduler %s could not run", self.name)
+            self._stop.wait(self.interval)
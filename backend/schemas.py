@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional, List
+from typing import Optional, List, Dict, Literal
 from datetime import datetime, date
 from decimal import Decimal
 
@@ -314,6 +314,7 @@ class Rental(RentalBase):
     model_config = ConfigDict(from_attributes=True)
     
     rental_id: int
+    is_overdue: bool = False
     created_at: datetime
 
 # Payment schemas
@@ -341,6 +342,19 @@ class Payment(PaymentBase):
     payment_id: int
     payment_date: datetime
 
+class PaymentTotals(BaseModel):
+    payments: int
+    amount: Decimal
+
+class PaymentsReport(BaseModel):
+    start_date: date
+    end_date: date
+    total_payments: int
+    total_amount: Decimal
+    by_method: Dict[str, PaymentTotals] = {}
+    by_payment_type: Dict[str, PaymentTotals] = {}
+    by_day: Dict[date, PaymentTotals] = {}
+
 # Insurance Plan schemas
 class InsurancePlanBase(BaseModel):
     name: str = Field(..., max_length=100)
@@ -491,6 +505,115 @@ class ListResponse(BaseModel):
     page: int = 1
     per_page: int = 10
 
+# Faceted vehicle search schemas
+class VehicleFacetedResults(BaseModel):
+    total: int
+    vehicles: List[Vehicle] = []
+    facets: Dict[str, Dict[str, int]] = {}
+
+# Dashboard schemas
+class DashboardSummary(BaseModel):
+    total_customers: int
+    total_vehicles: int
+    available_vehicles: int
+    active_rentals: int
+    overdue_rentals: int
+    vehicles_needing_maintenance: int
+    total_revenue: Decimal
+
+# Fleet calendar schemas
+class VehicleCalendar(BaseModel):
+    vehicle_id: int
+    bitmap: str = Field(..., description="Base64 little-endian bitmap, bit i set when booked on from_date + i")
+    booked_days: int
+
+class FleetCalendar(BaseModel):
+    from_date: date
+    to_date: date
+    days: int
+    location_id: Optional[int] = None
+    vehicles: List[VehicleCalendar] = []
+
+# Batch state changes: one set of values applied to every listed row
+MAX_BATCH_IDS = 1000
+ReservationStatus = Literal["Active", "Confirmed", "Cancelled", "Converted"]
+MaintenanceStatus = Literal["Scheduled", "In Progress", "Completed", "Cancelled"]
+
+class VehicleBatchUpdate(BaseModel):
+    vehicle_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+    availability: Optional[bool] = None
+    location_id: Optional[int] = None
+
+class ReservationBatchUpdate(BaseModel):
+    reservation_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+    status: ReservationStatus
+
+class MaintenanceScheduleBatchUpdate(BaseModel):
+    schedule_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+    status: MaintenanceStatus
+
+# Bulk import schemas
+class BulkImportError(BaseModel):
+    row: int = Field(..., description="Zero-based position of the row in the import")
+    errors: List[str]
+
+class BulkImportResult(BaseModel):
+    received: int
+    created: int
+    ids: List[int] = []
+    errors: List[BulkImportError] = []
+
+# Revenue report schemas
+class RevenueReportRow(BaseModel):
+    period_start: date
+    location_id: Optional[int] = None
+    make: Optional[str] = None
+    rental_count: int
+    revenue: Decimal
+    late_fees: Decimal
+    damage_fees: Decimal
+
+class RevenueReport(BaseModel):
+    start_date: date
+    end_date: date
+    group_by: str
+    total_rentals: int
+    total_revenue: Decimal
+    rows: List[RevenueReportRow] = []
+
+class RevenueRollupRebuild(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    buckets: int
+
+# Utilization report schemas
+class UtilizationRow(BaseModel):
+    vehicle_id: Optional[int] = None
+    location_id: Optional[int] = None
+    make: Optional[str] = None
+    day: Optional[date] = None
+    vehicles: int
+    rented_days: float
+    utilization: float = Field(..., description="Share of the vehicles' time on rent, 0 to 1")
+    revenue: float
+    revenue_per_available_day: float
+    idle_gaps: Optional[int] = None
+    average_idle_gap_days: Optional[float] = None
+    longest_idle_gap_days: Optional[float] = None
+
+class UtilizationReport(BaseModel):
+    from_date: date
+    to_date: date
+    group_by: str
+    location_id: Optional[int] = None
+    make: Optional[str] = None
+    vehicles: int
+    days: int
+    utilization: float
+    revenue: float
+    revenue_per_available_day: float
+    rows: List[UtilizationRow] = []
+
 # Query parameters for filtering and pagination
 class PaginationParams(BaseModel):
     page: int = Field(1, ge=1)
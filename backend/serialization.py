@@ -0,0 +1,48 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same output, only slower
+    orjson = None
+
+
+def response_columns(model, response_schema: Type[BaseModel]) -> List[Any]:
+    # The model columns behind a flat response schema, in field order
+    return [getattr(model, name) for name in response_schema.model_fields]
+
+
+def rows_as_dicts(rows: Iterable[Any]) -> List[Dict[str, Any]]:
+    rows = list(rows)
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+
+# Decimals are written as strings, matching pydantic's JSON output for the same schemas
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+# JSON response for trusted database rows: no response_model validation, no jsonable_encoder
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
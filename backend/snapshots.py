@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Session
+
+import models as models
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; only needed to write snapshots
+    pa = None
+    pq = None
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_CHUNK_SIZE = int(os.getenv("SNAPSHOT_CHUNK_SIZE", "50000"))
+STATE_FILE = "_snapshot_state.json"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+# A snapshotted table: rows are partitioned by the month of date_column and by location_column,
+# which may live on a joined table
+class SnapshotTable(NamedTuple):
+    model: Any
+    date_column: Any
+    location_column: Any
+    joins: Tuple[Tuple[Any, Any], ...] = ()
+
+
+SNAPSHOT_TABLES: Dict[str, SnapshotTable] = {
+    "rentals": SnapshotTable(models.Rental, models.Rental.start_date, models.Rental.pickup_location_id),
+    "reservations": SnapshotTable(
+        models.Reservation, models.Reservation.reserved_start_date, models.Reservation.pickup_location_id
+    ),
+    "payments": SnapshotTable(
+        models.Payment, models.Payment.payment_date, models.Rental.pickup_location_id,
+        ((models.Rental, models.Payment.rental_id == models.Rental.rental_id),)
+    ),
+    "incidents": SnapshotTable(
+        models.IncidentReport, models.IncidentReport.incident_date, models.Rental.pickup_location_id,
+        ((models.Rental, models.IncidentReport.rental_id == models.Rental.rental_id),)
+    ),
+    "maintenance": SnapshotTable(
+        models.MaintenanceSchedule, models.MaintenanceSchedule.scheduled_date, models.Vehicle.location_id,
+        ((models.Vehicle, models.MaintenanceSchedule.vehicle_id == models.Vehicle.vehicle_id),)
+    ),
+}
+
+
+def arrow_type(column) -> "pa.DataType":
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Numeric):
+        return pa.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def partition_path(name: str, month_source: Any, location_id: Optional[int]) -> str:
+    month = f"{month_source.year:04d}-{month_source.month:02d}" if month_source is not None else NULL_PARTITION
+    location = str(location_id) if location_id is not None else NULL_PARTITION
+    return os.path.join(name, f"month={month}", f"location_id={location}")
+
+
+def read_state(out_dir: str) -> Dict[str, int]:
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as state_file:
+        return json.load(state_file)
+
+
+def write_state(out_dir: str, state: Dict[str, int]) -> None:
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as state_file:
+        json.dump(state, state_file, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def export_snapshot(db: Session, *, out_dir: str = SNAPSHOT_DIR, chunk_size: int = SNAPSHOT_CHUNK_SIZE,
+                    tables: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    # Incremental: each table only exports rows whose primary key is past the watermark
+    # recorded by the previous run, as new part files next to the existing ones
+    if pa is None:
+        raise RuntimeError("pyarrow is required for snapshot exports")
+    names = list(tables) if tables else list(SNAPSHOT_TABLES)
+    unknown = [name for name in names if name not in SNAPSHOT_TABLES]
+    if unknown:
+        raise ValueError(f"Unknown snapshot tables: {', '.join(unknown)}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    state = read_state(out_dir)
+    return {name: _export_table(db, out_dir, name, SNAPSHOT_TABLES[name], state, chunk_size) for name in names}
+
+
+def _export_table(db: Session, out_dir: str, name: str, table: SnapshotTable,
+                  state: Dict[str, int], chunk_size: int) -> int:
+    pk = inspect(table.model).primary_key[0]
+    columns = list(table.model.__table__.columns)
+    schema = pa.schema([pa.field(column.name, arrow_type(column)) for column in columns])
+
+    query = db.query(*columns, table.date_column.label("_month_source"), table.location_column.label("_location_id"))
+    for target, onclause in table.joins:
+        query = query.outerjoin(target, onclause)
+    query = query.filter(pk > state.get(name, 0)).order_by(pk)
+
+    written = 0
+    chunk: List[Any] = []
+    for row in query.yield_per(chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            written += _write_chunk(out_dir, name, schema, columns, chunk, state)
+            chunk = []
+    if chunk:
+        written += _write_chunk(out_dir, name, schema, columns, chunk, state)
+    return written
+
+
+def _write_chunk(out_dir: str, name: str, schema: "pa.Schema", columns: List[Any], rows: List[Any],
+                 state: Dict[str, int]) -> int:
+    partitions = defaultdict(list)
+    for row in rows:
+        partitions[partition_path(name, row._month_source, row._location_id)].append(row)
+
+    first, last = rows[0][0], rows[-1][0]
+    for path, partition_rows in partitions.items():
+        data = {column.name: [row[position] for row in partition_rows] for position, column in enumerate(columns)}
+        directory = os.path.join(out_dir, path)
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, f"part-{first:012d}-{last:012d}.parquet")
+        pq.write_table(pa.table(data, schema=schema), target + ".tmp")
+        os.replace(target + ".tmp", target)
+
+    # The watermark only moves once the whole chunk is on disk
+    state[name] = last
+    write_state(out_dir, state)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Append new rows to the partitioned Parquet analytics snapshot")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="Snapshot directory")
+    parser.add_argument("--chunk-size", type=int, default=SNAPSHOT_CHUNK_SIZE, help="Rows fetched per round trip")
+    parser.add_argument("--table", action="append", choices=list(SNAPSHOT_TABLES), help="Only export these tables")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        counts = export_snapshot(db, out_dir=args.out, chunk_size=args.chunk_size, tables=args.table)
+    for table_name, count in counts.items():
+        print(f"{table_name}: {count} new rows")
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its settings at import time, so the test database (a throwaway SQLite file unless
+# DATABASE_URL is set) is configured before main is imported
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ["OVERDUE_SCAN_INTERVAL"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Entering the client runs the lifespan, which migrates the database
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,106 @@
+import itertools
+from datetime import date, datetime, timedelta
+
+import pytest
+
+_unique = itertools.count()
+
+
+def created(response) -> dict:
+    assert response.status_code in (200, 201), response.text
+    return response.json()
+
+
+@pytest.fixture
+def vehicle(client) -> dict:
+    n = next(_unique)
+    location = created(client.post("/locations/", json={
+        "name": f"Lot {n}", "address": "1 Main St", "city": "Town", "state": "ST", "zip_code": "00000"
+    }))
+    return created(client.post("/vehicles/", json={
+        "model": "Corolla", "make": "Toyota", "license_plate": f"BATCH{n}", "year": 2024,
+        "daily_rate": "50.00", "location_id": location["location_id"]
+    }))
+
+
+@pytest.fixture
+def customer(client) -> dict:
+    n = next(_unique)
+    return created(client.post("/customers/", json={
+        "first_name": "Batch", "last_name": f"Customer {n}", "email": f"batch-{n}@example.com",
+        "phone": "555-000-0000", "driver_license": f"BATCH{n}"
+    }))
+
+
+def reserve(client, vehicle: dict, customer: dict, start: datetime, days: int = 2):
+    return client.post("/reservations/", json={
+        "customer_id": customer["customer_id"], "vehicle_id": vehicle["vehicle_id"],
+        "pickup_location_id": vehicle["location_id"], "return_location_id": vehicle["location_id"],
+        "reserved_start_date": start.isoformat(), "reserved_end_date": (start + timedelta(days=days)).isoformat()
+    })
+
+
+def batch_reservations(client, ids, status: str):
+    return client.patch("/reservations/batch", json={"reservation_ids": ids, "status": status})
+
+
+START = datetime(2030, 6, 1, 10)
+
+
+def test_reservation_batch_rejects_unknown_status(client, vehicle, customer):
+    reservation = created(reserve(client, vehicle, customer, START))
+    assert batch_reservations(client, [reservation["reservation_id"]], "Whatever").status_code == 422
+
+
+def test_reservation_batch_reactivation_without_overlap_blocks_the_vehicle(client, vehicle, customer):
+    reservation = created(reserve(client, vehicle, customer, START))
+    created(batch_reservations(client, [reservation["reservation_id"]], "Cancelled"))
+
+    updated = created(batch_reservations(client, [reservation["reservation_id"]], "Confirmed"))
+
+    assert [row["status"] for row in updated] == ["Confirmed"]
+    assert reserve(client, vehicle, customer, START + timedelta(days=1)).status_code == 400
+
+
+def test_reservation_batch_reactivation_over_a_booking_is_refused(client, vehicle, customer):
+    cancelled = created(reserve(client, vehicle, customer, START))
+    created(batch_reservations(client, [cancelled["reservation_id"]], "Cancelled"))
+    booked = created(reserve(client, vehicle, customer, START + timedelta(days=1)))
+
+    response = batch_reservations(client, [cancelled["reservation_id"]], "Active")
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicting_ids"] == [cancelled["reservation_id"]]
+    assert created(client.get(f"/reservations/{cancelled['reservation_id']}"))["status"] == "Cancelled"
+    assert created(client.get(f"/reservations/{booked['reservation_id']}"))["status"] == "Active"
+
+
+def test_reservation_batch_refuses_rows_overlapping_each_other(client, vehicle, customer):
+    first = created(reserve(client, vehicle, customer, START))
+    created(batch_reservations(client, [first["reservation_id"]], "Cancelled"))
+    second = created(reserve(client, vehicle, customer, START + timedelta(days=1)))
+    ids = [first["reservation_id"], second["reservation_id"]]
+    created(batch_reservations(client, ids, "Cancelled"))
+
+    response = batch_reservations(client, ids, "Active")
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicting_ids"] == sorted(ids)
+
+
+def test_maintenance_batch_rescheduling_over_a_booking_is_refused(client, vehicle, customer):
+    day = date(2031, 3, 1)
+    schedule = created(client.post("/maintenance/", json={
+        "vehicle_id": vehicle["vehicle_id"], "maintenance_type": "Service", "scheduled_date": day.isoformat()
+    }))
+    ids = [schedule["schedule_id"]]
+    created(client.patch("/maintenance/batch", json={"schedule_ids": ids, "status": "Cancelled"}))
+    created(reserve(client, vehicle, customer, datetime.combine(day, datetime.min.time()) + timedelta(hours=9)))
+
+    assert client.patch("/maintenance/batch", json={"schedule_ids": ids, "status": "Done"}).status_code == 422
+    response = client.patch("/maintenance/batch", json={"schedule_ids": ids, "status": "Scheduled"})
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicting_ids"] == ids
+    # Moving to a status that does not block the vehicle needs no check
+    completed = created(client.patch("/maintenance/batch", json={"schedule_ids": ids, "status": "Completed"}))
+    assert [row["status"] for row in completed] == ["Completed"]
@@ -0,0 +1,166 @@
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+
+# Fleet utilization over a window of whole days, computed with array arithmetic on rental
+# intervals instead of per-rental loops. A vehicle is on rent while any of its rentals covers the
+# time (overlapping rentals count once); revenue is spread over each rental's interval pro rata,
+# so only the part that falls inside the window counts.
+def utilization_report(
+    vehicles: Sequence[Tuple[int, Optional[int], str]],
+    rentals: Sequence[Tuple[int, datetime, datetime, Any]],
+    from_date: date,
+    to_date: date,
+    group_by: str = "location"
+) -> Dict[str, Any]:
+    # vehicles: (vehicle_id, location_id, make); rentals: (vehicle_id, start, end, total_amount)
+    days = (to_date - from_date).days + 1
+    window = days * SECONDS_PER_DAY
+    origin = datetime.combine(from_date, time.min)
+    vehicle_ids = np.fromiter((row[0] for row in vehicles), dtype=np.int64, count=len(vehicles))
+    order = np.argsort(vehicle_ids)
+    vehicles = [vehicles[i] for i in order]
+    vehicle_ids = vehicle_ids[order]
+
+    count = len(rentals)
+    rental_vehicles = np.fromiter((row[0] for row in rentals), dtype=np.int64, count=count)
+    # Offsets from the window origin in seconds; may fall outside [0, window]
+    starts = np.fromiter(((row[1] - origin).total_seconds() for row in rentals), dtype=np.float64, count=count)
+    ends = np.fromiter(((row[2] - origin).total_seconds() for row in rentals), dtype=np.float64, count=count)
+    amounts = np.fromiter((float(row[3] or 0) for row in rentals), dtype=np.float64, count=count)
+
+    rows = np.minimum(np.searchsorted(vehicle_ids, rental_vehicles), max(len(vehicle_ids) - 1, 0))
+    known = (vehicle_ids[rows] == rental_vehicles) if len(vehicle_ids) else np.zeros(count, dtype=bool)
+    rows, starts, ends, amounts = rows[known], starts[known], ends[known], amounts[known]
+
+    # Revenue per second of each rental, then its share inside the window and on each day
+    rates = amounts / np.maximum(ends - starts, 1.0)
+    inside = np.clip(ends, 0, window) - np.clip(starts, 0, window)
+    revenue = np.bincount(rows, weights=rates * np.maximum(inside, 0), minlength=len(vehicle_ids))
+    boundaries = np.arange(days + 1, dtype=np.float64) * SECONDS_PER_DAY
+    day_revenue = np.diff(_ramp_sums(starts, rates, boundaries) - _ramp_sums(ends, rates, boundaries))
+
+    block_rows, block_starts, block_ends = _busy_blocks(rows, np.clip(starts, 0, window), np.clip(ends, 0, window), window)
+    rented = np.bincount(block_rows, weights=block_ends - block_starts, minlength=len(vehicle_ids))
+    ones = np.ones(len(block_rows))
+    day_rented = np.diff(_ramp_sums(block_starts, ones, boundaries) - _ramp_sums(block_ends, ones, boundaries))
+    gaps, longest_gap = _idle_gaps(block_rows, block_starts, block_ends, len(vehicle_ids), window)
+
+    fleet_size = len(vehicle_ids)
+    summary = {
+        "vehicles": fleet_size,
+        "days": days,
+        "utilization": _ratio(rented.sum(), fleet_size * window),
+        "revenue": round(float(revenue.sum()), 2),
+        "revenue_per_available_day": _ratio(revenue.sum(), fleet_size * days, 2)
+    }
+
+    if group_by == "day":
+        rows_out = [
+            {
+                "day": from_date + timedelta(days=day),
+                "vehicles": fleet_size,
+                "rented_days": round(float(day_rented[day]) / SECONDS_PER_DAY, 3),
+                "utilization": _ratio(day_rented[day], fleet_size * SECONDS_PER_DAY),
+                "revenue": round(float(day_revenue[day]), 2),
+                "revenue_per_available_day": _ratio(day_revenue[day], fleet_size, 2)
+            }
+            for day in range(days)
+        ]
+        return {**summary, "rows": rows_out}
+
+    if group_by == "vehicle":
+        keys = [row[0] for row in vehicles]
+    else:
+        keys = [row[1] if group_by == "location" else row[2] for row in vehicles]
+    groups: Dict[Any, int] = {}
+    inverse = np.fromiter((groups.setdefault(key, len(groups)) for key in keys), dtype=np.int64, count=len(keys))
+    size = len(groups)
+    members = np.bincount(inverse, minlength=size)
+    group_rented = np.bincount(inverse, weights=rented, minlength=size)
+    group_revenue = np.bincount(inverse, weights=revenue, minlength=size)
+    group_gaps = np.bincount(inverse, weights=gaps, minlength=size)
+    group_longest = np.zeros(size)
+    np.maximum.at(group_longest, inverse, longest_gap)
+    group_idle = members * window - group_rented
+
+    rows_out = []
+    # Vehicles without a location sort last
+    for key, group in sorted(groups.items(), key=lambda item: (item[0] is None, item[0] if item[0] is not None else 0)):
+        labels = {group_by if group_by == "make" else f"{group_by}_id": key}
+        if group_by == "vehicle":
+            labels.update(location_id=vehicles[group][1], make=vehicles[group][2])
+        rows_out.append({
+            **labels,
+            "vehicles": int(members[group]),
+            "rented_days": round(float(group_rented[group]) / SECONDS_PER_DAY, 3),
+            "utilization": _ratio(group_rented[group], members[group] * window),
+            "revenue": round(float(group_revenue[group]), 2),
+            "revenue_per_available_day": _ratio(group_revenue[group], members[group] * days, 2),
+            "idle_gaps": int(group_gaps[group]),
+            "average_idle_gap_days": _ratio(group_idle[group] / SECONDS_PER_DAY, group_gaps[group], 3),
+            "longest_idle_gap_days": round(float(group_longest[group]) / SECONDS_PER_DAY, 3)
+        })
+    return {**summary, "rows": rows_out}
+
+
+def _ratio(numerator: float, denominator: float, digits: int = 4) -> float:
+    return round(float(numerator) / float(denominator), digits) if denominator else 0.0
+
+
+def _ramp_sums(points: np.ndarray, weights: np.ndarray, boundaries: np.ndarray) -> np.ndarray:
+    # sum(weights[i] * max(b - points[i], 0)) for every boundary b, from prefix sums over the
+    # sorted points; differences of these give each day's covered seconds without a per-day loop
+    order = np.argsort(points, kind="stable")
+    points = points[order]
+    weights = weights[order]
+    weight_sums = np.concatenate(([0.0], np.cumsum(weights)))
+    moment_sums = np.concatenate(([0.0], np.cumsum(weights * points)))
+    below = np.searchsorted(points, boundaries, side="left")
+    return boundaries * weight_sums[below] - moment_sums[below]
+
+
+def _busy_blocks(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 window: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Merge each vehicle's overlapping (already clipped) intervals. Shifting every vehicle into its
+    # own stretch of the time axis lets one running maximum over all intervals stand in for a
+    # per-vehicle one.
+    keep = ends > starts
+    rows, starts, ends = rows[keep], starts[keep], ends[keep]
+    if not len(rows):
+        return rows, starts, ends
+    order = np.lexsort((starts, rows))
+    rows, starts, ends = rows[order], starts[order], ends[order]
+    shift = rows * (window + 1.0)
+    reach = np.maximum.accumulate(ends + shift)
+    opens = np.ones(len(rows), dtype=bool)
+    opens[1:] = starts[1:] + shift[1:] > reach[:-1]
+    first = np.flatnonzero(opens)
+    last = np.append(first[1:] - 1, len(rows) - 1)
+    return rows[first], starts[first], reach[last] - shift[last]
+
+
+def _idle_gaps(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, vehicle_count: int,
+               window: float) -> Tuple[np.ndarray, np.ndarray]:
+    # Idle stretches per vehicle: before its first block, between blocks and after its last one.
+    # Blocks are sorted by vehicle and start and never touch, so each gap is one subtraction.
+    previous_end = np.zeros(len(rows))
+    same_vehicle = np.zeros(len(rows), dtype=bool)
+    same_vehicle[1:] = rows[1:] == rows[:-1]
+    previous_end[1:] = np.where(same_vehicle[1:], ends[:-1], 0.0)
+    before = starts - previous_end
+    tail_rows = np.flatnonzero(np.append(~same_vehicle[1:], True)) if len(rows) else np.zeros(0, dtype=np.int64)
+    after = np.full(vehicle_count, window)
+    after[rows[tail_rows]] = window - ends[tail_rows]
+
+    gap_rows = np.concatenate((rows, np.arange(vehicle_count)))
+    gap_lengths = np.concatenate((before, after))
+    positive = gap_lengths > 0
+    counts = np.bincount(gap_rows[positive], minlength=vehicle_count)
+    longest = np.zeros(vehicle_count)
+    np.maximum.at(longest, gap_rows, gap_lengths)
+    return counts, longest
@@ -0,0 +1,154 @@
+import threading
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import models as models
+import schemas as schema
+
+FIELDS = ("make", "model", "fuel_type", "transmission", "year", "availability", "location_id", "daily_rate")
+
+# Bucket edges; a value lands in the bucket starting at the largest edge <= value
+YEAR_BUCKET_SIZE = 5
+DAILY_RATE_BUCKETS = (Decimal("0"), Decimal("50"), Decimal("100"), Decimal("200"), Decimal("500"))
+
+
+def year_bucket(year: int) -> str:
+    start = year - year % YEAR_BUCKET_SIZE
+    return f"{start}-{start + YEAR_BUCKET_SIZE - 1}"
+
+
+def daily_rate_bucket(rate: Decimal) -> str:
+    edges = [edge for edge in DAILY_RATE_BUCKETS if edge <= rate] or [DAILY_RATE_BUCKETS[0]]
+    lower = edges[-1]
+    position = DAILY_RATE_BUCKETS.index(lower)
+    if position + 1 < len(DAILY_RATE_BUCKETS):
+        return f"{lower}-{DAILY_RATE_BUCKETS[position + 1]}"
+    return f"{lower}+"
+
+
+# Facet name -> (indexed field, bucketing function, filter fields that constrain it)
+FACETS: Dict[str, Tuple[str, Callable[[Any], Any], Tuple[str, ...]]] = {
+    "make": ("make", lambda value: value, ("make",)),
+    "fuel_type": ("fuel_type", lambda value: value, ("fuel_type",)),
+    "transmission": ("transmission", lambda value: value, ("transmission",)),
+    "year": ("year", year_bucket, ("min_year", "max_year")),
+    "location_id": ("location_id", lambda value: value, ("location_id",)),
+    "daily_rate": ("daily_rate", daily_rate_bucket, ("min_daily_rate", "max_daily_rate")),
+}
+
+
+# In-memory inverted index of vehicle attributes used for filtering and facet counts
+class VehicleFacetIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._documents: Dict[int, Tuple[Any, ...]] = {}
+        self._postings: Dict[str, Dict[Any, Set[int]]] = {field: {} for field in FIELDS}
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            columns = [getattr(models.Vehicle, field) for field in FIELDS]
+            for row in db.query(models.Vehicle.vehicle_id, *columns).yield_per(10000):
+                self._insert(row[0], tuple(row[1:]))
+            self._loaded = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._documents.clear()
+            for postings in self._postings.values():
+                postings.clear()
+
+    # Incremental maintenance; no-ops until loaded since the load reads committed rows
+    def upsert(self, vehicle_id: int, values: Tuple[Any, ...]) -> None:
+        if not self._loaded:
+            return
+        with self._lock:
+            self._delete(vehicle_id)
+            self._insert(vehicle_id, values)
+
+    def remove(self, vehicle_id: int) -> None:
+        if not self._loaded:
+            return
+        with self._lock:
+            self._delete(vehicle_id)
+
+    def search(self, filters: schema.VehicleFilters) -> Tuple[List[int], Dict[str, Dict[str, int]]]:
+        # Facet counts are disjunctive: each facet is counted over the vehicles matching every
+        # filter except its own, so selecting "Diesel" still shows how many are "Electric"
+        with self._lock:
+            matches = {name: ids for name, ids in self._filter_sets(filters).items() if ids is not None}
+            everything = set(self._documents)
+            matched = self._intersect(everything, matches.values())
+            facets = {}
+            for facet, (field, bucket, own_filters) in FACETS.items():
+                base = self._intersect(everything, [ids for name, ids in matches.items() if name not in own_filters])
+                counts: Dict[str, int] = {}
+                for value, posting in self._postings[field].items():
+                    if value is None:
+                        continue
+                    hits = len(posting & base) if len(posting) < len(base) else len(base & posting)
+                    if hits:
+                        key = str(bucket(value))
+                        counts[key] = counts.get(key, 0) + hits
+                facets[facet] = dict(sorted(counts.items()))
+            return sorted(matched), facets
+
+    def _filter_sets(self, filters: schema.VehicleFilters) -> Dict[str, Optional[Set[int]]]:
+        def where(field: str, predicate: Callable[[Any], bool]) -> Set[int]:
+            ids: Set[int] = set()
+            for value, posting in self._postings[field].items():
+                if value is not None and predicate(value):
+                    ids |= posting
+            return ids
+
+        # Mirrors CRUDVehicle.filter_vehicles: make/model are case-insensitive substrings
+        return {
+            "make": where("make", lambda v: filters.make.lower() in v.lower()) if filters.make else None,
+            "model": where("model", lambda v: filters.model.lower() in v.lower()) if filters.model else None,
+            "fuel_type": set(self._postings["fuel_type"].get(filters.fuel_type, ())) if filters.fuel_type else None,
+            "transmission": set(self._postings["transmission"].get(filters.transmission, ())) if filters.transmission else None,
+            "min_year": where("year", lambda v: v >= filters.min_year) if filters.min_year else None,
+            "max_year": where("year", lambda v: v <= filters.max_year) if filters.max_year else None,
+            "availability": set(self._postings["availability"].get(filters.availability, ()))
+            if filters.availability is not None else None,
+            "location_id": set(self._postings["location_id"].get(filters.location_id, ())) if filters.location_id else None,
+            "min_daily_rate": where("daily_rate", lambda v: v >= filters.min_daily_rate) if filters.min_daily_rate else None,
+            "max_daily_rate": where("daily_rate", lambda v: v <= filters.max_daily_rate) if filters.max_daily_rate else None,
+        }
+
+    @staticmethod
+    def _intersect(everything: Set[int], sets) -> Set[int]:
+        sets = sorted(sets, key=len)
+        if not sets:
+            return everything
+        return set(sets[0]).intersection(*sets[1:])
+
+    def _insert(self, vehicle_id: int, values: Tuple[Any, ...]) -> None:
+        self._documents[vehicle_id] = values
+        for field, value in zip(FIELDS, values):
+            self._postings[field].setdefault(value, set()).add(vehicle_id)
+
+    def _delete(self, vehicle_id: int) -> None:
+        values = self._documents.pop(vehicle_id, None)
+        if values is None:
+            return
+        for field, value in zip(FIELDS, values):
+            posting = self._postings[field].get(value)
+            if posting is not None:
+                posting.discard(vehicle_id)
+                if not posting:
+                    del self._postings[field][value]
+
+
+def facet_values(vehicle: models.Vehicle) -> Tuple[Any, ...]:
+    return tuple(getattr(vehicle, field) for field in FIELDS)
+
+
+vehicle_facet_index = VehicleFacetIndex()
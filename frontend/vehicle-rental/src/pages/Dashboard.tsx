@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { vehicleApi, rentalApi, customerApi } from '../services/api';
+import { vehicleApi, rentalApi, dashboardApi } from '../services/api';
 import type { Vehicle, Rental } from '../types';
 import './Dashboard.css';
 
@@ -36,36 +36,20 @@ const Dashboard: React.FC = () => {
       setLoading(true);
       setError(null);
 
-      // Fetch all required data
-      const [
-        customers,
-        vehicles,
-        activeRentals,
-        availableVehicles,
-        overdueRentals,
-        maintenanceVehicles,
-        rentals,
-      ] = await Promise.all([
-        customerApi.getAll(0, 100),
-        vehicleApi.getAll(0, 100),
-        rentalApi.getActive(0, 100),
-        vehicleApi.getAvailable(0, 100),
-        rentalApi.getOverdue(),
+      // Counters come pre-aggregated from the server; only the lists are fetched as rows
+      const [summary, maintenanceVehicles, rentals] = await Promise.all([
+        dashboardApi.getSummary(),
         vehicleApi.getNeedingMaintenance(),
         rentalApi.getAll(0, 10),
       ]);
 
-      // Calculate revenue from completed rentals
-      const completedRentals = rentals.filter(r => r.status === 'Completed');
-      const totalRevenue = completedRentals.reduce((sum, rental) => sum + rental.total_amount, 0);
-
       setStats({
-        totalCustomers: customers.length,
-        totalVehicles: vehicles.length,
-        activeRentals: activeRentals.length,
-        availableVehicles: availableVehicles.length,
-        overdueRentals: overdueRentals.length,
-        revenue: totalRevenue,
+        totalCustomers: summary.total_customers,
+        totalVehicles: summary.total_vehicles,
+        activeRentals: summary.active_rentals,
+        availableVehicles: summary.available_vehicles,
+        overdueRentals: summary.overdue_rentals,
+        revenue: Number(summary.total_revenue),
       });
 
       setRecentRentals(rentals.slice(0, 5));
@@ -25,7 +25,10 @@ import type {
   MaintenanceScheduleCreate,
   MembershipTier,
   VehicleFeature,
-  RevenueReport
+  RevenueReport,
+  FleetCalendar,
+  DashboardStats,
+  VehicleFacetedResults
 } from '../types';
 
 const API_BASE_URL = 'http://localhost:8000';
@@ -62,6 +65,8 @@ async function apiRequest<T>(
 ): Promise<T> {
   const url = `${API_BASE_URL}${endpoint}`;
   const response = await fetch(url, {
+    // Carries the read-your-writes cookie so reads after a write skip the replicas
+    credentials: 'include',
     headers: {
       'Content-Type': 'application/json',
       ...options.headers,
@@ -71,6 +76,12 @@ async function apiRequest<T>(
   return handleResponse<T>(response);
 }
 
+// Dashboard API
+export const dashboardApi = {
+  getSummary: (): Promise<DashboardStats> =>
+    apiRequest('/dashboard/summary'),
+};
+
 // Customer API
 export const customerApi = {
   getAll: (skip = 0, limit = 100): Promise<Customer[]> =>
@@ -108,7 +119,15 @@ export const vehicleApi = {
   
   getAvailable: (skip = 0, limit = 100): Promise<Vehicle[]> =>
     apiRequest(`/vehicles/available?skip=${skip}&limit=${limit}`),
-  
+
+  getAvailableBetween: (start: string, end: string, locationId?: number): Promise<Vehicle[]> => {
+    const params = new URLSearchParams({ start, end });
+    if (locationId !== undefined) {
+      params.append('location_id', locationId.toString());
+    }
+    return apiRequest(`/vehicles/available-between?${params}`);
+  },
+
   getById: (id: number): Promise<VehicleWithFeatures> =>
     apiRequest(`/vehicles/${id}`),
   
@@ -141,6 +160,18 @@ export const vehicleApi = {
     params.append('limit', limit.toString());
     return apiRequest(`/vehicles/filter/?${params}`);
   },
+
+  filterFaceted: (filters: VehicleFilters, skip = 0, limit = 100): Promise<VehicleFacetedResults> => {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null) {
+        params.append(key, value.toString());
+      }
+    });
+    params.append('skip', skip.toString());
+    params.append('limit', limit.toString());
+    return apiRequest(`/vehicles/filter/faceted?${params}`);
+  },
   
   getNeedingMaintenance: (): Promise<Vehicle[]> =>
     apiRequest('/vehicles/maintenance/needed'),
@@ -199,6 +230,17 @@ export const rentalApi = {
     apiRequest(`/rentals/revenue/report?start_date=${startDate}&end_date=${endDate}`),
 };
 
+// Fleet Calendar API
+export const fleetApi = {
+  getCalendar: (from: string, to: string, locationId?: number): Promise<FleetCalendar> => {
+    const params = new URLSearchParams({ from, to });
+    if (locationId !== undefined) {
+      params.append('location_id', locationId.toString());
+    }
+    return apiRequest(`/fleet/calendar?${params}`);
+  },
+};
+
 // Reservation API
 export const reservationApi = {
   getAll: (skip = 0, limit = 100): Promise<Reservation[]> =>
@@ -293,7 +335,9 @@ export const paymentApi = {
     end_date: string;
     total_payments: number;
     total_amount: number;
-    payments: Payment[];
+    by_method: Record<string, { payments: number; amount: number }>;
+    by_payment_type: Record<string, { payments: number; amount: number }>;
+    by_day: Record<string, { payments: number; amount: number }>;
   }> =>
     apiRequest(`/payments/report?start_date=${startDate}&end_date=${endDate}`),
 };
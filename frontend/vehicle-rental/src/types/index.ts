@@ -234,6 +234,7 @@ export interface Rental {
   discount_applied: number;
   late_fees: number;
   damage_fees: number;
+  is_overdue: boolean;
   created_at: string;
 }
 
@@ -362,10 +363,34 @@ export interface DashboardStats {
   total_revenue: number;
   available_vehicles: number;
   overdue_rentals: number;
+  vehicles_needing_maintenance: number;
 }
 
 export interface RevenueReport {
   start_date: string;
   end_date: string;
   total_revenue: number;
-}
\ No newline at end of file
+}
+// Fleet Calendar Types
+export interface VehicleCalendar {
+  vehicle_id: number;
+  // Base64 little-endian bitmap; bit i is set when the vehicle is booked on from_date + i
+  bitmap: string;
+  booked_days: number;
+}
+
+export interface FleetCalendar {
+  from_date: string;
+  to_date: string;
+  days: number;
+  location_id?: number;
+  vehicles: VehicleCalendar[];
+}
+
+// Faceted Vehicle Search Types
+export interface VehicleFacetedResults {
+  total: number;
+  vehicles: Vehicle[];
+  // Facet name -> value or bucket label -> count
+  facets: Record<string, Record<string, number>>;
+}